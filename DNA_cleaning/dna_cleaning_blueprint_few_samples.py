@@ -13,13 +13,12 @@
 #           v1.0 2021-11-05: First protocol version.
 #           v1.1 2021-12-10: Refined after quality controls.
 #           v1.2 2021-12-21: Ready for external use.
+#           v1.3 2026-10-18: Non-recursive door monitor shared with the other blueprints.
 #
 ####################################
 
 from opentrons import protocol_api
 from opentrons.types import Point
-import time
-import threading
 metadata = {'apiLevel': '2.10'}
 
 
@@ -160,159 +159,136 @@ def run(protocol: protocol_api.ProtocolContext):
     
     protocol.set_rail_lights(True)
 
-    #Multithreded method to pause the protocol if the door of the OT-2 is opened. 
-    global paused
-    paused = False
-    global done
-    done = False
-
-    def check_pause():
-        global paused
-        global done
-        if not paused and not protocol.door_closed:
-            protocol.pause()
-            paused = True
-        
-        if paused and protocol.door_closed:
-            protocol.resume()
-            paused = False
-
-        if paused and not protocol.door_closed:
-            print('Protocol paused. Close the door to the robot to resume.')
-
-        time.sleep(1)
-        
-        # Check if the main thread is still alive or if the run has been stopped by ctrl+C
-        run_canceled = not threading.main_thread().is_alive()
-
-        if not done and not run_canceled:
-            check_pause()
-
-    thread = threading.Thread(target=check_pause)
-    thread.start()
-
-    #Define and load all labware.
-    [mag_mod] = get_values("mag_mod")
-    mag_deck = protocol.load_module(mag_mod, '1')
-    sample_plate = mag_deck.load_labware('biorad_96_wellplate_200ul_pcr') #Contains the samples and are mounted on megnetic module.
-    mag_deck.disengage()
+    #Multithreded method to pause the protocol if the door of the OT-2 is opened.
+    #Door_monitor is added to the protocol from door_monitor.py when the protocol is created.
+    door_monitor = Door_monitor(protocol, door_poll_interval)
+    door_monitor.start()
+    # Stopped also if the run fails or is cancelled, so that the thread does not keep running
+    # in a process that runs several protocols, e.g. the robot server or robot_agent.py.
+    try:
+
+        #Define and load all labware.
+        [mag_mod] = get_values("mag_mod")
+        mag_deck = protocol.load_module(mag_mod, '1')
+        sample_plate = mag_deck.load_labware('biorad_96_wellplate_200ul_pcr') #Contains the samples and are mounted on megnetic module.
+        mag_deck.disengage()
     
-    resevoir = protocol.load_labware('biorad_96_wellplate_200ul_pcr',2) #Contains Magnetic Beads on A1, EB on A3 and EtOH on A5, A6.
-    resevoir_trash = protocol.load_labware('usascientific_96_wellplate_2.4ml_deep', 6) #Empty plate for disgarding used EtOH.
-    clean_plate = protocol.load_labware('biorad_96_wellplate_200ul_pcr',3) #Clean plate for the purified samples.
+        resevoir = protocol.load_labware('biorad_96_wellplate_200ul_pcr',2) #Contains Magnetic Beads on A1, EB on A3 and EtOH on A5, A6.
+        resevoir_trash = protocol.load_labware('usascientific_96_wellplate_2.4ml_deep', 6) #Empty plate for disgarding used EtOH.
+        clean_plate = protocol.load_labware('biorad_96_wellplate_200ul_pcr',3) #Clean plate for the purified samples.
 
-    #Set tip racks and order for pipettes.
-    tiprack_7 = [protocol.load_labware('opentrons_96_tiprack_300ul', 7)]
-    p300 = protocol.load_instrument('p300_multi', 'right')
-    P300 = Pipette(protocol, p300, tiprack_7)
+        #Set tip racks and order for pipettes.
+        tiprack_7 = [protocol.load_labware('opentrons_96_tiprack_300ul', 7)]
+        p300 = protocol.load_instrument('p300_multi', 'right')
+        P300 = Pipette(protocol, p300, tiprack_7)
 
-    tiprack_11 = [protocol.load_labware('opentrons_96_tiprack_10ul', 11)]
-    p10 = protocol.load_instrument('p10_multi', 'left')
-    P10 = Pipette(protocol, p10, tiprack_11)
+        tiprack_11 = [protocol.load_labware('opentrons_96_tiprack_10ul', 11)]
+        p10 = protocol.load_instrument('p10_multi', 'left')
+        P10 = Pipette(protocol, p10, tiprack_11)
 
     
-    #########################
-    ###START PROTOCOL########
-    #########################
-
-    #Add magnetic beads to samples, and mix.
-    vol_beads = vol_samples * ratio
-    P300.pick_up()
-    p300.flow_rate.aspirate = 9
-    p300.flow_rate.dispense = 9        
-    custom_mix(p300, 30, 15, resevoir['A1'], 3, 6)
-    p300.flow_rate.aspirate = 120
-    p300.flow_rate.dispense = 30
-    p300.aspirate(vol_beads+10, resevoir['A1'].bottom(z=3))
-    p300.dispense(vol_beads, sample_plate['A1'].bottom(z=5))
-    p300.dispense(10, resevoir['A1'].bottom(z=20))
-    p300.blow_out(resevoir['A1'].bottom(z=20))
-    p300.flow_rate.aspirate=60
-    p300.flow_rate.dispense=60
-    custom_mix(p300, 15, vol_samples+vol_beads-10, sample_plate['A1'], 0.6, 3)
-    p300.drop_tip()
+        #########################
+        ###START PROTOCOL########
+        #########################
+
+        #Add magnetic beads to samples, and mix.
+        vol_beads = vol_samples * ratio
+        P300.pick_up()
+        p300.flow_rate.aspirate = 9
+        p300.flow_rate.dispense = 9        
+        custom_mix(p300, 30, 15, resevoir['A1'], 3, 6)
+        p300.flow_rate.aspirate = 120
+        p300.flow_rate.dispense = 30
+        p300.aspirate(vol_beads+10, resevoir['A1'].bottom(z=3))
+        p300.dispense(vol_beads, sample_plate['A1'].bottom(z=5))
+        p300.dispense(10, resevoir['A1'].bottom(z=20))
+        p300.blow_out(resevoir['A1'].bottom(z=20))
+        p300.flow_rate.aspirate=60
+        p300.flow_rate.dispense=60
+        custom_mix(p300, 15, vol_samples+vol_beads-10, sample_plate['A1'], 0.6, 3)
+        p300.drop_tip()
     
-    #Wait 5 min. Engage magnet. Wait 5 min.
-    protocol.delay(minutes=5) #minutes=5
-    mag_deck.engage() 
-    protocol.delay(minutes=5) #minutes=5
-
-    #Remove liquid from sample.
-    v_tot = vol_beads + vol_samples
-    P300.pick_up()
-    p300.flow_rate.aspirate = 90
-    p300.aspirate(v_tot/2 - 5, sample_plate['A1'].bottom(z=5))
-    p300.aspirate(v_tot/2 - 5, sample_plate['A1'].bottom(z=2))
+        #Wait 5 min. Engage magnet. Wait 5 min.
+        protocol.delay(minutes=5) #minutes=5
+        mag_deck.engage() 
+        protocol.delay(minutes=5) #minutes=5
+
+        #Remove liquid from sample.
+        v_tot = vol_beads + vol_samples
+        P300.pick_up()
+        p300.flow_rate.aspirate = 90
+        p300.aspirate(v_tot/2 - 5, sample_plate['A1'].bottom(z=5))
+        p300.aspirate(v_tot/2 - 5, sample_plate['A1'].bottom(z=2))
     
-    p300.aspirate(5, sample_plate['A1'].bottom(z=0.5))
-    p300.aspirate(5, sample_plate['A1'].bottom(z=0.2))
-    p300.aspirate(5, sample_plate['A1'].bottom(z=0.1))
-    p300.aspirate(5, sample_plate['A1'].bottom(z=0))
-    p300.drop_tip()
+        p300.aspirate(5, sample_plate['A1'].bottom(z=0.5))
+        p300.aspirate(5, sample_plate['A1'].bottom(z=0.2))
+        p300.aspirate(5, sample_plate['A1'].bottom(z=0.1))
+        p300.aspirate(5, sample_plate['A1'].bottom(z=0))
+        p300.drop_tip()
     
-    #Cleans the samples with EtOH.
-    P300.pick_up()
-    for i in range(1, cleanings + 1):
-        #Add ethanol
-        p300.flow_rate.aspirate = 60
-        p300.flow_rate.dispense = 30
-        p300.aspirate(190, resevoir['A' + str(4 + i)].bottom(z=3), 3) 
-        stepwise_dispense(p300, 190, sample_plate['A1'], 10)
-        protocol.delay(seconds=30) #seconds=30
-
-        #Remove ethanol
-        p300.flow_rate.aspirate=90
-        p300.flow_rate.dispense=100
-        center_location = sample_plate['A1'].bottom(z=0.3)
-        center_location_higher = center_location.move(Point(0, 0, 1.2))
-        adjusted_location1 = center_location.move(Point(0.3, 0.3, 0.1))
-        adjusted_location2 = center_location.move(Point(-0.3, -0.3, 0.1))
-
-        p300.aspirate(150, center_location_higher)
-        p300.aspirate(30, center_location)
-        p300.aspirate(20, adjusted_location1)
-        p300.aspirate(20, adjusted_location2)
-
-        p300.dispense(220, resevoir_trash['A1'].bottom(z=3)) 
-        p300.blow_out(resevoir_trash['A1'].bottom(z=10)) 
-    p300.drop_tip()
+        #Cleans the samples with EtOH.
+        P300.pick_up()
+        for i in range(1, cleanings + 1):
+            #Add ethanol
+            p300.flow_rate.aspirate = 60
+            p300.flow_rate.dispense = 30
+            p300.aspirate(190, resevoir['A' + str(4 + i)].bottom(z=3), 3) 
+            stepwise_dispense(p300, 190, sample_plate['A1'], 10)
+            protocol.delay(seconds=30) #seconds=30
+
+            #Remove ethanol
+            p300.flow_rate.aspirate=90
+            p300.flow_rate.dispense=100
+            center_location = sample_plate['A1'].bottom(z=0.3)
+            center_location_higher = center_location.move(Point(0, 0, 1.2))
+            adjusted_location1 = center_location.move(Point(0.3, 0.3, 0.1))
+            adjusted_location2 = center_location.move(Point(-0.3, -0.3, 0.1))
+
+            p300.aspirate(150, center_location_higher)
+            p300.aspirate(30, center_location)
+            p300.aspirate(20, adjusted_location1)
+            p300.aspirate(20, adjusted_location2)
+
+            p300.dispense(220, resevoir_trash['A1'].bottom(z=3)) 
+            p300.blow_out(resevoir_trash['A1'].bottom(z=10)) 
+        p300.drop_tip()
     
-    #Wait 5 min. Disengage magnet.
-    protocol.delay(minutes=5) #minutes=5
-    mag_deck.disengage()
-
-    #Add EB and mix.
-    P300.pick_up()
-    p300.flow_rate.aspirate = 120
-    p300.flow_rate.dispense = 120    
-    p300.transfer(
-        vol_EB,
-        resevoir['A3'].bottom(z=3), 
-        sample_plate['A1'], 
-        new_tip ='never',
-        blow_out=(True),
-        blowout_location='destination well')
-    custom_mix(p300, 30, vol_EB-3, sample_plate['A1'], 0.4, 1.5)
-    p300.drop_tip()
+        #Wait 5 min. Disengage magnet.
+        protocol.delay(minutes=5) #minutes=5
+        mag_deck.disengage()
+
+        #Add EB and mix.
+        P300.pick_up()
+        p300.flow_rate.aspirate = 120
+        p300.flow_rate.dispense = 120    
+        p300.transfer(
+            vol_EB,
+            resevoir['A3'].bottom(z=3), 
+            sample_plate['A1'], 
+            new_tip ='never',
+            blow_out=(True),
+            blowout_location='destination well')
+        custom_mix(p300, 30, vol_EB-3, sample_plate['A1'], 0.4, 1.5)
+        p300.drop_tip()
       
-    #Disengage magnet to release DNA. Wait 1 min.
-    mag_deck.engage()
-    protocol.delay(minutes=1) #minutes=1
+        #Disengage magnet to release DNA. Wait 1 min.
+        mag_deck.engage()
+        protocol.delay(minutes=1) #minutes=1
  
-    #Transfer the purified sample to a clean plate.
-    p10.flow_rate.aspirate = 3
-    p10.flow_rate.dispense = 10
-    P10.pick_up()
-    p10.transfer(vol_EB-3, sample_plate['A1'].bottom(z=1), clean_plate['A1'].bottom(z=1), new_tip ='never')
-    p10.blow_out()
-    p10.drop_tip()
+        #Transfer the purified sample to a clean plate.
+        p10.flow_rate.aspirate = 3
+        p10.flow_rate.dispense = 10
+        P10.pick_up()
+        p10.transfer(vol_EB-3, sample_plate['A1'].bottom(z=1), clean_plate['A1'].bottom(z=1), new_tip ='never')
+        p10.blow_out()
+        p10.drop_tip()
     
-    #Some finnishing stuff.
-    p10.home()
-    mag_deck.disengage()
+        #Some finnishing stuff.
+        p10.home()
+        mag_deck.disengage()
 
-    done = True
-    thread.join()
+    finally:
+        door_monitor.stop()
 
     print('Protocol Complete')
 
@@ -327,4 +303,5 @@ vol_samples=20
 ratio=1
 cleanings=1
 vol_EB=20
+door_poll_interval=1 # Seconds between each check of the robot door
 # New values from user:
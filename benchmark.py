@@ -0,0 +1,361 @@
+####################################
+#   Benchmarks for the protocol generation code, and a regression suite for the cost of the generated protocols.
+#   Run: python benchmark.py                        (csv parser benchmark)
+#        python benchmark.py --regression           (compare the protocols against benchmark_baseline.json, saved by the first run)
+#        python benchmark.py --update-baseline      (save the current protocols as the baseline)
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Scaling benchmark for the qPCR csv parser.
+#           v1.1 2026-10-18: Regression suite for duration, tips, pipetting, delays and gantry travel of the protocols.
+#           v1.2 2026-10-18: The first regression run without a baseline saves the baseline instead of failing.
+#           v1.3 2026-10-18: Tube rack sources only for the wells left for the single-channel pipette.
+#
+####################################
+
+import os
+import sys
+import json
+import string
+import timeit
+import argparse
+from collections import Counter
+import replace_values
+import replace_values_qpcr
+import qpcr_planner
+import protocol_simulator
+import time_model
+
+
+baseline_filepath = 'benchmark_baseline.json'
+
+# Parameters of the DNA cleaning protocols in the regression suite, in the order of replace_values.replace_values().
+dna_cleaning_cases = {
+    'dna_cleaning_4_samples': [4, 20, 1, 1, 20],
+    'dna_cleaning_8_samples_2_washes': [8, 30, 0.8, 2, 15],
+    'dna_cleaning_24_samples': [24, 20, 0.8, 1, 15],
+    'dna_cleaning_96_samples_2_washes': [96, 40, 1.5, 2, 25],
+}
+
+# Layouts of the qPCR protocols in the regression suite: synthetic_layout() arguments, settings and if the
+# 8-channel pipette is used. The layout with one mastermix has full plate columns for the 8-channel pipette.
+qpcr_cases = {
+    'qpcr_96_single': [[96, 4, 3], {}, False],
+    'qpcr_96_distribute_p20': [[96, 4, 3], {'mastermix_mode': 'distribute', 'mastermix_pipette': 'p20_single_gen2'}, False],
+    'qpcr_96_tip_per_source': [[96, 4, 3], {'sample_tip_policy': 'source', 'standard_tip_policy': 'source'}, False],
+    'qpcr_96_multichannel': [[96, 1, 3], {}, True],
+}
+
+# Rows and columns of the plate formats used in the benchmark.
+plate_formats = {
+    96: (8, 12),
+    384: (16, 24),
+    1536: (32, 48),
+}
+
+
+def row_letters(no_rows):
+    """
+    Gives the row names of a plate, A-Z followed by AA, AB etc. for the larger plate formats.
+
+        Parameters:
+            no_rows (int):              Number of rows on the plate
+
+        Returns:
+            A list with the name of each row.
+    """
+    letters = list(string.ascii_uppercase)
+    letters += [first + second for first in string.ascii_uppercase for second in string.ascii_uppercase]
+    return letters[:no_rows]
+
+
+def synthetic_layout(no_wells, no_mastermixes=4, no_replicates=3):
+    """
+    Creates a plate layout in the same format as the rows of an exported qPCR .csv file (without the header).
+    Every fourth well group is a standard or NTC and the rest are samples, each placed in
+    a number of replicate wells.
+
+        Parameters:
+            no_wells (int):             Number of wells on the plate, 96, 384 or 1536
+            no_mastermixes (int):       Number of different mastermixes on the plate
+            no_replicates (int):        Number of wells each sample or standard is placed in
+
+        Returns:
+            A list of rows, one per well.
+    """
+    no_rows, no_columns = plate_formats[no_wells]
+    layout = []
+    for i, well in enumerate([(row, str(column)) for row in row_letters(no_rows) for column in range(1, no_columns + 1)]):
+        mastermix = f'Target {i % no_mastermixes + 1}'
+        group = i // no_replicates
+        if group % 4 == 0:
+            content = 'NTC' if group % 16 == 0 else f'Std-{group % 8 + 1:02d}'
+            layout.append([*well, content, '', mastermix, '', '', '', str(10 ** (group % 6))])
+        else:
+            layout.append([*well, f'Unkn-{group:04d}', '', mastermix, 'Antibody', f'Set {group}', str(group % 3 + 1), ''])
+    return layout
+
+
+def legacy_group_destinations(csv_list):
+    """
+    The grouping used in csv_till_lista() before v1.2, which rescans all rows once for every unique
+    mastermix, standard and sample. Kept as a reference for the benchmark.
+
+        Parameters:
+            csv_list (list):            Rows of the plate layout
+
+        Returns:
+            A dictionary with the destination wells for each mastermix, sample and standard.
+    """
+    unique_mastermixes = []
+    unique_standards = []
+    unique_samples = []
+    for line in csv_list:
+        if line[4] not in unique_mastermixes:
+            unique_mastermixes.append(line[4])
+        if 'Std' in line[2] or 'NTC' in line[2]:
+            standard = '|'.join([line[2], line[8]])
+            if standard not in unique_standards:
+                unique_standards.append(standard)
+        elif 'Unkn' in line[2]:
+            sample = '|'.join([line[2],line[5],line[6],line[7]])
+            if sample not in unique_samples:
+                unique_samples.append(sample)
+
+    mastermix_destination = {}
+    for mm in unique_mastermixes:
+        mastermix_destination[mm] = [''.join(line[0:2]) for line in csv_list if line[4] == mm]
+    standard_destination = {}
+    for standard in unique_standards:
+        standard_destination[standard] = [''.join(line[0:2]) for line in csv_list if '|'.join([line[2], line[8]]) == standard]
+    sample_destination = {}
+    for sample in unique_samples:
+        sample_destination[sample] = [''.join(line[0:2]) for line in csv_list if '|'.join([line[2],line[5],line[6],line[7]]) == sample]
+
+    return {
+        'mastermix_destination': mastermix_destination,
+        'sample_destination': sample_destination,
+        'standard_destination': standard_destination,
+    }
+
+
+def time_function(function, argument, repeats=5):
+    """
+    Times a function call, using the fastest out of a number of repeats.
+
+        Parameters:
+            function (function):        The function to time
+            argument:                   The argument the function is called with
+            repeats (int):              Number of times the timing is repeated
+
+        Returns:
+            The time in seconds for one call.
+    """
+    timer = timeit.Timer(lambda: function(argument))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeats, number=number)) / number
+
+
+def benchmark_csv_parser():
+    """
+    Groups synthetic 96, 384 and 1536 well layouts with both the current and the legacy grouping,
+    checks that they give the same result and prints the time per layout and per row.
+
+        Parameters:
+            Nothing.
+
+        Returns:
+            Nothing.
+    """
+    print('Grouping of qPCR plate layouts')
+    print(f'{"Wells":>8}{"Groups":>8}{"Single pass (ms)":>20}{"Per row (us)":>15}{"Legacy (ms)":>15}{"Speedup":>10}')
+    for no_wells in plate_formats:
+        layout = synthetic_layout(no_wells)
+        destinations = replace_values_qpcr.group_destinations(layout)
+        if destinations != legacy_group_destinations(layout):
+            raise AssertionError(f'Grouping of the {no_wells} well layout differs from the legacy grouping')
+        no_groups = sum(len(group) for group in destinations.values())
+
+        single_pass = time_function(replace_values_qpcr.group_destinations, layout)
+        legacy = time_function(legacy_group_destinations, layout, repeats=3)
+        print(f'{no_wells:>8}{no_groups:>8}{single_pass*1e3:>20.3f}{single_pass/no_wells*1e6:>15.3f}{legacy*1e3:>15.3f}{legacy/single_pass:>9.1f}x')
+
+
+
+def create_qpcr_protocol(layout, settings, multichannel):
+    """
+    Creates a qPCR protocol from a plate layout in the same way as qPCR_protocol_config.write_protocol() in main.py.
+
+        Parameters:
+            layout (list):              Rows of the plate layout, see synthetic_layout()
+            settings (dict):            Mastermix and tip settings, see qPCR_protocol_config.protocol_settings()
+            multichannel (bool):        If full plate columns are filled with the 8-channel pipette
+
+        Returns:
+            The protocol file, the command counts of time_model and the gantry travel in mm.
+    """
+    settings = {'mastermix_mode': 'single', 'mastermix_pipette': 'p10_single', **settings}
+    destinations = replace_values_qpcr.group_destinations(layout)
+    if multichannel:
+        [single_destinations, multichannel_destination, multichannel_source] = qpcr_planner.split_multichannel(destinations)
+    else:
+        [single_destinations, multichannel_destination, multichannel_source] = [destinations, None, None]
+    slots = replace_values_qpcr.reserved_slots(settings['mastermix_mode'], settings['mastermix_pipette'], multichannel)
+    sources = replace_values_qpcr.assign_sources(single_destinations, slots)
+    sizes = replace_values_qpcr.wells_per_aspiration(**settings)
+    ordered_destinations, travel = qpcr_planner.order_destinations(single_destinations, sources, sizes)
+    _, protocol_file = replace_values_qpcr.replace_values_qpcr(ordered_destinations, sources, **settings,
+                                                               multichannel_destination=multichannel_destination,
+                                                               multichannel_source=multichannel_source)
+    counts = time_model.qpcr_counts(ordered_destinations, multichannel_destination, **settings)
+    return protocol_file, counts, travel['after']
+
+
+def protocol_metrics(protocol_file, counts, travel, fast=False):
+    """
+    Measures the cost of a protocol. The protocol is simulated with protocol_simulator, so that the metrics follow
+    the blueprints. With fast=True, time_model is used instead, which does not need opentrons but only follows
+    the blueprints as far as time_model does.
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+            counts (dict):              Command counts of the protocol, see time_model
+            travel (float):             Gantry travel in mm, None if it is not calculated for the protocol
+            fast (bool):                If time_model should be used instead of a simulation
+
+        Returns:
+            A dictionary with the duration in seconds, the number of tip pickups, aspirations and dispenses,
+            the total delay in seconds and the gantry travel in mm.
+    """
+    if fast:
+        duration = time_model.predict(counts, time_model.default_coefficients)
+        commands = {
+            'command.PICK_UP_TIP': counts['pick_up_tip'],
+            'command.ASPIRATE': counts['aspirate'] + counts['mix'],
+            'command.DISPENSE': counts['dispense'] + counts['mix']}
+        delay = counts['delay']
+    else:
+        result = protocol_simulator.estimate(protocol_file)
+        duration = result['total']
+        commands = Counter(command for [command, _, _] in result['steps'])
+        delay = sum(seconds for [command, _, seconds] in result['steps'] if command == 'command.DELAY')
+    return {
+        'duration_s': round(duration, 1),
+        'tip_pickups': commands['command.PICK_UP_TIP'],
+        'aspirations': commands['command.ASPIRATE'],
+        'dispenses': commands['command.DISPENSE'],
+        'delay_s': round(delay, 1),
+        'gantry_travel_mm': None if travel is None else round(travel, 1),
+    }
+
+
+def measure_protocols(fast=False):
+    """
+    Creates and measures every protocol of the regression suite.
+
+        Parameters:
+            fast (bool):                If time_model should be used instead of a simulation, see protocol_metrics()
+
+        Returns:
+            A dictionary with the metrics of each case.
+    """
+    metrics = {}
+    for case, parameters in dna_cleaning_cases.items():
+        protocol_file = replace_values.replace_values(*parameters)
+        # The gantry travel is only calculated for the qPCR protocols.
+        metrics[case] = protocol_metrics(protocol_file, time_model.dna_cleaning_counts(*parameters), None, fast)
+    for case, [layout, settings, multichannel] in qpcr_cases.items():
+        protocol_file, counts, travel = create_qpcr_protocol(synthetic_layout(*layout), settings, multichannel)
+        metrics[case] = protocol_metrics(protocol_file, counts, travel, fast)
+    return metrics
+
+
+def compare_to_baseline(metrics, baseline, threshold=0.02):
+    """
+    Compares the metrics of the protocols with the baseline. A metric that has grown by more than the threshold
+    is a regression. Cases and metrics that are missing from the baseline are skipped.
+
+        Parameters:
+            metrics (dict):             The metrics of each case, see measure_protocols()
+            baseline (dict):            The metrics of each case in the baseline
+            threshold (float):          Allowed relative growth, e.g. 0.02 for 2 %
+
+        Returns:
+            A list with a description of each regression.
+    """
+    regressions = []
+    for case, case_metrics in metrics.items():
+        for metric, value in case_metrics.items():
+            base = baseline.get(case, {}).get(metric)
+            if value is None or base is None:
+                continue
+            if value > base * (1 + threshold) and value - base > 1e-6:
+                regressions.append(f'{case}: {metric} {base} -> {value} (+{(value - base) / base * 100 if base else float("inf"):.1f} %)')
+    return regressions
+
+
+def regression_suite(threshold=0.02, fast=False, update_baseline=False, filepath=baseline_filepath):
+    """
+    Measures the protocols of the regression suite, prints the metrics and compares them with the saved baseline,
+    or saves them as the new baseline. Fast and simulated metrics are saved separately in the baseline.
+    The baseline is not part of the program, since it depends on the opentrons version, so the first run without
+    a baseline saves the metrics as the baseline and passes.
+
+        Parameters:
+            threshold (float):          Allowed relative growth of each metric
+            fast (bool):                If time_model should be used instead of a simulation
+            update_baseline (bool):     If the metrics should be saved as the new baseline
+            filepath (str):             Filepath of the baseline
+
+        Returns:
+            True if there were no regressions.
+    """
+    mode = 'fast' if fast else 'simulated'
+    metrics = measure_protocols(fast)
+    names = list(next(iter(metrics.values())))
+    print(f'Protocol cost metrics ({mode})')
+    print(f'{"Case":<36}' + ''.join(f'{name:>18}' for name in names))
+    for case, case_metrics in metrics.items():
+        print(f'{case:<36}' + ''.join(f'{str(case_metrics[name]):>18}' for name in names))
+
+    baselines = {}
+    if os.path.exists(filepath):
+        with open(filepath) as file:
+            baselines = json.load(file)
+    if update_baseline or mode not in baselines:
+        if not update_baseline:
+            print(f'No {mode} baseline in {filepath} yet, nothing to compare with')
+        baselines[mode] = metrics
+        with open(filepath, 'w') as file:
+            json.dump(baselines, file, indent=4)
+        print(f'Saved the {mode} baseline to {filepath}, later runs are compared with it')
+        return True
+
+    regressions = compare_to_baseline(metrics, baselines[mode], threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if not regressions:
+        print(f'No regressions larger than {threshold * 100:.1f} %')
+    return not regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks and regression suite for the protocols.')
+    parser.add_argument('--regression', action='store_true', help='compare the cost of the protocols with the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='save the cost of the protocols as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.02, help='allowed relative growth of each metric, default 0.02')
+    parser.add_argument('--fast', action='store_true', help='use time_model instead of simulating the protocols')
+    args = parser.parse_args()
+
+    if args.regression or args.update_baseline:
+        if not regression_suite(args.threshold, args.fast, args.update_baseline):
+            sys.exit(1)
+    else:
+        benchmark_csv_parser()
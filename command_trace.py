@@ -0,0 +1,134 @@
+####################################
+#   Export of every command of a generated protocol as one JSON record per line, for cost models and diff tools.
+#   Run from the program folder: python command_trace.py <protocol file> [<trace file>]
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Command trace recorded from the simulation of a protocol.
+#
+####################################
+
+import os
+import sys
+import json
+import protocol_simulator
+
+
+# Flow rate of the pipette used by each type of command.
+flow_rates = {
+    'command.ASPIRATE': 'aspirate',
+    'command.DISPENSE': 'dispense',
+    'command.BLOW_OUT': 'blow_out',
+}
+
+
+def describe_location(location):
+    """
+    Finds the labware, well and deck coordinates of a location from opentrons. A location is either a well
+    or a point on the deck that may belong to a well, e.g. well.bottom(z=3).
+
+        Parameters:
+            location:                   Well or Location object from opentrons, or None
+
+        Returns:
+            A dictionary with the labware, well and x, y and z coordinates in mm. Values that are not known are None.
+    """
+    description = {'labware': None, 'well': None, 'x': None, 'y': None, 'z': None}
+    if location is None:
+        return description
+    if hasattr(location, 'point'): # Location
+        point = location.point
+        well = location.labware
+        # Newer versions of opentrons wrap the labware or well of a location.
+        if hasattr(well, 'as_well'):
+            well = well.as_well() if well.is_well else None
+    else: # Well
+        well = location
+        point = well.top().point
+    description['x'], description['y'], description['z'] = [round(value, 2) for value in point]
+    if well is not None and hasattr(well, 'well_name'):
+        description['well'] = well.well_name
+        description['labware'] = well.parent.load_name
+    return description
+
+
+def command_record(message, duration):
+    """
+    Creates the record of one command from the message opentrons publishes when the command starts.
+
+        Parameters:
+            message (dict):             The message of the command, see protocol_simulator.simulate()
+            duration (float):           Estimated duration of the command in seconds
+
+        Returns:
+            A dictionary with the type of command, the description of opentrons, the pipette, volume, location,
+            flow rate in µl/s and the duration in seconds.
+    """
+    payload = message['payload']
+    instrument = payload.get('instrument')
+    flow_rate = None
+    if instrument is not None and message['name'] in flow_rates:
+        flow_rate = getattr(instrument.flow_rate, flow_rates[message['name']]) * payload.get('rate', 1)
+    return {
+        'command': message['name'].split('.')[-1].lower(),
+        'text': payload['text'],
+        'pipette': None if instrument is None else instrument.name,
+        'mount': None if instrument is None else instrument.mount,
+        'volume': payload.get('volume'),
+        **describe_location(payload.get('location')),
+        'flow_rate': flow_rate,
+        'duration_s': round(duration, 3),
+    }
+
+
+def trace(protocol_file):
+    """
+    Simulates a protocol and records every command.
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+
+        Returns:
+            A list with the record of each command, see command_record().
+    """
+    records = []
+    protocol_simulator.simulate(protocol_file, recorder=lambda message, duration: records.append(command_record(message, duration)))
+    return records
+
+
+def export_trace(protocol_file, filepath):
+    """
+    Writes the command trace of a protocol to a file with one JSON record per line (JSONL).
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+            filepath (str):             Filepath of the trace
+
+        Returns:
+            The number of commands.
+    """
+    records = trace(protocol_file)
+    with open(filepath, 'w') as file:
+        for i, record in enumerate(records):
+            file.write(json.dumps({'index': i, **record}, default=str) + '\n')
+    return len(records)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3]:
+        print('Usage: python command_trace.py <protocol file> [<trace file>]')
+        sys.exit(1)
+    [folder, filename] = os.path.split(sys.argv[1])
+    protocol_file = [os.path.join(folder, ''), filename]
+    if len(sys.argv) == 3:
+        filepath = sys.argv[2]
+    else:
+        filepath = f'{protocol_file[0]}{os.path.splitext(filename)[0]}_trace.jsonl'
+    print(f'Wrote {export_trace(protocol_file, filepath)} commands to {filepath}')
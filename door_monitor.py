@@ -0,0 +1,122 @@
+####################################
+#   Door monitor shared by all protocol blueprints. Pauses the protocol when the door of the OT-2 is opened.
+#   This file runs on the robot: the protocol generators copy it into every protocol they create,
+#   since a protocol has to be uploaded to the robot as a single file.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Loop based monitor replacing the recursive check_pause() in the blueprints.
+#
+####################################
+
+import threading
+
+
+class Door_monitor():
+    """
+    Checks the door of the robot in a background thread. If the door is opened the protocol is paused,
+    and you have to close the door again to resume. The thread loops with a fixed poll interval instead
+    of calling itself, so it uses the same amount of memory however long the protocol runs.
+
+        Attributes:
+            protocol:               The protocol context of the run
+            poll_interval (float):  Seconds between each check of the door
+            paused (bool):          If the monitor has paused the protocol
+
+        Methods:
+            start():
+                Starts checking the door in a background thread.
+            stop():
+                Stops checking the door and waits for the thread to finish.
+            check_door():
+                Pauses or resumes the protocol depending on the door.
+    """
+    def __init__(self, protocol, poll_interval=1):
+        """
+        Constructs the attributes of the Door_monitor() object.
+
+            Parameters:
+                protocol:                   The protocol context of the run
+                poll_interval (float):      Seconds between each check of the door
+
+            Returns:
+                Nothing.
+        """
+        self.protocol = protocol
+        self.poll_interval = poll_interval
+        self.paused = False
+        self._stopped = threading.Event()
+        # Daemon thread so that it can never keep the program alive after the run.
+        self._thread = threading.Thread(target=self._monitor, name='Door monitor', daemon=True)
+
+    def start(self):
+        """
+        Starts checking the door in a background thread.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops checking the door and waits for the thread to finish. Called when the protocol is done.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def check_door(self):
+        """
+        Pauses the protocol if the door is open and resumes it once the door is closed again.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        door_closed = self.protocol.door_closed
+        if not self.paused and not door_closed:
+            self.protocol.pause()
+            self.paused = True
+        if self.paused and door_closed:
+            self.protocol.resume()
+            self.paused = False
+        if self.paused and not door_closed:
+            print('Protocol paused. Close the door to the robot to resume.')
+
+    def _monitor(self):
+        """
+        Checks the door once per poll interval until stop() is called
+        or the run is canceled, i.e. the main thread has stopped (e.g. by ctrl+C).
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        while True:
+            self.check_door()
+            # wait() returns True as soon as stop() is called, without waiting for the rest of the interval.
+            if self._stopped.wait(self.poll_interval):
+                break
+            if not threading.main_thread().is_alive():
+                break
@@ -17,28 +17,53 @@
 import os
 import sys
 import multiprocessing
-from multiprocessing.context import ProcessError
-import subprocess
+import threading
 import queue
-import socket
 import math
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import replace_values
 import replace_values_qpcr
+import qpcr_planner
+import protocol_simulator
+import time_model
+import robot_session
+import robot_discovery
+import run_progress
+import robot_http
+import launcher
+import run_queue
 
 
 # Files and logins for SSH and SCP
 local_user = os.getlogin() # os.getlogin() gives username on local machine
 key_filename = f'c:\\users\\{local_user}\\opentrons\\ot2_ssh_key'
-protocol_local_filepath = f'dna_cleaning\\'
 protocol_robot_filepath = '/data/user_storage/'
-protocol_dna_name = 'dna_cleaning_output.py'
 ip1 = '169.254.29.201' #standard ip
 ip2 = '169.254.99.249' #secondary ip
+# Subnet that is searched if the robot is not found on ip1, ip2 or a recently used ip, e.g. '169.254.0.0/16'. None to not search.
+discovery_subnet = None
+# Seconds to wait for the robot to answer. Each new attempt waits twice as long as the one before, after a pause that also doubles.
+probe_timeout = 0.5
+probe_retries = 2
+probe_retry_delay = 0.5
+probe_poll_interval = 20 # Milliseconds between checks for the result of the probe
+# Output of a run on the robot
+run_log_poll_interval = 100 # Milliseconds between updates of the log
+run_log_queue_size = 1000 # Lines waiting to be shown, the robot waits if more lines are waiting
+run_log_max_lines = 2000 # Lines kept in the log, older lines are removed
 username = 'root'
-protocol_qpcr_local_filepath = f'qPCR\\'
-protocol_qpcr_name = 'qpcr_output.py'
+custom_labware_name = 'own_24_tuberack_1500ul.json'
+custom_labware_filepath = f'Custom labware\\{custom_labware_name}'
+# 'ssh' stops opentrons-robot-server and runs opentrons_execute over ssh.
+# 'http' runs the protocol through the HTTP API of opentrons-robot-server, which keeps running.
+deploy_backend = 'ssh'
+# With the 'ssh' deploy_backend, runs protocols with robot_agent.py, which keeps opentrons loaded on the robot between runs,
+# instead of starting opentrons_execute for every run. The agent also homes the robot while the protocol is uploaded,
+# which opentrons_execute can only do after the upload, when the run starts.
+warm_agent = True
+agent_robot_filepath = f'{protocol_robot_filepath}robot_agent.py'
 
 font = (16)
 
@@ -135,7 +160,11 @@ class Bead_protocol_config():
             ok_button():
                 Checks if entered values are valid and creates the new protocol.
             get_estimate():
-                Simulates the protocol using opentrons_simulate.exe to get an estimate of how long it will take to run the protocol.
+                Simulates the protocol in the background using protocol_simulator to get an estimate of how long it will take to run the protocol.
+            show_estimate():
+                Shows the result of the simulation.
+            update_fast_estimate():
+                Shows the estimate of time_model for the entered values.
             back_button():
                 Closes the current frame and opens the a new frame from the Selector() class
     """
@@ -180,8 +209,8 @@ class Bead_protocol_config():
 
         # Radio button for no. of ethanol washes
         self.ethanol_var = tk.IntVar() # Variable associated with the radio buttons, changes depending on button state
-        self.radio_ethanol1 = tk.Radiobutton(self.frame, text='1', variable=self.ethanol_var, value=1)
-        self.radio_ethanol2 = tk.Radiobutton(self.frame, text='2', variable=self.ethanol_var ,value=2)
+        self.radio_ethanol1 = tk.Radiobutton(self.frame, text='1', variable=self.ethanol_var, value=1, command=self.update_fast_estimate)
+        self.radio_ethanol2 = tk.Radiobutton(self.frame, text='2', variable=self.ethanol_var ,value=2, command=self.update_fast_estimate)
 
         self.radio_ethanol1.grid(row=6, column=1, padx=10, pady=10)
         self.radio_ethanol2.grid(row=6, column=2,  padx=10, pady=10)
@@ -198,6 +227,15 @@ class Bead_protocol_config():
 
         self.prepare_for_run = ttk.Button(self.frame, text='Next', command=self.call_checkbox_beads, style='small.TButton', state=tk.DISABLED)
         self.prepare_for_run.grid(row=15, column=0, padx=10, pady=10)
+
+        # Fast estimate, updated while the values are entered
+        self.label_fast_estimate = ttk.Label(self.frame, text='', style='text.TLabel')
+        self.label_fast_estimate.grid(row=11, column=0, columnspan=3, padx=10, pady=5, sticky=tk.W)
+        for entry in [self.entry_sample_no, self.entry_sample_vol, self.entry_bead_ratio, self.entry_eb]:
+            entry.bind('<KeyRelease>', self.update_fast_estimate)
+
+        # Simulation in the background
+        self.background_estimate = Background_estimate(self.frame, row=12, column=0)
     
     def call_checkbox_beads(self):
         """
@@ -228,7 +266,8 @@ class Bead_protocol_config():
         self.image_frame = ttk.Frame(self.window)
         self.image_frame.grid(row=0, column=1)
 
-        checkbox = Checkbox(parent=self.list_frame, protocol_type=protocol_dna_name, num_samples=sample_no, sample_vol=sample_vol, ratio=ratio, EB=EB, etoh=etoh)
+        run_counts = time_model.dna_cleaning_counts(sample_no, sample_vol, ratio, etoh, EB)
+        checkbox = Checkbox(parent=self.list_frame, protocol_type='dna', num_samples=sample_no, sample_vol=sample_vol, ratio=ratio, EB=EB, etoh=etoh, protocol_file=self.protocol_file, run_counts=run_counts)
         checkbox.add_image(self.image_frame, self.image_path)
         self.window.grab_set()
 
@@ -286,7 +325,7 @@ class Bead_protocol_config():
             if self.correct_sample_no and self.correct_sample_vol and self.correct_ratio and self.correct_wash and self.correct_eb:
                 # replace_values() edits an existing blueprint with the user inputs
                 try:
-                    replace_values.replace_values(self.sample_no, self.sample_vol, self.ratio, self.ethanol, self.eb) 
+                    self.protocol_file = replace_values.replace_values(self.sample_no, self.sample_vol, self.ratio, self.ethanol, self.eb)
                 except IOError:
                     tk.messagebox.showerror('Protocol write error!', 'Could not write protocol file. Please check that the template file exists and is accessible.'\
                                             ' Contact your administrator if you are uncertain.')
@@ -312,8 +351,8 @@ class Bead_protocol_config():
 
     def get_estimate(self):
         """
-        Simulates the protocol using the opentrons_simulate.exe command with the experimental 
-        time estimate feature enabled (-e flag). Shows the result in a message box.
+        Simulates the protocol in the background with protocol_simulator, which uses the experimental time estimate
+        feature of opentrons. The result is shown by show_estimate() when the simulation is done.
 
             Parameters:
                 self:           Allows the function to access class attributes and methods
@@ -321,9 +360,54 @@ class Bead_protocol_config():
             Returns:
                 Nothing 
         """
-        run = subprocess.run(f"opentrons_simulate.exe -e {protocol_local_filepath}{protocol_dna_name}", capture_output=True, text=True)
-        self.beads_estimate = run.stdout.split('\n')[-4]
+        self.new_estimate = not os.path.exists(protocol_simulator.cache_filepath(self.protocol_file))
+        self.background_estimate.start(self.protocol_file, self.show_estimate)
+
+    def show_estimate(self, result, error):
+        """
+        Shows the result of the simulation started by get_estimate() in a message box.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                result (dict):  The estimate, see protocol_simulator.simulate()
+                error (str):    Description of the error if the protocol could not be simulated, otherwise None
+
+            Returns:
+                Nothing 
+        """
+        if error:
+            messagebox.showerror('Protocol estimate', f'The protocol could not be simulated:\n{error}')
+            return
+        if self.new_estimate:
+            # Saved to calibrate time_model with.
+            counts = time_model.dna_cleaning_counts(self.sample_no, self.sample_vol, self.ratio, self.ethanol, self.eb)
+            time_model.record_observation(counts, result['total'], 'simulation')
+        self.beads_estimate = protocol_simulator.summary(result)
         messagebox.showinfo('Protocol estimate', f'{self.beads_estimate}')
+
+    def update_fast_estimate(self, event=None):
+        """
+        Calculates how long the protocol takes with time_model, which counts the commands of the protocol
+        instead of simulating it. Called every time a value is changed, the estimate is removed if a value is not valid.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                event:          The Tkinter event, if called by one
+
+            Returns:
+                Nothing
+        """
+        try:
+            sample_no = int(self.entry_sample_no.get())
+            counts = time_model.dna_cleaning_counts(sample_no, float(self.entry_sample_vol.get()), float(self.entry_bead_ratio.get()),
+                                                    self.ethanol_var.get(), float(self.entry_eb.get()))
+        except ValueError:
+            self.label_fast_estimate.config(text='')
+            return
+        if 1 <= sample_no <= 96:
+            self.label_fast_estimate.config(text=f'Fast estimate: {protocol_simulator.format_duration(time_model.predict(counts))}')
+        else:
+            self.label_fast_estimate.config(text='')
     
     def back_button(self):
         """
@@ -336,6 +420,7 @@ class Bead_protocol_config():
             Returns:
                 Nothing 
         """
+        self.background_estimate.cancel()
         self.frame.destroy()
         Selector()
 
@@ -353,8 +438,16 @@ class qPCR_protocol_config():
                 Calls the Checkbox() class.
             open_file_dialog():
                 Opens a file dialog for csv-files
+            next_plate():
+                Creates the protocol for the next plate in the chosen csv-file.
+            protocol_settings():
+                Collects the chosen mastermix and tip settings.
+            write_protocol():
+                Creates the protocol for the current plate.
             get_estimate():
-                Simulates the protocol to get an estimate of how long it will take to run the protocol.
+                Simulates the protocol in the background to get an estimate of how long it will take to run the protocol.
+            show_estimate():
+                Shows the result of the simulation.
             back_button():
                 Closes the current frame and opens the a new frame from the Selector() class
     """
@@ -389,7 +482,57 @@ class qPCR_protocol_config():
         self.prepare_for_run = ttk.Button(self.frame, text='Next', command=self.call_checkbox_qpcr, state=tk.DISABLED, style='my.TButton')
         self.prepare_for_run.grid(row=10, column=0, padx=10, pady=10, ipadx=10, ipady=5)
 
+        self.plate_label = ttk.Label(self.frame, text='', style='text.TLabel')
+        self.plate_label.grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky=tk.W)
+
+        self.next_plate_button = ttk.Button(self.frame, text='Next plate', command=self.next_plate, state=tk.DISABLED, style='my.TButton')
+        self.next_plate_button.grid(row=5, column=1, padx=10, pady=5, ipadx=10, ipady=5)
+
         self._sources = None # klassvariabel som sparar dictionary med sources
+        self.plate_layouts = None # Generator that reads one plate at a time from the chosen file
+        self.plate_no = 0
+
+        # Mastermix settings, the protocol is created again when they are changed.
+        self.distribute_var = tk.BooleanVar(value=False)
+        self.distribute_check = ttk.Checkbutton(self.frame, text='Distribute mastermix', variable=self.distribute_var, command=self.write_protocol)
+        self.distribute_check.grid(row=3, column=0, padx=10, pady=5, sticky=tk.W)
+
+        # Only pipettes that fill several wells per aspiration make distribute mode faster, i.e. not the P10.
+        distribute_pipettes = replace_values_qpcr.distribute_pipettes()
+        self.mastermix_pipette_var = tk.StringVar(value=distribute_pipettes[0])
+        self.mastermix_pipette_box = ttk.Combobox(self.frame, textvariable=self.mastermix_pipette_var, values=distribute_pipettes, state='readonly', width=18)
+        self.mastermix_pipette_box.grid(row=3, column=1, padx=10, pady=5, sticky=tk.W)
+        self.mastermix_pipette_box.bind('<<ComboboxSelected>>', lambda event: self.write_protocol())
+
+        # Tip policies for samples and standards: a new tip for every well, one tip per source or a new tip after N wells.
+        tip_policies = ['well', 'source', '2', '3', '4']
+        self.sample_tips_label = ttk.Label(self.frame, text='Sample tips:', style='text.TLabel')
+        self.sample_tips_label.grid(row=4, column=0, padx=10, pady=5, sticky=tk.W)
+        self.sample_tip_var = tk.StringVar(value='well')
+        self.sample_tip_box = ttk.Combobox(self.frame, textvariable=self.sample_tip_var, values=tip_policies, width=8)
+        self.sample_tip_box.grid(row=4, column=0, padx=10, pady=5, sticky=tk.E)
+        self.sample_tip_box.bind('<<ComboboxSelected>>', lambda event: self.write_protocol())
+        self.sample_tip_box.bind('<Return>', lambda event: self.write_protocol())
+
+        self.standard_tips_label = ttk.Label(self.frame, text='Standard tips:', style='text.TLabel')
+        self.standard_tips_label.grid(row=4, column=1, padx=10, pady=5, sticky=tk.W)
+        self.standard_tip_var = tk.StringVar(value='well')
+        self.standard_tip_box = ttk.Combobox(self.frame, textvariable=self.standard_tip_var, values=tip_policies, width=8)
+        self.standard_tip_box.grid(row=4, column=1, padx=10, pady=5, sticky=tk.E)
+        self.standard_tip_box.bind('<<ComboboxSelected>>', lambda event: self.write_protocol())
+        self.standard_tip_box.bind('<Return>', lambda event: self.write_protocol())
+
+        self.tip_count_label = ttk.Label(self.frame, text='', style='text.TLabel')
+        self.tip_count_label.grid(row=4, column=2, padx=10, pady=5, sticky=tk.W)
+
+        # Full plate columns with the same mastermix, sample or standard can be filled with an 8-channel pipette.
+        self.multichannel_var = tk.BooleanVar(value=False)
+        self.multichannel_check = ttk.Checkbutton(self.frame, text='8-channel for full columns', variable=self.multichannel_var, command=self.write_protocol)
+        self.multichannel_check.grid(row=3, column=2, padx=10, pady=5, sticky=tk.W)
+
+        # Simulation in the background
+        self.background_estimate = Background_estimate(self.frame, row=6, column=0)
+        self.strip_layout = []
     
     def call_checkbox_qpcr(self):
         """
@@ -407,9 +550,9 @@ class qPCR_protocol_config():
         self.frame_list = tk.Frame(self.window)
         self.frame_list.grid(row=0, column=0)
 
-        checkbox = Checkbox(parent=self.frame_list, protocol_type='qpcr', qpcr_sources=self.sources, qpcr_destinations=self.destinations, qpcr_filepath=self.filepath)
+        checkbox = Checkbox(parent=self.frame_list, protocol_type='qpcr', qpcr_sources=self.sources, qpcr_destinations=self.single_destinations, qpcr_filepath=self.filepath, qpcr_mastermix_pipette=self.protocol_settings()['mastermix_pipette'], qpcr_strip_layout=self.strip_layout, protocol_file=self.protocol_file, run_counts=self.counts)
 
-        checkbox.add_tube_racks(self.window, self.sources, self.destinations)
+        checkbox.add_tube_racks(self.window, self.sources, self.single_destinations)
         self.window.grab_set()
 
 
@@ -427,22 +570,123 @@ class qPCR_protocol_config():
         """
         self.filepath = filedialog.askopenfilename(filetypes=(('CSV files','*.csv'),))
         if self.filepath:
-            [self.destinations, self.sources] = replace_values_qpcr.csv_till_lista(self.filepath)
+            # The plates in the file are read one at a time when they are needed.
+            if self.plate_layouts is not None:
+                self.plate_layouts.close()
+            self.plate_layouts = replace_values_qpcr.read_plate_layouts(self.filepath)
+            self.plate_no = 0
+
+            if self.next_plate():
+                # Enable locked buttons
+                self.next_plate_button.config(state=tk.NORMAL)
+                # Show name of chosen file
+                self.file_name_label.config(text=self.filepath.split('/')[-1], foreground='green', style='text.TLabel')
+                self.file_name_label.grid(row=1, column=0, columnspan=3, padx=10, pady=8, sticky=tk.W)
+            else:
+                messagebox.showerror('Notice', 'No wells were found in the chosen file.')
 
-            self._sources = self.sources
-            replace_values_qpcr.replace_values_qpcr(self.destinations, self.sources)
+    def next_plate(self):
+        """
+        Reads the next plate from the chosen csv-file and creates a protocol for it by calling replace_values_qpcr().
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                True if a new plate was read, False if there are no more plates in the file.
+        """
+        try:
+            [self.destinations, self.sources] = next(self.plate_layouts)
+        except ValueError as error:
+            self.next_plate_button.config(state=tk.DISABLED)
+            messagebox.showerror('Notice', f'Could not read plate {self.plate_no + 1}:\n{error}')
+            return False
+        except StopIteration:
+            self.next_plate_button.config(state=tk.DISABLED)
+            if self.plate_no > 0:
+                messagebox.showinfo('Notice', f'There are no more plates in the file. Plate {self.plate_no} is still selected.')
+            return False
+
+        self.plate_no = self.plate_no + 1
+        self._sources = self.sources
+        self.plate_label.config(text=f'Plate {self.plate_no}')
+        self.write_protocol()
+        return True
+
+    def protocol_settings(self):
+        """
+        Collects the chosen mastermix and tip settings.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
 
-            # Enable locked buttons
+            Returns:
+                A dictionary with the mastermix mode and pipette and the tip policies for samples and standards.
+        """
+        settings = {
+            'sample_tip_policy': self.sample_tip_var.get().strip(),
+            'standard_tip_policy': self.standard_tip_var.get().strip()}
+        if self.distribute_var.get():
+            settings['mastermix_mode'] = 'distribute'
+            settings['mastermix_pipette'] = self.mastermix_pipette_var.get()
+        else:
+            settings['mastermix_mode'] = 'single'
+            settings['mastermix_pipette'] = 'p10_single'
+        return settings
+
+    def write_protocol(self):
+        """
+        Creates the protocol for the current plate with the chosen mastermix settings by calling replace_values_qpcr().
+        If chosen, the full plate columns are given to the 8-channel pipette, which takes them from the PCR strips.
+        Only the rest of the destination wells get sources on the tube racks, and they are then reordered
+        to minimize the travel of the gantry.
+        Running or simulating the protocol is only allowed if it could be created.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing
+        """
+        if self.plate_no == 0:
+            return
+        settings = self.protocol_settings()
+        if self.multichannel_var.get():
+            [single_destinations, multichannel_destination, multichannel_source] = qpcr_planner.split_multichannel(self.destinations)
+        else:
+            [single_destinations, multichannel_destination, multichannel_source] = [self.destinations, None, None]
+            self.strip_layout = []
+        # Used for the tube rack tabs, the printable file and the mastermix information of the estimate.
+        self.single_destinations = single_destinations
+        try:
+            # Tube racks are not placed on the slots needed by the chosen pipettes.
+            slots = replace_values_qpcr.reserved_slots(settings['mastermix_mode'], settings['mastermix_pipette'], self.multichannel_var.get())
+            self.sources = replace_values_qpcr.assign_sources(single_destinations, slots)
+            sizes = replace_values_qpcr.wells_per_aspiration(**settings)
+            ordered_destinations, self.travel = qpcr_planner.order_destinations(single_destinations, self.sources, sizes)
+            self.tips, self.protocol_file = replace_values_qpcr.replace_values_qpcr(ordered_destinations, self.sources, **settings,
+                                                                multichannel_destination=multichannel_destination, multichannel_source=multichannel_source)
+        except ValueError as error:
+            messagebox.showerror('Notice', f'Could not create the protocol:\n{error}')
+            self.estimate_button.config(state=tk.DISABLED)
+            self.prepare_for_run.config(state=tk.DISABLED)
+            self.tip_count_label.config(text='')
+        else:
             self.estimate_button.config(state=tk.NORMAL)
             self.prepare_for_run.config(state=tk.NORMAL)
-            # Show name of chosen file
-            self.file_name_label.config(text=self.filepath.split('/')[-1], foreground='green', style='text.TLabel')
-            self.file_name_label.grid(row=1, column=0, columnspan=3, padx=10, pady=8, sticky=tk.W)
+            self.operations = qpcr_planner.pipetting_operations(single_destinations, multichannel_destination or {})
+            self.counts = time_model.qpcr_counts(ordered_destinations, multichannel_destination, **settings)
+            fast_estimate = protocol_simulator.format_duration(time_model.predict(self.counts))
+            self.tip_count_label.config(text=', '.join(f'{pipette}: {no_tips} tips' for pipette, no_tips in self.tips.items())
+                                        + f', about {fast_estimate}')
+            if multichannel_destination:
+                self.strip_layout = qpcr_planner.strip_layout(multichannel_destination, multichannel_source)
 
     def get_estimate(self):
         """
-        Simulates the protocol using the opentrons_simulate.exe command with the experimental 
-        time estimate feature enabled (-e flag). Shows the result in a message box.
+        Simulates the protocol in the background with protocol_simulator, which uses the experimental time estimate
+        feature of opentrons. The settings can still be changed while it runs. The result is shown by show_estimate()
+        when the simulation is done, unless the protocol has been changed since the simulation started.
 
             Parameters:
                 self:           Allows the function to access class attributes and methods
@@ -450,9 +694,42 @@ class qPCR_protocol_config():
             Returns:
                 Nothing 
         """
-        run = subprocess.run(f"opentrons_simulate.exe -e {protocol_qpcr_local_filepath}{protocol_qpcr_name}", capture_output=True, text=True)
-        self.qPCR_estimate = run.stdout.split('\n')[-4]
-        messagebox.showinfo('Protocol estimate', f'{self.qPCR_estimate}')
+        self.new_estimate = not os.path.exists(protocol_simulator.cache_filepath(self.protocol_file))
+        self.estimated_counts = self.counts
+        self.background_estimate.start(self.protocol_file, self.show_estimate)
+
+    def show_estimate(self, result, error):
+        """
+        Shows the result of the simulation started by get_estimate() in a message box,
+        together with the mastermix, tip, travel and dispense information of the protocol.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                result (dict):  The estimate, see protocol_simulator.simulate()
+                error (str):    Description of the error if the protocol could not be simulated, otherwise None
+
+            Returns:
+                Nothing 
+        """
+        if error:
+            messagebox.showerror('Protocol estimate', f'The protocol could not be simulated:\n{error}')
+            return
+        if self.new_estimate:
+            # Saved to calibrate time_model with.
+            time_model.record_observation(self.estimated_counts, result['total'], 'simulation')
+        if self.background_estimate.protocol_file_changed(self.protocol_file):
+            return
+        self.qPCR_estimate = protocol_simulator.summary(result)
+        settings = self.protocol_settings()
+        # The mastermix in full columns is dispensed by the 8-channel pipette, not from the tube racks.
+        wells_per_aspiration, aspirations = replace_values_qpcr.mastermix_aspirations(self.single_destinations, settings['mastermix_mode'], settings['mastermix_pipette'])
+        mastermix_info = f"Mastermix: {settings['mastermix_mode']} mode with {settings['mastermix_pipette']}, "\
+                         f"{wells_per_aspiration} wells per aspiration, {aspirations} aspirations"
+        tip_info = 'Tips: ' + ', '.join(f'{pipette}: {no_tips}' for pipette, no_tips in self.tips.items())
+        travel_info = f"Gantry travel: {self.travel['before']/1000:.1f} m in file order, {self.travel['after']/1000:.1f} m reordered "\
+                      f"({self.travel['time_saved']:.0f} s saved)"
+        operations_info = f'Dispenses: {self.operations[1]} ({self.operations[0]} with the single-channel pipette only)'
+        messagebox.showinfo('Protocol estimate', f'{self.qPCR_estimate}\n\n{mastermix_info}\n{tip_info}\n{travel_info}\n{operations_info}')
 
     def back(self):
         """
@@ -465,9 +742,251 @@ class qPCR_protocol_config():
             Returns:
                 Nothing 
         """
+        self.background_estimate.cancel()
         self.frame.destroy()
         Selector()
 
+class Background_estimate():
+    """
+    Runs the simulation of a protocol in a protocol_simulator.Estimation_worker process, so that the window can still
+    be used while it runs. Shows a progress bar with the time since the simulation started and a button to cancel it.
+    The results are collected by checking the results queue with after(), in the same way as the ssh check in Checkbox().
+
+        Attributes:
+            parent:                 Which frame to add the progress bar to
+            protocol_file (list):   The protocol that is being simulated, None if no simulation is running
+
+        Methods:
+            start():
+                Starts simulating a protocol.
+            check_result():
+                Checks if the simulation is done.
+            cancel():
+                Stops the simulation.
+            protocol_file_changed():
+                Checks if a result is for another protocol than the current one.
+    """
+    def __init__(self, parent, row, column):
+        """
+        Constructs the attributes of the Background_estimate() object.
+
+            Parameters:
+                parent:             Which frame to add the progress bar to
+                row (int):          Row of the frame to place the progress bar on
+                column (int):       Column of the frame to place the progress bar on
+
+            Returns:
+                Nothing.
+        """
+        self.parent = parent
+        self.row = row
+        self.column = column
+        self.worker = None
+        self.protocol_file = None
+        self.last_protocol_file = None
+        self.frame = None
+
+    def start(self, protocol_file, callback):
+        """
+        Starts simulating a protocol. A simulation that is already running is canceled first.
+        The worker process is started the first time and then reused, so opentrons is only imported once.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                protocol_file (list):   Folder and filename of the protocol
+                callback:               Function called with the result and the error when the simulation is done
+
+            Returns:
+                Nothing.
+        """
+        self.cancel()
+        if self.worker is None:
+            self.tasks = multiprocessing.Queue()
+            self.results = multiprocessing.Queue()
+            self.worker = protocol_simulator.Estimation_worker(self.tasks, self.results)
+            self.worker.start()
+
+        self.protocol_file = protocol_file
+        self.last_protocol_file = protocol_file
+        self.callback = callback
+        self.start_time = time.time()
+        self.tasks.put(protocol_file)
+
+        self.frame = ttk.Frame(self.parent)
+        self.frame.grid(row=self.row, column=self.column, columnspan=3, padx=10, pady=5, sticky=tk.W)
+        self.progress = ttk.Progressbar(self.frame, orient=tk.HORIZONTAL, length=200, mode='indeterminate')
+        self.progress.grid(row=0, column=0, padx=5)
+        self.progress.start(10)
+        self.status = ttk.Label(self.frame, text='Simulating...', style='text.TLabel')
+        self.status.grid(row=0, column=1, padx=5)
+        self.cancel_button = ttk.Button(self.frame, text='Cancel', command=self.cancel, style='my.small.TButton')
+        self.cancel_button.grid(row=0, column=2, padx=5)
+
+        self.frame.after(200, self.check_result)
+
+    def check_result(self):
+        """
+        Checks if the simulation is done. If it is, the progress bar is removed and the callback is called,
+        otherwise the time since the start is updated and the check is done again after 200 ms.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        if self.protocol_file is None: # Canceled
+            return
+        try:
+            [protocol_file, result, error] = self.results.get_nowait()
+        except queue.Empty:
+            self.status.config(text=f'Simulating... {time.time() - self.start_time:.0f} s')
+            self.frame.after(200, self.check_result)
+        else:
+            self.remove_progress()
+            self.protocol_file = None
+            self.callback(result, error)
+
+    def cancel(self):
+        """
+        Stops the simulation by terminating the worker process. A new worker process is started by the next simulation.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        if self.protocol_file is None:
+            return
+        self.worker.terminate()
+        self.worker = None
+        self.protocol_file = None
+        self.remove_progress()
+
+    def remove_progress(self):
+        """
+        Removes the progress bar, status text and cancel button.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        if self.frame is not None:
+            self.frame.destroy()
+            self.frame = None
+
+    def protocol_file_changed(self, protocol_file):
+        """
+        Checks if the protocol has been changed since the last simulation was started.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                protocol_file (list):   Folder and filename of the current protocol
+
+            Returns:
+                True if the last simulation was for another protocol.
+        """
+        return protocol_file != self.last_protocol_file
+
+class Run_log():
+    """
+    Scrolling text box that shows the output of a run on the robot, with the progress of the run below it.
+
+        Attributes:
+            parent:                 Which frame to add the log to
+            cancel:                 Function called by the cancel button, or None for no button
+
+        Methods:
+            add_lines():
+                Adds lines at the end of the log.
+            clear():
+                Removes all lines.
+            show_progress():
+                Shows the progress of the run.
+    """
+    def __init__(self, parent, row, column, cancel=None):
+        """
+        Constructs the attributes of the Run_log() object and places the text box on the frame.
+
+            Parameters:
+                parent:             Which frame to add the log to
+                row (int):          Row of the frame to place the log on
+                column (int):       Column of the frame to place the log on
+                cancel:             Function called by the cancel button, or None for no button
+
+            Returns:
+                Nothing.
+        """
+        self.parent = parent
+        self.frame = ttk.Frame(self.parent)
+        self.frame.grid(row=row, column=column, columnspan=3, padx=20, pady=10, sticky=tk.W)
+        self.text = tk.Text(self.frame, height=12, width=90, state=tk.DISABLED, wrap=tk.NONE)
+        self.text.grid(row=0, column=0)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.text.yview)
+        self.scrollbar.grid(row=0, column=1, sticky=tk.NS)
+        self.text.config(yscrollcommand=self.scrollbar.set)
+        self.progress = ttk.Progressbar(self.frame, orient=tk.HORIZONTAL, length=400, mode='determinate', maximum=1)
+        self.progress.grid(row=1, column=0, pady=5, sticky=tk.W)
+        self.status = ttk.Label(self.frame, text='Waiting for the simulation of the protocol to show the progress', font=font)
+        self.status.grid(row=2, column=0, sticky=tk.W)
+        if cancel is not None:
+            self.cancel_button = ttk.Button(self.frame, text='Cancel run', command=cancel, style='my.small.TButton')
+            self.cancel_button.grid(row=1, column=0, pady=5, sticky=tk.E)
+
+    def add_lines(self, lines):
+        """
+        Adds lines at the end of the log and scrolls down to them. The oldest lines are removed
+        when there are more than run_log_max_lines.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                lines (list):       The lines to add
+
+            Returns:
+                Nothing.
+        """
+        if not lines:
+            return
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, ''.join(f'{line}\n' for line in lines))
+        no_lines = int(self.text.index('end-1c').split('.')[0]) - 1
+        if no_lines > run_log_max_lines:
+            self.text.delete('1.0', f'{no_lines - run_log_max_lines + 1}.0')
+        self.text.see(tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    def clear(self):
+        """
+        Removes all lines from the log.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    def show_progress(self, text, fraction):
+        """
+        Shows the progress of the run.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                text (str):         Description of the progress, see run_progress.Progress_tracker.status_text()
+                fraction (float):   How much of the run is done, from 0 to 1
+
+            Returns:
+                Nothing.
+        """
+        self.progress.config(value=fraction)
+        self.status.config(text=text)
+
 class Tube_rack_base():
     """
     Base frame with notebook tabs. Function to add new tabs.
@@ -647,21 +1166,40 @@ class Checkbox:
                 Creates a Queue object used to determine if a ssh connection can be established.
             try_connection():
                 Checks if an item is returned from the Queue object, i.e a connection was established.
+            prepare_robot():
+                Stops opentrons-robot-server, and uploads and starts robot_agent.py on the robot if warm_agent is True.
             run_protocol():
-                Uploads the protocol using the scp_transfer() function and then executes the run. Times out if it takes longer than 5 seconds.
-                Also checks if the protocol was completed successfully or not.
+                Starts the run in a separate thread, with a log of the output.
+            cancel_run():
+                Asks the user and stops the run in a separate thread with stop_run().
+            prepare_run():
+                Uploads the protocol using the scp_transfer() function while the robot is homed. The upload times out if it takes longer than 5 seconds.
+            sync_files():
+                Uploads the files that are missing or have changed on the robot, with the progress shown in the log.
+            check_run():
+                Shows the output and the progress of the run in the log while it runs.
+            check_steps():
+                Gets the simulated steps of the protocol, used to follow the progress of the run.
+            run_complete():
+                Tells the user if the protocol was completed successfully or not.
             scp_transfer():
-                Function used for multiprocessing, uploads the protocol to the robot, used in the run_protocol() function.
+                Uploads the protocol to the robot if it is missing or has changed, used in the prepare_run() function.
             execute_run():
-                Runs the protocol on the robot, used in the run_protocol() function.
+                Starts the protocol on the robot in a separate thread, used in the run_protocol() function.
             quit():
                 Asks the user if they want to exit the program, if yes, quits in a safe manner.
-            change_ip():
-                A function that changes between the two most common ip-addresses to the robot.
+            start_step_estimate():
+                Simulates the protocol in the background, to follow the progress of the run.
+            add_to_queue():
+                Adds a protocol created earlier to the run queue.
+            remove_from_queue():
+                Removes the selected protocol from the run queue.
+            run_next_queued():
+                Asks the user to reload the deck and runs the next protocol of the run queue.
             create_printable_file()
                 Creates a summary of all tube racks in a .txt file in the same directory as the .csv used as template.  
     """
-    def __init__(self, parent, protocol_type: str, num_samples=None, sample_vol=None, ratio=None, EB=None, etoh=None, qpcr_sources=None, qpcr_destinations=None, qpcr_filepath=None):
+    def __init__(self, parent, protocol_type: str, num_samples=None, sample_vol=None, ratio=None, EB=None, etoh=None, qpcr_sources=None, qpcr_destinations=None, qpcr_filepath=None, qpcr_mastermix_pipette='p10_single', qpcr_strip_layout=None, protocol_file=None, run_counts=None):
         """
         Constructs Tkinter class variables, methods and parameters needed for the Checkbox() object.
 
@@ -676,23 +1214,51 @@ class Checkbox:
                 qpcr_sources (dict):        Which well has which mixture on which tube rack in qPCR protocols.
                 qpcr_destinations(dict):    Which well on the PCR plate will get which mixture in qPCR protocols. 
                 qpcr_filepath(dict):        Filepath to the .csv file that a qPCR protocol gets made from. 
+                qpcr_mastermix_pipette(str):    Pipette used for the mastermixes in qPCR protocols.
+                qpcr_strip_layout(list):        What to put in each column of PCR strips for the 8-channel pipette in qPCR protocols.
+                protocol_file(list):            Folder and filename of the created protocol, see replace_values.write_protocol().
+                run_counts(dict):               Number of each command of the protocol, see time_model. Saved with the
+                                                duration of a completed run to calibrate time_model with.
 
             Returns:
                 Nothing.
         """
         
-        self.ip = ip1
+        # The robot found earlier in the session, if any.
+        self.ip = robot_discovery.cached_robot or ip1
         self.parent = parent
         self.frame = ttk.Frame(self.parent)
         self.frame.pack()
         self.protocol_type = protocol_type
+        self.run_counts = run_counts
+        # Opened when the connection has been checked and then used for every command to the robot.
+        self.session = None
+        # Thread that stops opentrons-robot-server after the connection has been checked, see prepare_robot().
+        self.robot_preparation = None
+        self.run_log = None
+        self.connected = False
+        self.running = False
+        self.quitting = False
+        # Protocols run after this one, over the same connection.
+        self.run_queue = run_queue.Run_queue([custom_labware_filepath])
 
         # Layout differences between the protocols.
         if self.protocol_type.startswith('qpcr'): # qPCR protocol'
-            self.protocol = [protocol_qpcr_local_filepath, protocol_qpcr_name]
+            self.protocol = protocol_file
             self.image_name = 'Deck Images\\deck_qpcr.gif'
             self.pipette_text = '\n     Left: P10 single-channel\
                 \n     Right: Any'
+            [mount, tip_rack, _] = replace_values_qpcr.mastermix_pipettes[qpcr_mastermix_pipette]
+            if mount == 'right':
+                self.pipette_text = '\n     Left: P10 single-channel\
+                    \n     Right: ' + qpcr_mastermix_pipette + '\
+                    \n     Place ' + tip_rack + ' on slot ' + str(replace_values_qpcr.mastermix_tip_rack_slot)
+            if qpcr_strip_layout:
+                self.pipette_text = '\n     Left: P10 single-channel\
+                    \n     Right: P10 8-channel\
+                    \n     Place opentrons_96_tiprack_10ul on slot ' + str(replace_values_qpcr.multichannel_tip_rack_slot) + '\
+                    \n     Place PCR strips in an aluminum block on slot ' + str(replace_values_qpcr.multichannel_source_slot) + ':\
+                    \n       ' + '\n       '.join(qpcr_strip_layout)
             self.volumes_label = '4. Fill each tube rack according to its tab\
                 \n    The tabs can be selected on the row above the image\
                 \n\n5. Do not forget the aluminum block under the PCR plate'
@@ -706,12 +1272,12 @@ class Checkbox:
             self.print_file_button.grid(row=22, column=1, padx=20, pady=10, ipadx=10, ipady=3)
 
         elif self.protocol_type.startswith('dna') and num_samples > 8: # 9-96 DNA cleaning
-            columns=math.ceil(num_samples/8)
-            beads=sample_vol*ratio*columns+60
-            vol_eb=EB*columns+60
-            vol_etoh=etoh*200+100
+            volumes = replace_values.reagent_volumes(num_samples, sample_vol, ratio, etoh, EB)
+            beads = volumes['beads']
+            vol_eb = volumes['eb']
+            vol_etoh = volumes['etoh']
 
-            self.protocol = [protocol_local_filepath, protocol_dna_name]
+            self.protocol = protocol_file
             # self.image_name = 'Deck Images\\deck_96.gif'
             self.pipette_text = '\n     Left: P10 8-channel\
                 \n     Right: P300 8-channel'
@@ -727,12 +1293,12 @@ class Checkbox:
             # self.add_image(self.image_frame, self.image_name)
 
         elif self.protocol_type.startswith('dna') and num_samples <= 8: # 1-8 DNA cleaning
-            columns=math.ceil(num_samples/8)
-            beads=sample_vol*ratio*columns+60
-            vol_eb=EB*columns+60
-            vol_etoh=etoh*200+100
+            volumes = replace_values.reagent_volumes(num_samples, sample_vol, ratio, etoh, EB)
+            beads = volumes['beads']
+            vol_eb = volumes['eb']
+            vol_etoh = volumes['etoh']
             
-            self.protocol = [protocol_local_filepath, protocol_dna_name]
+            self.protocol = protocol_file
             # self.image_name = 'Deck Images\\deck_less_8.gif'
             self.pipette_text = '\n     Left: P10 8-channel\
                 \n     Right: P300 8-channel'
@@ -776,6 +1342,45 @@ class Checkbox:
         self.connection_status = ttk.Label(self.frame, text='   Check connection\n     to continue', font=font, foreground= 'red')
         self.connection_status.grid(row=3, column=2, columnspan =2, sticky=tk.NW, padx=20, pady=0)
 
+        # Run queue
+        self.queue_frame = ttk.Frame(self.frame)
+        self.queue_frame.grid(row=24, column=1, columnspan=3, padx=20, pady=10, sticky=tk.W)
+        self.queue_label = ttk.Label(self.queue_frame, text='Protocols to run after this one:', font=font)
+        self.queue_label.grid(row=0, column=0, columnspan=3, sticky=tk.W)
+        self.queue_list = tk.Listbox(self.queue_frame, height=4, width=90)
+        self.queue_list.grid(row=1, column=0, columnspan=3, sticky=tk.W)
+        self.add_queue_button = ttk.Button(self.queue_frame, text='Add protocol', command=self.add_to_queue, style='my.small.TButton')
+        self.add_queue_button.grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        self.remove_queue_button = ttk.Button(self.queue_frame, text='Remove', command=self.remove_from_queue, style='my.small.TButton')
+        self.remove_queue_button.grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        self.start_queue_button = ttk.Button(self.queue_frame, text='Run next', command=self.run_next_queued, style='my.small.TButton')
+        self.start_queue_button.grid(row=2, column=2, padx=5, pady=5, sticky=tk.W)
+
+        self.start_step_estimate()
+
+    def start_step_estimate(self):
+        """
+        Simulates the steps of the protocol in the background while the robot is prepared, to show the progress of the run.
+        The result is collected by check_steps(). Not done with the 'http' deploy_backend, since the commands of the
+        robot server are not the same as the output of opentrons_execute that the steps are matched with.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing.
+        """
+        self.progress_tracker = None
+        if deploy_backend == 'http':
+            self.step_results = None
+            return
+        self.step_tasks = multiprocessing.Queue()
+        self.step_results = multiprocessing.Queue()
+        self.step_worker = protocol_simulator.Estimation_worker(self.step_tasks, self.step_results)
+        self.step_worker.start()
+        self.step_tasks.put(self.protocol)
+        self.step_tasks.put(None) # Stops the worker when the protocol is simulated
+
     def add_image(self, parent, image_path):
         """
         Adds an image to the checkbox window.
@@ -818,11 +1423,10 @@ class Checkbox:
 
     def check_ssh(self):
         """
-        Checks if it is possible to connect by SSH. Creates a Queue object and passes it to a Process subclass, Threaded_ssh_check().
-        The queue creates a connection between the main process (the UI) and this new process. When the process is started, 
-        its run() method is executed, which tries to create a socket connection to the robot ip.
-        After 1 second, calls try_connection() to check if the queue is empty, i.e. if the attempts at creating a socket conneciton is 
-        finished. If not, checks again in 3 seconds.
+        Checks if it is possible to connect by SSH. Creates a Queue object and passes it to a Thread subclass, Threaded_ssh_check().
+        The queue creates a connection between the UI and this new thread. When the thread is started, 
+        its run() method is executed, which searches for the robot with robot_discovery.discover().
+        Calls try_connection() every probe_poll_interval ms until the search is finished.
             
             Parameters:
                 self:                   Allows the function to access class attributes and methods
@@ -844,17 +1448,18 @@ class Checkbox:
         self.connection_button.config(state=tk.DISABLED)
 
 
-        self.queue = multiprocessing.Queue()
-        self.process = Threaded_ssh_check(self.queue, self.ip)
+        print('Searching for the robot')
+        self.queue = queue.Queue()
+        self.process = Threaded_ssh_check(self.queue, [self.ip, ip1, ip2], discovery_subnet, probe_timeout, probe_retries, probe_retry_delay)
         self.process.start()
 
-        self.connection_progress.after(1000, self.try_connection)
+        self.connection_progress.after(probe_poll_interval, self.try_connection)
  
     def try_connection(self):
         """
-        Checks if a connection can be established and prepares the robot for running a protocol. If an item was returned by the get_nowait()
-        function then a connection was established. If no item was returned and the Empty exception wasn't raised, then a connection couldn't
-        be established. If the Empty exception is raised it tries to establish a connection again after 3 seconds.
+        Checks if a connection can be established and prepares the robot for running a protocol. If an ip was returned by the get_nowait()
+        function then the robot was found on that ip. If None was returned, then the robot couldn't be found.
+        If the Empty exception is raised it checks the queue again after probe_poll_interval ms.
             
             Parameters:
                 self:                   Allows the function to access class attributes and methods
@@ -864,33 +1469,91 @@ class Checkbox:
         """
         try:
             # valid_connection = True
-            valid_connection = self.queue.get_nowait()
+            robot_ip = self.queue.get_nowait()
         except queue.Empty:
-            print(f'Attempting to connect to {self.ip}')
-            self.connection_progress.after(3000, self.try_connection)
+            self.connection_progress.after(probe_poll_interval, self.try_connection)
         else:
-            if not valid_connection:
+            if robot_ip is None:
                 self.connection_button.config(state=tk.NORMAL)
                 self.connection_status.config(text='   Connection failed', foreground='red')
                 self.connection_progress.destroy()
-                self.change_ip()
+                robot_discovery.forget()
                 
-            elif valid_connection:
+            else:
+                print(f'Robot found on {robot_ip}')
+                self.ip = robot_ip
+                robot_discovery.remember(robot_ip)
                 self.connection_button.config(state=tk.NORMAL)
                 self.run_protocol_button.config(state=tk.NORMAL)
                 self.connection_status.config(text='   Connection OK', foreground='green')
                 self.connection_progress.destroy()
+                self.connected = True
+
+                if deploy_backend == 'ssh':
+                    # The session is kept if the connection is checked again, and replaced if the robot has a new ip.
+                    if self.session is not None and self.session.ip != self.ip:
+                        self.session.close()
+                        self.session = None
+                    if self.session is None:
+                        self.session = robot_session.Robot_session(self.ip, username, key_filename)
+                    # Done in the background, since the commands wait for the robot and the robot is homed when the agent starts.
+                    self.robot_preparation = threading.Thread(target=self.prepare_robot, daemon=True)
+                    self.robot_preparation.start()
+
+    def prepare_robot(self):
+        """
+        Stops opentrons-robot-server, and uploads robot_agent.py and starts it on the robot if warm_agent is True,
+        so that opentrons is loaded and the robot is homed while the deck is prepared. Run in a separate thread by
+        try_connection(), which prepare_run() waits for before the run starts.
 
-                print('Preparing robot to run by stopping opentrons-robot-server')
-                subprocess.run(f'ssh -i {key_filename} {username}@{self.ip} -t "sh -lic" \'systemctl stop opentrons-robot-server\'')
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing. 
+        """
+        print('Preparing robot to run by stopping opentrons-robot-server')
+        try:
+            self.session.run('systemctl stop opentrons-robot-server')
+        except robot_session.session_errors as error:
+            print(f'Could not stop opentrons-robot-server: {error}')
+        if warm_agent:
+            try:
+                self.session.sync([['robot_agent.py', agent_robot_filepath]])
+                self.session.run(f'python3 {agent_robot_filepath} start')
+            except robot_session.session_errors as error:
+                print(f'Could not start the agent on the robot: {error}')
    
     def run_protocol(self):
         """
-        Uploads the new protocol using: scp -i <key> <file_to_upload> <where_to_place_it>
-        Then launches the new protocol using: ssh -i <key> <login> -t "sh -lic" <command>
-        The sh -lic makes the following command (c) run in an interactive (i) and login (l) shell,
-        which is required to initialize everything correctly. Else the robot cannot use 
-        any labware or find calibration data. 
+        Starts the run with execute_run(). The run is done in a separate thread, so that the window can be used
+        during the run, and the output is shown in the log.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing. 
+        """
+        self.running = True
+        self.run_protocol_button.config(state=tk.DISABLED)
+        if self.run_log is None:
+            self.run_log = Run_log(self.frame, row=23, column=1, cancel=self.cancel_run)
+        self.run_log.clear()
+        self.run_log.cancel_button.config(state=tk.NORMAL)
+        self.steps_missing_at_start = self.step_results is not None
+        if self.progress_tracker is not None:
+            self.progress_tracker = run_progress.Progress_tracker(self.progress_tracker.steps)
+        if deploy_backend == 'http':
+            self.run_log.show_progress('Progress not available with the http deploy_backend, see the log', 0)
+        self.start_time = time.time()
+        self.execute_run()
+        self.frame.after(run_log_poll_interval, self.check_run)
+
+    def cancel_run(self):
+        """
+        Asks the user if the run should be cancelled, and then stops it with stop_run() in a separate thread.
+        The run ends as a failed run in check_run().
 
             Parameters:
                 self:                   Allows the function to access class attributes and methods
@@ -898,71 +1561,316 @@ class Checkbox:
             Returns:
                 Nothing. 
         """
+        if not self.running:
+            return
+        if not messagebox.askyesno('Cancel run', 'Do you want to cancel the run?', parent=self.parent):
+            return
+        self.run_log.cancel_button.config(state=tk.DISABLED)
+        threading.Thread(target=self.stop_run, daemon=True).start()
+
+    def stop_run(self):
+        """
+        Stops the run. With robot_agent.py the run is cancelled before its next command, otherwise the command
+        on the robot is stopped when its connection is closed, or the run is stopped through the HTTP API.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
         
-        # Upload the new protocol using 
-        # scp -i <key> <file_to_upload> <where_to_place_it>
-        # Defines the multiprocess to be able to handle errors when transferring the protocol to the robot via SCP.
-        time_process = multiprocessing.Process(target=self.scp_transfer(self.protocol), name="SCP transfer")
-        time_process.start()
-        time_process.join(5)
-        # Throws an error if the upload takes more than 5 seconds as it should happen almost instantly. 
-        if time_process.is_alive():
-            time_process.terminate()
-            messagebox.showerror('Transfer Error!','An error occured during the transfer of the protocol file to the robot.')
-            try:
-                time_process.close()
-            except ValueError:
-                print('Time process still running')
-        else:
-            # Successful upload with scp so continue to execution. 
-            try:
-                log = self.execute_run()
-            except ProcessError:
-                print('There was an error starting the run.')
+            Returns:
+                Nothing. 
+        """
+        try:
+            if deploy_backend == 'ssh' and warm_agent:
+                self.session.run(f'python3 {agent_robot_filepath} cancel')
+            self.run_worker.stop()
+        except robot_session.session_errors + robot_http.http_errors as error:
+            print(f'Could not cancel the run: {error}')
 
-            # The protocol has "print('Protocol Complete')" as a final step.
-            if 'Protocol Complete' in log:
-                # self.run_complete(True)
-                messagebox.showinfo('Run Completed', 'Protocol was completed successfully!', parent=self.parent)
+    def prepare_run(self, report):
+        """
+        Prepares the robot for the run with launcher.run_stages(), so that the stages are done at the same time:
+        the protocol is uploaded while robot_agent.py homes the robot (if warm_agent is True and the robot has moved
+        since the agent homed it) and the definition of the custom tube rack is uploaded (for qPCR). The run then
+        starts without homing again. Files are only uploaded if they are
+        missing or have changed on the robot, see robot_session.Robot_session.sync(). Run by the
+        robot_session.Execution_worker before the protocol is started, so the run only starts when all stages are done,
+        and after prepare_robot() is done. Without the agent, only the uploads are done at the same time, since
+        opentrons_execute homes the robot when the run starts.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                report:                 Function that shows a line in the log
+        
+            Returns:
+                Nothing.
+        """
+        if self.robot_preparation is not None:
+            self.robot_preparation.join()
+        labware = []
+        if self.protocol_type.startswith('qpcr'):
+            labware = [[custom_labware_filepath, f'{protocol_robot_filepath}{custom_labware_name}']]
+
+        def upload_protocol():
+            self.scp_transfer(self.protocol, report)
+
+        def load_labware():
+            self.sync_files(labware, report)
+            if warm_agent:
+                # The agent only homes the robot if it has moved since it was homed, and tells which in the log.
+                # The run then starts without homing, see robot_agent.py.
+                command = f"python3 {agent_robot_filepath} prepare {' '.join(remote for [_, remote] in labware)}"
+                for line in self.session.stream(command):
+                    report(line)
+                if self.session.last_exit_status != 0:
+                    raise robot_session.Remote_command_error(f"'{command}' failed with exit status {self.session.last_exit_status}")
+
+        stages = {'Upload protocol': upload_protocol}
+        if warm_agent or labware:
+            stages['Home robot and load labware' if warm_agent else 'Upload labware'] = load_labware
+        lines = launcher.describe(launcher.run_stages(stages))
+        if not warm_agent:
+            lines.append('The robot is homed by opentrons_execute after the upload, set warm_agent = True in main.py to home it during the upload')
+        for line in lines:
+            print(line)
+            report(line)
+
+    def sync_files(self, files, report):
+        """
+        Uploads the files that are missing or have changed on the robot, and reports the progress of each upload
+        at every 25 %.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                files (list):           The files as [local_filepath, remote_filepath]
+                report:                 Function that shows a line in the log
+        
+            Returns:
+                Nothing.
+        """
+        if not files:
+            return
+        reported = {}
+
+        def progress(filepath, sent, size):
+            percent = 100 if size == 0 else 100*sent // size
+            if percent // 25 > reported.get(filepath, -1):
+                reported[filepath] = percent // 25
+                report(f'Uploading {filepath}: {percent} %')
+
+        uploaded = self.session.sync(files, progress)
+        for [local_filepath, _] in files:
+            if local_filepath not in uploaded:
+                report(f'{local_filepath} is already on the robot')
+
+    def check_run(self):
+        """
+        Moves the output of the run from the queue to the log and updates the progress of the run. Checks again
+        after run_log_poll_interval ms until the run is done, and then calls run_complete().
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing. 
+        """
+        if self.quitting: # The run is stopped by release_robot().
+            return
+        self.check_steps()
+        lines = []
+        try:
+            # At most a full queue at a time, so that the window is updated even if the robot prints a lot.
+            for _ in range(run_log_queue_size):
+                message = self.run_lines.get_nowait()
+                if message[0] == 'done':
+                    self.run_log.add_lines(lines)
+                    self.run_complete(message[1], message[2])
+                    return
+                print(message[1])
+                lines.append(message[1])
+                if self.progress_tracker is not None:
+                    self.progress_tracker.update(message[1])
+        except queue.Empty:
+            pass
+        self.run_log.add_lines(lines)
+        if self.progress_tracker is not None:
+            self.run_log.show_progress(self.progress_tracker.status_text(), self.progress_tracker.fraction())
+        self.frame.after(run_log_poll_interval, self.check_run)
+
+    def check_steps(self):
+        """
+        Creates the run_progress.Progress_tracker when the simulation of the protocol is done. If the run has already
+        started, the tracker finds its place in the protocol again with the next lines of output.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing. 
+        """
+        if self.progress_tracker is not None or self.step_results is None:
+            return
+        try:
+            [_, result, error] = self.step_results.get_nowait()
+        except queue.Empty:
+            return
+        self.step_results = None
+        if error:
+            print(f'The protocol could not be simulated, so the progress of the run can not be shown:\n{error}')
+            self.run_log.show_progress('Progress not available, the protocol could not be simulated', 0)
+            return
+        # The window is wider than normal, so that a run that has already started is found again.
+        self.progress_tracker = run_progress.Progress_tracker(result['steps'], window=len(result['steps']) if self.steps_missing_at_start else 200)
+
+    def run_complete(self, completed, error):
+        """
+        Tells the user if the protocol was completed successfully or not, and saves the duration of completed runs
+        to calibrate time_model with.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                completed (bool):       If the protocol printed 'Protocol Complete'
+                error (str):            Description of the error if the run couldn't be started, otherwise None
+        
+            Returns:
+                Nothing. 
+        """
+        self.running = False
+        self.run_protocol_button.config(state=tk.NORMAL)
+        self.run_log.cancel_button.config(state=tk.DISABLED)
+        if error is not None:
+            print(f'There was an error starting the run: {error}')
+            messagebox.showerror('Run Error!', f'An error occured when the protocol was transferred to or started on the robot:\n{error}', parent=self.parent)
+            return
+        if completed:
+            self.run_log.show_progress(f'Run completed in {protocol_simulator.format_duration(time.time() - self.start_time)}', 1)
+
+        if completed:
+            if self.run_counts:
+                time_model.record_observation(self.run_counts, time.time() - self.start_time, 'run')
+            if len(self.run_queue) > 0:
+                # The next protocol asks the user to reload the deck before it starts.
+                self.run_next_queued('Protocol was completed successfully!\n\n')
             else:
-                # self.run_complete(False)
-                messagebox.showwarning('Run Failed!', 'Protocol was canceled before completing,\neither due to an error or it was canceled by the user.', parent=self.parent)
+                messagebox.showinfo('Run Completed', 'Protocol was completed successfully!', parent=self.parent)
+        else:
+            # The queue is not continued, so that the user can check the robot first.
+            messagebox.showwarning('Run Failed!', 'Protocol was canceled before completing,\neither due to an error or it was canceled by the user.', parent=self.parent)
+
+    def add_to_queue(self):
+        """
+        Asks the user for a protocol created earlier and adds it to the run queue, if it can be run.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing. 
+        """
+        filepath = filedialog.askopenfilename(parent=self.parent, title='Choose a protocol', initialdir=self.protocol[0],
+                                              filetypes=[('Protocols', '*.py')])
+        if not filepath:
+            return
+        [folder, filename] = os.path.split(filepath)
+        protocol_file = [os.path.join(folder, ''), filename]
+        problems = self.run_queue.add(protocol_file)
+        if problems:
+            messagebox.showerror('Protocol not added', '\n'.join(problems), parent=self.parent)
+            return
+        self.queue_list.insert(tk.END, run_queue.describe(protocol_file))
+
+    def remove_from_queue(self):
+        """
+        Removes the selected protocol from the run queue.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+        
+            Returns:
+                Nothing. 
+        """
+        for index in reversed(self.queue_list.curselection()):
+            self.run_queue.remove(index)
+            self.queue_list.delete(index)
+
+    def run_next_queued(self, message=''):
+        """
+        Runs the next protocol of the run queue. The protocol is validated again, and the user is asked to reload
+        the deck for it before it starts. If the user cancels, the protocol stays first in the queue.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                message (str):          Text shown before the question, e.g. that the last run was completed
+        
+            Returns:
+                Nothing. 
+        """
+        if len(self.run_queue) == 0 or self.running:
+            return
+        if not self.connected:
+            messagebox.showerror('Not connected', 'Check the connection before running the queue.', parent=self.parent)
+            return
+        protocol_file = self.run_queue.peek()
+        problems = run_queue.validate(protocol_file, self.run_queue.labware_filepaths)
+        if problems:
+            messagebox.showerror('Protocol can not be run', '\n'.join(problems), parent=self.parent)
+            return
+        ready = messagebox.askokcancel('Next protocol', f'{message}Reload the deck and the liquids for the next protocol:\n'
+                                       f'{run_queue.describe(protocol_file, no_values=10)}\n\n'
+                                       'Press OK when the robot is ready to start it.', parent=self.parent)
+        if not ready:
+            return
+        self.run_queue.pop()
+        self.queue_list.delete(0)
+        self.protocol = protocol_file
+        self.protocol_type = run_queue.protocol_type(protocol_file)
+        self.run_counts = None # Only known for the protocol the window was opened for
+        self.start_step_estimate()
+        self.run_protocol()
     
-    def scp_transfer(self, protocol):
+    def scp_transfer(self, protocol, report):
         """
-        Uploads a protocol using scp.
-        Done as a separate function to enable checking for errors.
+        Uploads a protocol over the ssh session, if it isn't already on the robot. Raises one of
+        robot_session.session_errors if the upload fails, takes longer than 5 seconds or the file on the robot
+        differs from the protocol afterwards.
 
             Parameters:
                 self:                   Allows the function to access class attributes and methods
-                protocol (str):         The protocol that is uploaded to the robot.
+                protocol (list):        The folder and filename of the protocol that is uploaded to the robot.
+                report:                 Function that shows a line in the log
         
             Returns:
                 Literally nothing. 
         """
-        subprocess.run(f'scp -i {key_filename} {protocol[0]}{protocol[1]} {username}@{self.ip}:{protocol_robot_filepath}{protocol[1]}')
+        self.sync_files([[f'{protocol[0]}{protocol[1]}', f'{protocol_robot_filepath}{protocol[1]}']], report)
         return  
 
     def execute_run(self):
         """
-        Starts the robot by calling for 'opentrons_execute' over SSH using a subprocess.
-        Saves the output in a log, which is also continuously printed so that it is also visible
-        to the user. 
+        Prepares the robot with prepare_run() and then starts it by calling for 'opentrons_execute', or robot_agent.py
+        if warm_agent is True, over the ssh session in a robot_session.Execution_worker thread,
+        or with the 'http' deploy_backend by uploading and starting the protocol in a robot_http.Http_execution_worker thread.
+        The output is put in the run_lines queue, which is read by check_run().
 
             Parameters:
                 self:               Allows the function to access class attributes and methods
             
             Returns:
-                log (list):         Output from the subprocess as a list. 
+                Nothing. 
         """
-        # Start subprocess to run command over SSH.
-        command = f'ssh -i {key_filename} {username}@{self.ip} -t "sh -lic" \'opentrons_execute {protocol_robot_filepath}{self.protocol[1]}\''
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
-        log = []
-        for line in process.stdout:
-            print(line.strip())
-            log.append(line.strip())
-        return log
+        self.run_lines = queue.Queue(maxsize=run_log_queue_size)
+        if deploy_backend == 'http':
+            filepaths = [f'{self.protocol[0]}{self.protocol[1]}']
+            if self.protocol_type.startswith('qpcr'):
+                filepaths.append(custom_labware_filepath)
+            self.run_worker = robot_http.Http_execution_worker(robot_http.Robot_http_api(self.ip), filepaths, self.run_lines)
+        else:
+            command = f'opentrons_execute {protocol_robot_filepath}{self.protocol[1]}'
+            if warm_agent:
+                # start waits for the agent if it is still starting, or starts it if it has stopped.
+                command = f'python3 {agent_robot_filepath} start && python3 {agent_robot_filepath} submit {protocol_robot_filepath}{self.protocol[1]}'
+            # The protocol has "print('Protocol Complete')" as a final step.
+            self.run_worker = robot_session.Execution_worker(self.session, command, self.run_lines, 'Protocol Complete', self.prepare_run)
+        self.run_worker.start()
 
     def quit(self):
         """
@@ -978,25 +1886,57 @@ class Checkbox:
         exit_choice = messagebox.askyesno('Quitting', 'This will close the program and prepare the robot to shut down.\nDo you want to continue?', parent=self.parent)
         if exit_choice:
             print('Shutting down...')
-            subprocess.run(f'ssh -i {key_filename} {username}@{self.ip} -t "sh -lic" \'systemctl start opentrons-robot-server\'')
-            sys.exit(0)
-    
-    def change_ip(self):
+            self.quitting = True
+            # The server is only stopped with the 'ssh' deploy_backend.
+            if deploy_backend != 'ssh':
+                sys.exit(0)
+            self.quit_protocol_button.config(state=tk.DISABLED)
+            # Done in the background, so that the window isn't frozen while the robot answers.
+            shutdown = threading.Thread(target=self.release_robot, daemon=True)
+            shutdown.start()
+            self.wait_for_shutdown(shutdown)
+
+    def release_robot(self):
+        """
+        Stops the run in progress, stops robot_agent.py and starts opentrons-robot-server again. Run in a separate thread by quit().
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+            
+            Returns:
+                Nothing.
+        """
+        if self.robot_preparation is not None:
+            self.robot_preparation.join()
+        if self.session is None:
+            self.session = robot_session.Robot_session(self.ip, username, key_filename)
+        if self.running:
+            self.run_worker.stop()
+        try:
+            if warm_agent:
+                # The agent has to release the hardware before the server is started. It cancels its run first.
+                self.session.run(f'python3 {agent_robot_filepath} stop')
+            self.session.run('systemctl start opentrons-robot-server')
+        except robot_session.session_errors as error:
+            print(f'Could not start opentrons-robot-server: {error}')
+        self.session.close()
+
+    def wait_for_shutdown(self, shutdown):
         """
-        Alternates between the two most common ip addresses.
-        Made for if the ssh_check fails in order to try another next attempt.
+        Closes the program when release_robot() is done. Checks again after probe_poll_interval ms until then.
 
             Parameters:
                 self:               Allows the function to access class attributes and methods
+                shutdown:           The thread that runs release_robot()
             
             Returns:
                 Nothing.
         """
-        if self.ip == ip1:
-            self.ip = ip2
-        elif self.ip == ip2:
-            self.ip = ip1
-  
+        if shutdown.is_alive():
+            self.frame.after(probe_poll_interval, lambda: self.wait_for_shutdown(shutdown))
+        else:
+            sys.exit(0)
+    
     def create_printable_file(self, sources: dict, destinations: dict, filepath_csv: str):
         """Creates a .txt file showing the volume needed for each
         mastermix, sample and stadard, as well as how to place it
@@ -1042,40 +1982,55 @@ class Checkbox:
 
         messagebox.showinfo('Created printable file', f'A .txt file with a summary of the needed volumes has been placed in the same folder as the earlier provided .csv file.\n\nFile location:\n{filepath_output}', parent=self.parent)
      
-class Threaded_ssh_check(multiprocessing.Process):
+class Threaded_ssh_check(threading.Thread):
     """
-    Subclass of multiprocessing.Process. When the process is started,
-    a socket connection is attempted to the provided IP.
-    The result of the connection attempt is communicated back by
-    putting it into the provided queue. 
+    Subclass of threading.Thread. When the thread is started,
+    the robot is searched for with robot_discovery.discover(), and searched for again
+    with a longer timeout if it isn't found.
+    The ip of the robot, or None if it wasn't found, is communicated back by
+    putting it into the provided queue. A thread is used instead of a process since
+    the search only waits for sockets, and a process would have to import the program again.
 
         Attributes:
-            queue:                  The queue used to communicate between this process and the main UI.
-            ip (str):               The ip address to attempt to connect to.         
+            queue:                  The queue used to communicate between this thread and the main UI.
+            addresses (list):       The ip addresses the robot usually has.
+            subnet (str):           Subnet to search if the robot isn't found on the addresses, or None.
+            timeout (float):        Seconds to wait for each address in the first attempt.
+            retries (int):          Number of new attempts if the robot isn't found.
+            retry_delay (float):    Seconds to wait before the first new attempt.
         
         Methods:
-            run:                    Creates a socket connection to the provided ip.        
+            run:                    Searches for the robot.        
     """
-    def __init__(self, queue, ip):
+    def __init__(self, queue, addresses, subnet=None, timeout=0.5, retries=2, retry_delay=0.5):
         """
-        Inherits the __init__() from multiprocessing.Process.
+        Inherits the __init__() from threading.Thread.
 
             Parameters:
                 self:               Allows the function to access class attributes and methods
-                queue (Queue):      The multiprocessing.Queue used to communicate between the process and main UI.
-                ip (str):           THe ip address to attempt to connect to. 
+                queue (Queue):      The queue.Queue used to communicate between the thread and main UI.
+                addresses (list):   The ip addresses the robot usually has. 
+                subnet (str):       Subnet to search if the robot isn't found on the addresses, or None.
+                timeout (float):    Seconds to wait for each address in the first attempt. Doubled for each new attempt.
+                retries (int):      Number of new attempts if the robot isn't found.
+                retry_delay (float): Seconds to wait before the first new attempt. Doubled for each new attempt.
             
             Returns:
                 Nothing.
         """
-        super().__init__()
+        # Daemon thread so that it doesn't keep the program open.
+        super().__init__(daemon=True)
         self.queue = queue
-        self.ip = ip
+        self.addresses = addresses
+        self.subnet = subnet
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
     
     def run(self):
         """
-        Creates a socket connection to the provided ip and returns
-        the result by putting it back inte the provided queue.
+        Searches for the robot and returns its ip, or None if it wasn't found,
+        by putting it back into the provided queue.
         Automatically called by using the start() function on the object.
 
             Parameters:
@@ -1084,18 +2039,15 @@ class Threaded_ssh_check(multiprocessing.Process):
             Returns:
                 Nothing.
         """
-        host = self.ip
-        port = 22
-        try:
-            test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            test_socket.settimeout(6)
-            test_socket.connect((host, port))
-        except (socket.error, socket.timeout) as error_msg:
-            print(error_msg)
-            self.queue.put(False)
-        else:
-            test_socket.close()
-            self.queue.put(True)
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.retry_delay * 2**(attempt - 1))
+            # The subnet is only searched in the last attempt, since it takes much longer.
+            subnet = self.subnet if attempt == self.retries else None
+            robot_ip = robot_discovery.discover(self.addresses, subnet, timeout=self.timeout * 2**attempt)
+            if robot_ip is not None:
+                break
+        self.queue.put(robot_ip)
 
 
 def run_gui():
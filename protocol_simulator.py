@@ -0,0 +1,193 @@
+####################################
+#   Simulation of protocols with the opentrons package, used to estimate how long a run takes.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: In-process simulation with estimates cached on disk.
+#           v1.1 2026-10-18: Worker process so that the GUI is not blocked while a protocol is simulated.
+#           v1.2 2026-10-18: Optional recorder that gets every command of the simulation, used by command_trace.
+#
+####################################
+
+import os
+import json
+import multiprocessing
+
+
+def cache_filepath(protocol_file):
+    """
+    Finds where the estimate of a protocol is saved. The filename of a protocol ends with a hash of its content
+    (see replace_values.write_protocol()), so an estimate saved for it can never be out of date.
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+
+        Returns:
+            The filepath of the estimate.
+    """
+    [folder, filename] = protocol_file
+    return f'{folder}{os.path.splitext(filename)[0]}_estimate.json'
+
+
+def simulate(protocol_file, recorder=None):
+    """
+    Simulates a protocol with the opentrons package, without starting opentrons_simulate, and times each step with the
+    experimental duration estimator of opentrons (the same as opentrons_simulate -e). The opentrons package is imported
+    the first time a protocol is simulated, so it only slows down the first estimate and not the start of the program.
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+            recorder:                   Function called with the message of each command from opentrons and its
+                                        duration in seconds, see command_trace
+
+        Returns:
+            A dictionary with the total duration in seconds, the duration of each step and the duration of each
+            type of command, e.g. 'command.ASPIRATE'.
+    """
+    from opentrons.simulate import simulate as opentrons_simulate
+    from opentrons.protocols.duration import DurationEstimator
+
+    steps = []
+
+    class Step_estimator(DurationEstimator):
+        """
+        Duration estimator that also saves how long each step takes.
+        """
+        def on_message(self, message):
+            total_before = self.get_total_duration()
+            super().on_message(message)
+            if message['$'] == 'before':
+                duration = self.get_total_duration() - total_before
+                steps.append([message['name'], message['payload']['text'], duration])
+                if recorder is not None:
+                    recorder(message, duration)
+
+    estimator = Step_estimator()
+    with open(f'{protocol_file[0]}{protocol_file[1]}') as file:
+        opentrons_simulate(file, file_name=protocol_file[1], duration_estimator=estimator)
+
+    commands = {}
+    for [command, _, duration] in steps:
+        commands[command] = commands.get(command, 0) + duration
+    return {
+        'total': estimator.get_total_duration(),
+        'steps': steps,
+        'commands': commands}
+
+
+def estimate(protocol_file):
+    """
+    Gets the estimate of a protocol, from the disk if the protocol has been simulated before
+    and otherwise by simulating it with simulate().
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+
+        Returns:
+            A dictionary with the estimate, see simulate().
+    """
+    filepath = cache_filepath(protocol_file)
+    if os.path.exists(filepath):
+        with open(filepath) as file:
+            return json.load(file)
+
+    result = simulate(protocol_file)
+    # Written to a temporary file first, so that an estimate is never read while only half of it is written.
+    temporary_file = f'{filepath}.{os.getpid()}.tmp'
+    with open(temporary_file, 'w') as file:
+        json.dump(result, file)
+    os.replace(temporary_file, filepath)
+    return result
+
+
+class Estimation_worker(multiprocessing.Process):
+    """
+    Subclass of multiprocessing.Process that estimates protocols in the background. The process keeps running
+    between estimates, so opentrons is only imported once. It is stopped with terminate() to cancel an estimate.
+
+        Attributes:
+            tasks:                  Queue with the protocols to estimate, as [folder, filename]. None stops the process.
+            results:                Queue where each estimate is put as [protocol_file, result, error], where error
+                                    is None if the protocol could be simulated and a description of the error otherwise.
+
+        Methods:
+            run:                    Estimates the protocols put in the tasks queue.
+    """
+    def __init__(self, tasks, results):
+        """
+        Inherits the __init__() from multiprocessing.Process.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                tasks (Queue):      The multiprocessing.Queue with the protocols to estimate
+                results (Queue):    The multiprocessing.Queue where the estimates are put
+
+            Returns:
+                Nothing.
+        """
+        # Daemon process so that it is stopped when the program is closed.
+        super().__init__(daemon=True)
+        self.tasks = tasks
+        self.results = results
+
+    def run(self):
+        """
+        Estimates each protocol put in the tasks queue with estimate() and puts the result in the results queue.
+        Automatically called by using the start() function on the object.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        while True:
+            protocol_file = self.tasks.get()
+            if protocol_file is None:
+                break
+            try:
+                result = estimate(protocol_file)
+            except Exception as error:
+                self.results.put([protocol_file, None, f'{type(error).__name__}: {error}'])
+            else:
+                self.results.put([protocol_file, result, None])
+
+
+def format_duration(seconds):
+    """
+    Formats a duration as hours, minutes and seconds.
+
+        Parameters:
+            seconds (float):            The duration in seconds
+
+        Returns:
+            The duration as a string, e.g. '1:05:09'.
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02}:{seconds:02}'
+
+
+def summary(result, no_commands=5):
+    """
+    Describes an estimate with the total duration and the types of commands that take the longest.
+
+        Parameters:
+            result (dict):              The estimate, see simulate()
+            no_commands (int):          Number of types of commands to list
+
+        Returns:
+            The description as a string.
+    """
+    lines = [f"Estimated duration: {format_duration(result['total'])}"]
+    commands = sorted(result['commands'].items(), key=lambda item: item[1], reverse=True)
+    for command, duration in commands[:no_commands]:
+        lines.append(f"    {command.split('.')[-1].lower().replace('_', ' ')}: {format_duration(duration)}")
+    return '\n'.join(lines)
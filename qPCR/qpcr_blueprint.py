@@ -13,54 +13,144 @@
 #           v1.0 2021-11-XX: First protocol version.
 #           v1.1 2021-12-16: Added documentation.
 #           v1.2 2021-12-21: Ready for external use.
+#           v1.3 2026-10-18: Distribute mode for mastermixes.
+#           v1.4 2026-10-18: Tip policies for samples and standards.
+#           v1.5 2026-10-18: 8-channel pipette for full plate columns.
+#           v1.6 2026-10-18: Non-recursive door monitor shared with the other blueprints.
+#           v1.7 2026-10-18: Custom tube rack loaded by name when it was uploaded with the protocol through the HTTP API.
 #
 ####################################
 
+import os
 import json
 from opentrons import protocol_api
-import time
-import threading
 
 metadata = {'apiLevel': '2.10'}
 
+####################################
+#========INTERNAL FUNCTIONS=========
+####################################
+
+def dispenses_per_tip(tip_policy, no_wells):
+    """
+    Finds how many wells one tip is used for with the given tip policy.
+
+        Parameters:
+            tip_policy (str/int):       'well' for a new tip for every well, 'source' for one tip per source
+                                        or a number N for a new tip after every N wells.
+            no_wells (int):             Number of wells that get liquid from the source.
+
+        Returns:
+            Number of wells per tip.
+    """
+    if tip_policy == 'well':
+        return 1
+    if tip_policy == 'source':
+        return max(1, no_wells)
+    return int(tip_policy)
+
+def transfer_replicates(pipette, volume, source, wells, tip_policy, trash):
+    """
+    Transfers liquid from one source to all its replicate wells, reusing tips according to the tip policy.
+    A tip that is used for several wells is filled with liquid for as many of them as fit in the tip
+    (plus the disposal volume) and dispenses it well by well. The disposal volume is blown out in the trash
+    since the tip has been in contact with the destination wells.
+
+        Parameters:
+            pipette (pipette):          The pipette to use.
+            volume (float):             Volume to transfer to each well.
+            source (well):              The well to take the liquid from.
+            wells (list):               The wells to transfer the liquid to.
+            tip_policy (str/int):       How often to change tips, see dispenses_per_tip().
+            trash (well):               Where to blow out the disposal volume.
+
+        Returns:
+            Nothing.
+    """
+    wells_per_tip = dispenses_per_tip(tip_policy, len(wells))
+    if wells_per_tip == 1:
+        for well in wells:
+            pipette.transfer(volume, source, well)
+        return
+
+    capacity = min(pipette.max_volume, pipette.tip_racks[0].wells()[0].max_volume)
+    wells_per_aspiration = max(1, int((capacity - disposal_volume) // volume))
+    for i in range(0, len(wells), wells_per_tip):
+        wells_with_tip = wells[i:i + wells_per_tip]
+        pipette.pick_up_tip()
+        for j in range(0, len(wells_with_tip), wells_per_aspiration):
+            wells_to_fill = wells_with_tip[j:j + wells_per_aspiration]
+            if len(wells_to_fill) == 1:
+                pipette.aspirate(volume, source)
+                pipette.dispense(volume, wells_to_fill[0])
+            else:
+                pipette.aspirate(volume*len(wells_to_fill) + disposal_volume, source)
+                for well in wells_to_fill:
+                    pipette.dispense(volume, well)
+                pipette.blow_out(trash)
+        pipette.drop_tip()
+
+
 ####################################
 #============RUN FUNCTION===========
 ####################################
 
 def run(protocol: protocol_api.ProtocolContext):
 
-    # Load custom labware from file
+    # Load custom labware from file, uploaded to the robot by main.py or found next to the program when simulating.
+    # Without the file, e.g. when the robot server runs or analyses a protocol that was uploaded through the HTTP API
+    # together with the labware definition, the labware is loaded by its name instead.
     path_to_custom = '/data/user_storage/own_24_tuberack_1500ul.json'
-    if protocol.is_simulating():
+    if protocol.is_simulating() and not os.path.exists(path_to_custom):
         path_to_custom = 'custom labware\\own_24_tuberack_1500ul.json'
-    with open(path_to_custom) as labware_file:
-        labware_def = json.load(labware_file)
-
-    # Add custom labware to deck
-    tube_rack1 = protocol.load_labware_from_definition(labware_def, 8)
-    tube_rack2 = protocol.load_labware_from_definition(labware_def, 9)
-    tube_rack3 = protocol.load_labware_from_definition(labware_def, 4)
-    tube_rack4 = protocol.load_labware_from_definition(labware_def, 5)
-    tube_rack5 = protocol.load_labware_from_definition(labware_def, 6)
-    tube_rack6 = protocol.load_labware_from_definition(labware_def, 1)
-    tube_rack7 = protocol.load_labware_from_definition(labware_def, 2)
-    tube_rack8 = protocol.load_labware_from_definition(labware_def, 3)
-
-    tube_racks = {
-        'Tube rack 1': tube_rack1, 
-        'Tube rack 2': tube_rack2, 
-        'Tube rack 3': tube_rack3, 
-        'Tube rack 4': tube_rack4, 
-        'Tube rack 5': tube_rack5, 
-        'Tube rack 6': tube_rack6,
-        'Tube rack 7': tube_rack7,
-        'Tube rack 8': tube_rack8}
+    labware_def = None
+    if os.path.exists(path_to_custom):
+        with open(path_to_custom) as labware_file:
+            labware_def = json.load(labware_file)
+
+    # Add custom labware to deck.
+    # Only the tube racks that hold a source for the single-channel pipette are loaded.
+    tube_rack_slots = {
+        'Tube rack 1': 8, 
+        'Tube rack 2': 9, 
+        'Tube rack 3': 4, 
+        'Tube rack 4': 5, 
+        'Tube rack 5': 6, 
+        'Tube rack 6': 1,
+        'Tube rack 7': 2,
+        'Tube rack 8': 3}
+    used_tube_racks = [mastermix_source[mm][0] for mm in mastermix_destination.keys()]
+    used_tube_racks += [sample_source[sample][0] for sample in sample_destination.keys()]
+    used_tube_racks += [standard_source[standard][0] for standard in standard_destination.keys()]
+
+    tube_racks = {}
+    for tube_rack, slot in tube_rack_slots.items():
+        if tube_rack in used_tube_racks:
+            if labware_def is not None:
+                tube_racks[tube_rack] = protocol.load_labware_from_definition(labware_def, slot)
+            else:
+                tube_racks[tube_rack] = protocol.load_labware('own_24_tuberack_1500ul', slot, namespace='custom_beta')
 
     # Add standard labware
     tiprack_1 = protocol.load_labware('opentrons_96_tiprack_10ul', 10)
     tiprack_2 = protocol.load_labware('opentrons_96_tiprack_10ul', 7)
     p10 = protocol.load_instrument('p10_single', 'left', tip_racks=[tiprack_1, tiprack_2])
 
+    # Pipette used for the mastermixes in distribute mode.
+    # Either the P10 or a larger single-channel pipette on the right mount with its own tip rack.
+    if mastermix_mode == 'distribute' and mastermix_pipette != 'p10_single':
+        tiprack_mastermix = protocol.load_labware(mastermix_tip_rack, mastermix_tip_rack_slot)
+        p_mastermix = protocol.load_instrument(mastermix_pipette, 'right', tip_racks=[tiprack_mastermix])
+    else:
+        p_mastermix = p10
+
+    # 8-channel pipette for the full plate columns that get the same mastermix, sample or standard.
+    # Each of them is aliquoted into a column of PCR strips in an aluminum block.
+    if any(multichannel_destination[group] for group in multichannel_destination):
+        tiprack_multi = protocol.load_labware('opentrons_96_tiprack_10ul', multichannel_tip_rack_slot)
+        p10_multi = protocol.load_instrument('p10_multi', 'right', tip_racks=[tiprack_multi])
+        pcr_strips = protocol.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul', multichannel_source_slot)
+
     # Note: There seems to be an error in the opentrons labware library
     # where the combined aluminium block + 200ul pcr plate has the wrong height.
     # Instead, the combined aluminium block + 100ul pcr plate has a height 
@@ -71,68 +161,107 @@ def run(protocol: protocol_api.ProtocolContext):
 
     protocol.set_rail_lights(True)
     
-    #Multithreded method to pause the protocol if the door of the OT-2 is opened. 
-    global paused
-    paused = False
-    global done
-    done = False
+    #Multithreded method to pause the protocol if the door of the OT-2 is opened.
+    #Door_monitor is added to the protocol from door_monitor.py when the protocol is created.
+    door_monitor = Door_monitor(protocol, door_poll_interval)
+    door_monitor.start()
+    # Stopped also if the run fails or is cancelled, so that the thread does not keep running
+    # in a process that runs several protocols, e.g. the robot server or robot_agent.py.
+    try:
 
-    def check_pause():
-        """
-        Pause function that checks if the robot door is closed or not, if it is open the protocol is paused
-        and you have to close the door again to resume.
+        #########################
+        ###START PROTOCOL########
+        #########################
 
-        Parameters:
-            None.
-        
-        Returns:
-            Nothing.
-        """
-        global paused
-        global done
-        if not paused and not protocol.door_closed:
-            protocol.pause()
-            paused = True
-        if paused and protocol.door_closed:
-            protocol.resume()
-            paused = False
-        if paused and not protocol.door_closed:
-            print('Protocol paused. Close the door to the robot to resume.')
-
-        time.sleep(1)
-        # Check if the main thread is still alive or if the run has been stopped by ctrl+C
-        run_canceled = not threading.main_thread().is_alive()
-        if not done and not run_canceled:
-            check_pause()
-
-    thread = threading.Thread(target=check_pause)
-    thread.start()
-
-    #########################
-    ###START PROTOCOL########
-    #########################
-
-    for mm in mastermix_destination.keys():
-        p10.pick_up_tip()
-        for well in mastermix_destination[mm]:
-            tube_rack = tube_racks[mastermix_source[mm][0]]
-            p10.aspirate(6, tube_rack[mastermix_source[mm][1]])
-            p10.dispense(7, well_plate[well]) #Dispense more than aspirated to minimize liquid left in the pipette. 
-        p10.drop_tip()
-
-    for sample in sample_destination.keys():
-        for well in sample_destination[sample]:
+        trash = protocol.fixed_trash['A1']
+
+        def transfer_columns(group, volume, tip_policy):
+            """
+            Fills the full plate columns of a group with the 8-channel pipette, taking each
+            mastermix, sample or standard from its column of PCR strips.
+
+            Parameters:
+                group (str):            'mastermix', 'sample' or 'standard'
+                volume (float):         Volume to transfer to each well.
+                tip_policy (str/int):   How often to change tips, see dispenses_per_tip().
+
+            Returns:
+                Nothing.
+            """
+            for mixture, columns in multichannel_destination[f'{group}_destination'].items():
+                source = pcr_strips['A' + str(multichannel_source[f'{group}_source'][mixture])]
+                wells = [well_plate['A' + str(column)] for column in columns]
+                transfer_replicates(p10_multi, volume, source, wells, tip_policy, trash)
+
+        transfer_columns('mastermix', mastermix_volume, 'source')
+
+        if mastermix_mode == 'distribute':
+            # Fill the pipette once and dispense to as many wells as fit in the tip.
+            # The conditioning volume is dispensed back to the source before the first well
+            # and the disposal volume is kept in the tip to make the last dispense as accurate as the first.
+            capacity = min(p_mastermix.max_volume, p_mastermix.tip_racks[0].wells()[0].max_volume)
+            wells_per_aspiration = max(1, int((capacity - conditioning_volume - disposal_volume) // mastermix_volume))
+            protocol.comment(f'Mastermix: distribute mode with {mastermix_pipette}, {wells_per_aspiration} wells per aspiration.')
+
+            for mm in mastermix_destination.keys():
+                source = tube_racks[mastermix_source[mm][0]][mastermix_source[mm][1]]
+                wells = mastermix_destination[mm]
+                p_mastermix.pick_up_tip()
+                for i in range(0, len(wells), wells_per_aspiration):
+                    wells_to_fill = wells[i:i + wells_per_aspiration]
+                    p_mastermix.aspirate(mastermix_volume*len(wells_to_fill) + conditioning_volume + disposal_volume, source)
+                    if conditioning_volume > 0:
+                        p_mastermix.dispense(conditioning_volume, source)
+                    for well in wells_to_fill:
+                        p_mastermix.dispense(mastermix_volume, well_plate[well])
+                    p_mastermix.blow_out(source) # Return the disposal volume to the source.
+                p_mastermix.drop_tip()
+        else:
+            protocol.comment('Mastermix: single mode, 1 well per aspiration.')
+            for mm in mastermix_destination.keys():
+                p10.pick_up_tip()
+                for well in mastermix_destination[mm]:
+                    tube_rack = tube_racks[mastermix_source[mm][0]]
+                    p10.aspirate(mastermix_volume, tube_rack[mastermix_source[mm][1]])
+                    p10.dispense(mastermix_volume+1, well_plate[well]) #Dispense more than aspirated to minimize liquid left in the pipette. 
+                p10.drop_tip()
+
+        transfer_columns('sample', 4, sample_tip_policy)
+        for sample in sample_destination.keys():
             tube_rack = tube_racks[sample_source[sample][0]]
-            p10.transfer(4, tube_rack[sample_source[sample][1]], well_plate[well])
+            wells = [well_plate[well] for well in sample_destination[sample]]
+            transfer_replicates(p10, 4, tube_rack[sample_source[sample][1]], wells, sample_tip_policy, trash)
 
-    for standard in standard_destination.keys():
-        for well in standard_destination[standard]:
+        transfer_columns('standard', 4, standard_tip_policy)
+        for standard in standard_destination.keys():
             tube_rack = tube_racks[standard_source[standard][0]]
-            p10.transfer(4, tube_rack[standard_source[standard][1]], well_plate[well])
+            wells = [well_plate[well] for well in standard_destination[standard]]
+            transfer_replicates(p10, 4, tube_rack[standard_source[standard][1]], wells, standard_tip_policy, trash)
 
-    #Some finnishing stuff.
-    done = True
-    thread.join()
+        #Some finnishing stuff.
+    finally:
+        door_monitor.stop()
 
     print('Protocol Complete')
-    
\ No newline at end of file
+
+    ###########
+    ### END ###
+    ###########
+
+#User input variables.
+# Default values
+mastermix_mode = 'single' # 'single' or 'distribute'
+mastermix_volume = 6
+mastermix_pipette = 'p10_single'
+mastermix_tip_rack = 'opentrons_96_tiprack_10ul'
+mastermix_tip_rack_slot = 3
+conditioning_volume = 1
+disposal_volume = 1
+sample_tip_policy = 'well' # 'well', 'source' or a number of wells per tip
+standard_tip_policy = 'well'
+multichannel_destination = {'mastermix_destination': {}, 'sample_destination': {}, 'standard_destination': {}}
+multichannel_source = {'mastermix_source': {}, 'sample_source': {}, 'standard_source': {}}
+multichannel_tip_rack_slot = 3
+multichannel_source_slot = 2
+door_poll_interval = 1 # Seconds between each check of the robot door
+# New values from user:
\ No newline at end of file
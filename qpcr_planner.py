@@ -0,0 +1,321 @@
+####################################
+#   Functions used to plan how the qPCR protocol fills the wells on the PCR plate.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Ordering of destination wells to minimize gantry travel.
+#           v1.1 2026-10-18: Detection of full columns for the 8-channel pipette.
+#           v1.2 2026-10-18: Distances used to place the tube racks.
+#           v1.3 2026-10-18: Tube rack definition found from the program folder instead of the working directory.
+#
+####################################
+
+import os
+import json
+import math
+
+
+# Position of the front left corner of each deck slot on the OT-2, in mm.
+slot_positions = {
+    1: (0.0, 0.0), 2: (132.5, 0.0), 3: (265.0, 0.0),
+    4: (0.0, 90.5), 5: (132.5, 90.5), 6: (265.0, 90.5),
+    7: (0.0, 181.0), 8: (132.5, 181.0), 9: (265.0, 181.0),
+    10: (0.0, 271.5), 11: (132.5, 271.5), 12: (265.0, 271.5),
+}
+
+# Geometry of the opentrons_96_aluminumblock_nest_wellplate_100ul on slot 11.
+plate_slot = 11
+plate_a1 = (14.38, 74.24)
+plate_pitch = 9.0
+
+# Deck slot of each tube rack, same as in the qPCR blueprint.
+tube_rack_slots = {
+    'Tube rack 1': 8,
+    'Tube rack 2': 9,
+    'Tube rack 3': 4,
+    'Tube rack 4': 5,
+    'Tube rack 5': 6,
+    'Tube rack 6': 1,
+    'Tube rack 7': 2,
+    'Tube rack 8': 3}
+slot_size = (127.76, 85.48)
+
+# Found from the folder of this file, so that .csv files can be read from any working directory and on any OS.
+tube_rack_definition = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Custom labware', 'own_24_tuberack_1500ul.json')
+gantry_speed = 400 # Default XY speed of the OT-2 gantry in mm/s.
+
+
+def plate_well_position(well):
+    """
+    Finds the position of a well on the PCR plate in deck coordinates.
+
+        Parameters:
+            well (str):                 Well name, e.g. 'B3'
+
+        Returns:
+            The x and y coordinates of the well in mm.
+    """
+    row = ord(well[0]) - ord('A')
+    column = int(well[1:]) - 1
+    slot_x, slot_y = slot_positions[plate_slot]
+    return (slot_x + plate_a1[0] + column * plate_pitch, slot_y + plate_a1[1] - row * plate_pitch)
+
+
+def load_tube_rack_wells(filepath=tube_rack_definition):
+    """
+    Reads the well positions of the custom tube rack from its labware definition.
+
+        Parameters:
+            filepath (str):             Filepath to the labware definition
+
+        Returns:
+            A dictionary with the x and y coordinates of each well relative to the slot.
+    """
+    with open(filepath) as labware_file:
+        labware_def = json.load(labware_file)
+    return {well: (values['x'], values['y']) for well, values in labware_def['wells'].items()}
+
+
+def source_position(source, tube_rack_wells):
+    """
+    Finds the position of a source tube in deck coordinates.
+
+        Parameters:
+            source (list):              Tube rack and well, e.g. ['Tube rack 1', 'A1']
+            tube_rack_wells (dict):     Well positions of the tube rack, see load_tube_rack_wells()
+
+        Returns:
+            The x and y coordinates of the tube in mm.
+    """
+    [tube_rack, well] = source
+    slot_x, slot_y = slot_positions[tube_rack_slots[tube_rack]]
+    well_x, well_y = tube_rack_wells[well]
+    return (slot_x + well_x, slot_y + well_y)
+
+
+def plate_distance(position):
+    """
+    Calculates the XY distance from a position on the deck to the centre of the PCR plate.
+
+        Parameters:
+            position (tuple):           The x and y coordinates in mm
+
+        Returns:
+            The distance in mm.
+    """
+    slot_x, slot_y = slot_positions[plate_slot]
+    return math.dist(position, (slot_x + slot_size[0]/2, slot_y + slot_size[1]/2))
+
+
+def tube_rack_distance(tube_rack):
+    """
+    Calculates the XY distance from the centre of a tube rack to the centre of the PCR plate.
+
+        Parameters:
+            tube_rack (str):            Name of the tube rack, e.g. 'Tube rack 1'
+
+        Returns:
+            The distance in mm.
+    """
+    slot_x, slot_y = slot_positions[tube_rack_slots[tube_rack]]
+    return plate_distance((slot_x + slot_size[0]/2, slot_y + slot_size[1]/2))
+
+
+def path_length(start, wells, wells_per_aspiration):
+    """
+    Calculates the XY distance travelled when the wells are filled in the given order. The pipette starts at the source,
+    dispenses to wells_per_aspiration wells in a row and goes back to the source to aspirate again.
+
+        Parameters:
+            start (tuple):              Position of the source
+            wells (list):               Wells in the order they are filled
+            wells_per_aspiration (int): Number of wells filled from each aspiration
+
+        Returns:
+            The distance in mm.
+    """
+    distance = 0.0
+    for i in range(0, len(wells), wells_per_aspiration):
+        position = start
+        for well in wells[i:i + wells_per_aspiration]:
+            well_position = plate_well_position(well)
+            distance = distance + math.dist(position, well_position)
+            position = well_position
+        distance = distance + math.dist(position, start)
+    return distance
+
+
+def snake_order(wells):
+    """
+    Orders wells column by column, going down every other column and up the next, so that
+    the pipette never jumps back to the top of the plate.
+
+        Parameters:
+            wells (list):               Well names
+
+        Returns:
+            A list with the wells in snake order.
+    """
+    def key(well):
+        column = int(well[1:])
+        row = ord(well[0]) - ord('A')
+        return (column, row if column % 2 else -row)
+    return sorted(wells, key=key)
+
+
+def nearest_neighbour_order(start, wells):
+    """
+    Orders wells by always going to the closest well that has not been visited yet, starting from the source.
+
+        Parameters:
+            start (tuple):              Position of the source
+            wells (list):               Well names
+
+        Returns:
+            A list with the wells in nearest neighbour order.
+    """
+    remaining = {well: plate_well_position(well) for well in wells}
+    position = start
+    ordered = []
+    while remaining:
+        well = min(remaining, key=lambda name: math.dist(position, remaining[name]))
+        position = remaining.pop(well)
+        ordered.append(well)
+    return ordered
+
+
+def order_destinations(destinations, sources, sizes, method='auto'):
+    """
+    Reorders the destination wells of each mastermix, sample and standard to minimize the travel of the gantry.
+    The methods are 'csv' (the order in the file), 'snake', 'nearest' (nearest neighbour from the source)
+    and 'auto', which uses whichever order is shortest for each group member.
+    Only the travel between aspirations and dispenses is counted, i.e. not tip pick ups and drops.
+
+        Parameters:
+            destinations (dict):        Dictionary containing destinations for mastermixes, samples and standards
+            sources (dict):             Dictionary containing sources for mastermixes, samples and standards
+            sizes (dict):               Number of wells filled per aspiration for each destination group,
+                                        see replace_values_qpcr.wells_per_aspiration()
+            method (str):               'csv', 'snake', 'nearest' or 'auto'
+
+        Returns:
+            The reordered destinations and a dictionary with the travel in mm before and after reordering
+            and the estimated time saved in seconds.
+    """
+    if method not in ['csv', 'snake', 'nearest', 'auto']:
+        raise ValueError(f"Unknown ordering method '{method}'")
+    tube_rack_wells = load_tube_rack_wells()
+
+    ordered_destinations = {}
+    travel_before = 0.0
+    travel_after = 0.0
+    for group, group_content in destinations.items():
+        source_group = sources[group.replace('_destination', '_source')]
+        wells_per_aspiration = sizes[group]
+        ordered_destinations[group] = {}
+        for mixture, wells in group_content.items():
+            start = source_position(source_group[mixture], tube_rack_wells)
+            candidates = [list(wells)]
+            if method in ['snake', 'auto']:
+                candidates.append(snake_order(wells))
+            if method in ['nearest', 'auto']:
+                candidates.append(nearest_neighbour_order(start, wells))
+            if method != 'auto':
+                candidates = candidates[-1:]
+
+            lengths = [path_length(start, candidate, wells_per_aspiration) for candidate in candidates]
+            best = lengths.index(min(lengths))
+            ordered_destinations[group][mixture] = candidates[best]
+            travel_before = travel_before + path_length(start, wells, wells_per_aspiration)
+            travel_after = travel_after + lengths[best]
+
+    travel = {
+        'before': travel_before,
+        'after': travel_after,
+        'time_saved': (travel_before - travel_after) / gantry_speed,
+    }
+    return ordered_destinations, travel
+
+
+def split_multichannel(destinations, max_columns=12):
+    """
+    Finds the full plate columns (rows A-H) that get the same mastermix, sample or standard, so that they can be filled
+    with one dispense of the 8-channel pipette. Each group member with full columns gets its own column on the PCR strip
+    block, which holds 12 columns. Wells that are not part of a full column are left for the single-channel pipette.
+
+        Parameters:
+            destinations (dict):        Dictionary containing destinations for mastermixes, samples and standards
+            max_columns (int):          Number of columns available on the PCR strip block
+
+        Returns:
+            Three dictionaries: the destinations left for the single-channel pipette, the plate columns filled by the
+            8-channel pipette and the strip column used as source for each group member.
+    """
+    full_column = set('ABCDEFGH')
+    single_destinations = {}
+    multichannel_destination = {}
+    multichannel_source = {}
+    strip_column = 1
+    for group, group_content in destinations.items():
+        single_destinations[group] = {}
+        multichannel_destination[group] = {}
+        multichannel_source[group.replace('_destination', '_source')] = {}
+        for mixture, wells in group_content.items():
+            rows_in_column = {}
+            for well in wells:
+                rows_in_column.setdefault(int(well[1:]), set()).add(well[0])
+            columns = [column for column, rows in rows_in_column.items() if rows == full_column]
+
+            if columns and strip_column <= max_columns:
+                multichannel_destination[group][mixture] = columns
+                multichannel_source[group.replace('_destination', '_source')][mixture] = strip_column
+                strip_column = strip_column + 1
+                wells = [well for well in wells if int(well[1:]) not in columns]
+            if wells:
+                single_destinations[group][mixture] = wells
+    return single_destinations, multichannel_destination, multichannel_source
+
+
+def pipetting_operations(destinations, multichannel_destination):
+    """
+    Counts the dispenses to the PCR plate with and without the 8-channel pipette.
+
+        Parameters:
+            destinations (dict):                The destinations left for the single-channel pipette
+            multichannel_destination (dict):    The plate columns filled by the 8-channel pipette
+
+        Returns:
+            The number of dispenses if only the single-channel pipette is used and the number when the 8-channel pipette
+            fills the full columns.
+    """
+    single = sum(len(wells) for group in destinations.values() for wells in group.values())
+    columns = sum(len(columns) for group in multichannel_destination.values() for columns in group.values())
+    return single + 8*columns, single + columns
+
+
+def strip_layout(multichannel_destination, multichannel_source):
+    """
+    Describes what to put in each column of the PCR strip block and how much, using the same N+3 rule as the tube racks.
+
+        Parameters:
+            multichannel_destination (dict):    The plate columns filled by the 8-channel pipette
+            multichannel_source (dict):         The strip column used as source for each group member
+
+        Returns:
+            A list with one line of text per strip column.
+    """
+    lines = []
+    for group, group_content in multichannel_destination.items():
+        name = group.split('_')[0]
+        vol = 6 if name == 'mastermix' else 4
+        for mixture, columns in group_content.items():
+            strip_column = multichannel_source[group.replace('_destination', '_source')][mixture]
+            lines.append(f'Column {strip_column}: {name.title()} {mixture}, {vol*(len(columns)+3)} ul per tube')
+    return lines
@@ -13,18 +13,77 @@
 #      
 #   Version information:
 #           v1.1 2021-12-17: Added documentation
+#           v1.2 2026-10-18: Door monitor added to the protocol from door_monitor.py.
+#           v1.3 2026-10-18: Protocols saved under a hash of their content instead of a fixed output file.
+#           v1.4 2026-10-18: Tip and reagent usage of the protocol.
 #
 ####################################
 
 import os
-from shutil import copyfile
+import math
+import hashlib
+
+
+def protocol_text(file_in, parameters):
+    """
+    Creates the text of a protocol from a blueprint. The Door_monitor class from door_monitor.py is added before the
+    user input variables at the end of the blueprint, and the parameters are added after the default values.
+    The protocol has to be a single file on the robot, so the door monitor shared by all blueprints
+    is copied into each protocol instead of being imported.
+
+        Parameters:
+            file_in (str):              Filepath to the blueprint
+            parameters (dict):          Name and value of each user input variable
+
+        Returns:
+            The protocol as a string.
+    """
+    # newline='' keeps the line endings of the files as they are.
+    with open(file_in, 'r', newline='') as file:
+        blueprint = file.read()
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'door_monitor.py'), 'r', newline='') as file:
+        door_monitor = file.read()
+
+    [protocol, user_input] = blueprint.split('#User input variables.', 1)
+    user_values = ''.join(f'\n{name} = {value!r}' for name, value in parameters.items())
+    return protocol + door_monitor + '\n\n#User input variables.' + user_input + user_values
+
+
+def write_protocol(folder, blueprint, name, parameters):
+    """
+    Creates a protocol from a blueprint and saves it under a name that ends with a hash of its content,
+    e.g. dna_cleaning_3f2a9c81d0e4.py. The same blueprint and parameters always give the same file, so a protocol
+    that has already been created is reused instead of written again, and two sessions with different parameters
+    never overwrite each other's protocol. The protocol is compiled before it is saved, so every saved file is valid Python.
+
+        Parameters:
+            folder (str):               Folder of the blueprint, where the protocol is also saved
+            blueprint (str):            Filename of the blueprint
+            name (str):                 Start of the filename of the protocol
+            parameters (dict):          Name and value of each user input variable
+
+        Returns:
+            A list with the folder and the filename of the protocol.
+    """
+    text = protocol_text(f'{folder}{blueprint}', parameters)
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+    filename = f'{name}_{digest}.py'
+
+    if not os.path.exists(f'{folder}{filename}'):
+        compile(text, filename, 'exec')
+        # Written to a temporary file first, so that a protocol is never read while only half of it is written.
+        temporary_file = f'{folder}{filename}.{os.getpid()}.tmp'
+        with open(temporary_file, 'w', newline='') as file:
+            file.write(text)
+        os.replace(temporary_file, f'{folder}{filename}')
+    return [folder, filename]
 
 
 def replace_values(sample_no, sample_vol, ratio, clean_amt, eb_vol):
     """
     Takes 5 parameters which are samples, volume, ratio, number of washes and volumeEB. It reads from a file which acts
     as a blueprint to write in another file. Appends the parameters at the bottom of the blueprint and creates the final 
-    protocol file.
+    protocol file, see write_protocol().
 
         Parameters:
             sample_no (int):            Total number of samples
@@ -34,22 +93,61 @@ def replace_values(sample_no, sample_vol, ratio, clean_amt, eb_vol):
             eb_vol (int):               Volume of elution buffer to be used
         
             Returns:
-                Nothing.
+                A list with the folder and the filename of the protocol.
+    """
+
+    if sample_no <= 8:
+        blueprint = 'dna_cleaning_blueprint_few_samples.py'
+    else:
+        blueprint = 'dna_cleaning_blueprint.py'
+    parameters = {
+        'no_samples': sample_no,
+        'vol_samples': sample_vol,
+        'ratio': ratio,
+        'cleanings': clean_amt,
+        'vol_EB': eb_vol}
+    return write_protocol('DNA_cleaning\\', blueprint, 'dna_cleaning', parameters)
+
+
+def reagent_volumes(sample_no, sample_vol, ratio, clean_amt, eb_vol):
     """
+    Calculates how much of each reagent to load on the robot, in µl per well. Both blueprints use the wells of one
+    column of the reservoir for beads and elution buffer, and one well of ethanol per sample.
 
-    local_user = os.getlogin()
+        Parameters:
+            sample_no (int):            Total number of samples
+            sample_vol (float):         Sample volume
+            ratio (float):              Sample/SPRI-bead ratio
+            clean_amt (int):            Number of cleanings with ethanol
+            eb_vol (float):             Volume of elution buffer to be used
+
+        Returns:
+            A dictionary with the µl per well of beads, elution buffer and ethanol.
+    """
+    columns = math.ceil(sample_no / 8)
     if sample_no <= 8:
-        file_in = f'DNA_cleaning\\dna_cleaning_blueprint_few_samples.py'
+        etoh = 200 # In column 5, and also in column 6 with two cleanings
     else:
-        file_in = f'DNA_cleaning\\dna_cleaning_blueprint.py'
-    file_out = f'DNA_cleaning\\dna_cleaning_output.py'
-    
-    copyfile(file_in, file_out)
-    
-    with open(file_out, 'a') as file:
-        file.write(f'\nno_samples = {sample_no}')
-        file.write(f'\nvol_samples = {sample_vol}')
-        file.write(f'\nratio = {ratio}')
-        file.write(f'\ncleanings = {clean_amt}')
-        file.write(f'\nvol_EB = {eb_vol}')
-        
\ No newline at end of file
+        etoh = clean_amt*200 + 100
+    return {
+        'beads': sample_vol*ratio*columns + 60,
+        'eb': eb_vol*columns + 60,
+        'etoh': etoh}
+
+
+def tip_usage(sample_no):
+    """
+    Counts the tips the protocol uses. The 9-96 sample blueprint uses full columns of 8 tips and returns the ethanol tips
+    to the tip rack between the cleanings. The 1-8 sample blueprint picks up one tip per sample with the 8-channel pipettes.
+
+        Parameters:
+            sample_no (int):            Total number of samples
+
+        Returns:
+            A dictionary with the number of tips used by each pipette.
+    """
+    if sample_no <= 8:
+        # Beads, removal of supernatant, ethanol and elution buffer.
+        return {'p300_multi': 4*sample_no, 'p10_multi': sample_no}
+    columns = math.ceil(sample_no / 8)
+    return {'p300_multi': 4*columns*8, 'p10_multi': columns*8}
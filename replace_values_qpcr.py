@@ -12,12 +12,25 @@
 #      
 #   Version information:
 #           v1.1 2021-12-17: Added documentation
+#           v1.2 2026-10-18: Single pass grouping of destination wells.
+#           v1.3 2026-10-18: Reads files with several plates one plate at a time.
+#           v1.4 2026-10-18: Distribute mode for mastermixes.
+#           v1.5 2026-10-18: Tip policies for samples and standards.
+#           v1.6 2026-10-18: 8-channel pipette for full plate columns.
+#           v1.7 2026-10-18: Sources placed on the fewest tube racks, closest to the plate.
+#           v1.8 2026-10-18: Door monitor added to the protocol from door_monitor.py.
+#           v1.9 2026-10-18: Protocols saved under a hash of their content instead of a fixed output file.
+#           v1.10 2026-10-18: Title rows with a single field between plates are read as headers.
+#           v1.11 2026-10-18: Distribute mode refused for pipettes that only fill one well per aspiration.
 #
 ####################################
 
 import csv
-from shutil import copyfile
-from os import getlogin
+import math
+from itertools import groupby
+from operator import itemgetter
+import qpcr_planner
+from replace_values import write_protocol
 
 """
                         --IMPORTANT NOTICE--
@@ -25,10 +38,166 @@ from os import getlogin
 These functions are designed to work with csv-files with a specific layout. Check with owner of the robot before usage.
 """
 
+def group_destinations(csv_lines):
+    """
+    Groups the destination wells of each mastermix, standard and sample in a single pass over the rows
+    of a plate layout. Each row is looked up in a dictionary instead of rescanning all rows once per unique key,
+    so the time taken grows linearly with the number of rows.
+
+    Each standard concentration is considered unique and NTC is considered a standard.
+    Each combination of antibody, biological set name and dilution factor is considered as a unique sample.
+    The groups are kept in the order they first appear in the file.
+
+        Parameters:
+            csv_lines (iterable):       Rows of the plate layout, without the header and with the well row letter in column 0
+
+        Returns:
+            A dictionary with the destination wells for each mastermix, sample and standard.
+    """
+    mastermix_destination = {}
+    standard_destination = {}
+    sample_destination = {}
+    for line in csv_lines:
+        # Well coordinates, e.g. 'A' and '1' becomes 'A1'.
+        well = line[0] + line[1]
+
+        wells = mastermix_destination.get(line[4])
+        if wells is None:
+            wells = mastermix_destination[line[4]] = []
+        wells.append(well)
+
+        # Line corresponds to a standard or NTC
+        if 'Std' in line[2] or 'NTC' in line[2]:
+            group = standard_destination
+            key = f'{line[2]}|{line[8]}'
+        # or line corresponds to a sample
+        elif 'Unkn' in line[2]:
+            group = sample_destination
+            key = f'{line[2]}|{line[5]}|{line[6]}|{line[7]}'
+        else:
+            continue
+
+        wells = group.get(key)
+        if wells is None:
+            wells = group[key] = []
+        wells.append(well)
+
+    return {
+        'mastermix_destination': mastermix_destination,
+        'sample_destination': sample_destination,
+        'standard_destination': standard_destination,
+    }
+
+
+def assign_sources(destinations, reserved_slots=()):
+    """
+    Distributes source wells on the tube racks for each mastermix, sample and standard of a plate layout.
+    As few tube racks as possible are used, taking the racks on the slots closest to the PCR plate first, so that
+    the other slots are left free. The sources with the most destination wells get the tube positions closest to the plate.
+
+        Parameters:
+            destinations (dict):        Dictionary containing destinations for mastermixes, samples and standards
+            reserved_slots (list):      Deck slots used by other labware, where no tube rack can be placed
+
+        Returns:
+            A dictionary with the source (tube rack and well) of each mastermix, sample and standard.
+    """
+    tube_racks = [tube_rack for tube_rack, slot in qpcr_planner.tube_rack_slots.items() if slot not in reserved_slots]
+    tube_racks.sort(key=qpcr_planner.tube_rack_distance)
+
+    # Stop early if the sources do not fit on the tube racks.
+    tube_rack_wells = qpcr_planner.load_tube_rack_wells()
+    no_sources = {group.split('_')[0]: len(group_content) for group, group_content in destinations.items()}
+    positions = len(tube_racks) * len(tube_rack_wells)
+    if sum(no_sources.values()) > positions:
+        raise ValueError(f'{sum(no_sources.values())} sources ({no_sources["mastermix"]} mastermixes, {no_sources["sample"]} samples '
+                         f'and {no_sources["standard"]} standards) do not fit on the {len(tube_racks)} tube racks available, '
+                         f'which have {positions} positions')
+
+    # Distribute source wells for each mastermix, standard and sample
+    # from the positions on the fewest tube racks, closest to the plate first.
+    no_tube_racks = math.ceil(sum(no_sources.values()) / len(tube_rack_wells))
+    tube_rack_positions = [[tube_rack, well] for tube_rack in tube_racks[:no_tube_racks] for well in tube_rack_wells]
+    tube_rack_positions.sort(key=lambda position: qpcr_planner.plate_distance(qpcr_planner.source_position(position, tube_rack_wells)))
+
+    sources_by_use = [[group, mixture] for group, group_content in destinations.items() for mixture in group_content]
+    sources_by_use.sort(key=lambda source: len(destinations[source[0]][source[1]]), reverse=True)
+
+    sources = {'mastermix_source': {}, 'sample_source': {}, 'standard_source': {}}
+    for [group, mixture], position in zip(sources_by_use, tube_rack_positions):
+        sources[group.replace('_destination', '_source')][mixture] = position
+
+    # Keep the order of the file in each dictionary.
+    ordered_sources = {}
+    for group, group_content in destinations.items():
+        source_group = group.replace('_destination', '_source')
+        ordered_sources[source_group] = {mixture: sources[source_group][mixture] for mixture in group_content}
+    return ordered_sources
+
+
+def numbered_rows(csv_reader):
+    """
+    Generator that reads the rows of a .csv file one at a time and tags each well row with the plate it belongs to.
+    A header row or a blank row ends the current plate, so that several plates exported back-to-back
+    in the same file are kept apart. Only the current row is kept in memory.
+
+        Parameters:
+            csv_reader (iterable):      Rows of the .csv file, e.g. a csv.reader
+
+        Yields:
+            The plate number (starting at 1) and the row, with the well row letter in column 0.
+    """
+    plate = 0
+    offset = 0
+    header_expected = True
+    new_plate = True
+    for line in csv_reader:
+        # Blank rows separate plates.
+        if not any(field.strip() for field in line):
+            new_plate = True
+            continue
+
+        # Well rows have the column number of the well right after the row letter,
+        # anything else is the header of a new plate, e.g. a title row like 'Plate 2' with only one field.
+        if header_expected or len(line) <= offset + 1 or not line[offset + 1].strip().isdigit():
+            # Check if the .csv file starts at column 0 or 1.
+            # The example file started at 1 but changed to 0 when modified and re-saved.
+            offset = 0 if line[0] else 1
+            header_expected = False
+            new_plate = True
+            continue
+
+        if new_plate:
+            plate = plate + 1
+            new_plate = False
+        yield plate, line[offset:]
+
+
+def read_plate_layouts(filepath):
+    """
+    Generator that reads a .csv file plate by plate. For each plate the destination wells are grouped
+    and the sources are placed on tube racks before the next plate is read from the file, so that
+    the memory used does not depend on how many plates the file contains.
+
+        Parameters:
+            filepath (str):             The filepath to the csv file
+
+        Yields:
+            Two dictionaries per plate, one containing mastermix, standard and sample destinations (wells) and the other
+            dictionary contains the corresponding sources (positions on tube racks).
+    """
+    with open(filepath, 'r', newline='') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter = ',')
+        for plate, rows in groupby(numbered_rows(csv_reader), key=itemgetter(0)):
+            destinations = group_destinations(line for _, line in rows)
+            yield [destinations, assign_sources(destinations)]
+
+
 def csv_till_lista(filepath):
     """
     Takes a .csv file as input and finds which wells to distribute each
     mastermix, standard and sample. Also determines how to place each source on a tube rack. 
+    Only the first plate is read if the file contains several plates, see read_plate_layouts().
 
     The information is stored in a separate dictionary for mastermixes, standards and samples,
     as well as separate dictionaries for destination wells and source wells. Everything is then
@@ -41,129 +210,277 @@ def csv_till_lista(filepath):
             Two dictionaries, one containing mastermix, standard and sample destitnations (wells) and the other dictionary
             contains the corresponding sources (positions on tube racks). 
     """
+    plate_layouts = read_plate_layouts(filepath)
+    try:
+        return next(plate_layouts)
+    except StopIteration:
+        destinations = group_destinations([])
+        return [destinations, assign_sources(destinations)]
+    finally:
+        plate_layouts.close()
 
-    with open(filepath, 'r') as csv_file:
 
-        csv_reader = csv.reader(csv_file, delimiter = ',')
-        first_line = next(csv_reader) # Skip header in file.
-
-        # Check if the .csv file starts at column 0 or 1.
-        # The example file started at 1 but changed to 0 when modified and re-saved.  
-        if first_line[0]:
-            csv_list = [line for line in csv_reader]
-        elif not first_line[0]:
-            csv_list = [line[1:] for line in csv_reader]
-            first_line = first_line[1:]
-
-    # Finds all unique mastermixes, stadards and samples.
-    # Each standard concentration is considered unique and NTC is considered a standard.
-    # Each combination of antibody, biological set name and dilution factor is considered as a unique sample.
-    unique_mastermixes = []
-    unique_standards = []
-    unique_samples = []
-    for line in csv_list:
-        # Unique mastermixes
-        if line[4] not in unique_mastermixes:
-            unique_mastermixes.append(line[4])
-        # Line corresponds to a standard or NTC
-        if 'Std' in line[2] or 'NTC' in line[2]:
-            standard = '|'.join([line[2], line[8]])
-            if standard not in unique_standards:
-                unique_standards.append(standard)
-        # or line corresponds to a sample
-        elif 'Unkn' in line[2]:
-            sample = '|'.join([line[2],line[5],line[6],line[7]])
-            if sample not in unique_samples:
-                unique_samples.append(sample)
 
+# Single-channel pipettes that can be used for the mastermixes in distribute mode,
+# with the mount, tip rack and largest volume that fits in the tip.
+mastermix_pipettes = {
+    'p10_single': ['left', 'opentrons_96_tiprack_10ul', 10],
+    'p20_single_gen2': ['right', 'opentrons_96_tiprack_20ul', 20],
+    'p50_single': ['right', 'opentrons_96_tiprack_300ul', 50],
+}
+mastermix_tip_rack_slot = 3 # Tip rack for a pipette on the right mount, on the slot of Tube rack 8.
+multichannel_tip_rack_slot = 3 # Tip rack for the 8-channel pipette, on the slot of Tube rack 8.
+multichannel_source_slot = 2 # PCR strips for the 8-channel pipette, on the slot of Tube rack 7.
 
-    # Find well coordinates (line[0:2]) for each mastermix 
-    # and saves it as a list to a dictionary with the corresponding mastermix as the key.
-    mastermix_destination = {}
-    for mm in unique_mastermixes:
-        wells = [''.join(line[0:2]) for line in csv_list if line[4] == mm]
-        mastermix_destination[f'{mm}'] = wells
-    # Even more compact alternative but not as clear
-    # mastermix_dest_test = {f'{mm}':[''.join(line[0:2]) for line in csv_list if line[4] == mm] for mm in unique_mastermixes}
 
-    # Find well coordinates for each standard (including NTC) .
-    standard_destination = {}
-    for standard in unique_standards:    
-        wells = [''.join(line[0:2]) for line in csv_list if '|'.join([line[2], line[8]]) == standard]
-        standard_destination[f'{standard}'] = wells
+def reserved_slots(mastermix_mode='single', mastermix_pipette='p10_single', multichannel=False):
+    """
+    Finds the deck slots that are needed for other labware than tube racks with the chosen settings.
 
-    # Find well coordinates for each sample.
-    sample_destination = {}
-    for sample in unique_samples:
-        wells = [''.join(line[0:2]) for line in csv_list if '|'.join([line[2],line[5],line[6],line[7]]) == sample]
-        sample_destination[f'{sample}'] = wells
+        Parameters:
+            mastermix_mode (str):       'single' or 'distribute'
+            mastermix_pipette (str):    The pipette used for the mastermixes in distribute mode
+            multichannel (bool):        If the 8-channel pipette is used for full plate columns
+
+        Returns:
+            A set of slot numbers.
+    """
+    slots = set()
+    if mastermix_mode == 'distribute' and mastermix_pipettes[mastermix_pipette][0] == 'right':
+        slots.add(mastermix_tip_rack_slot)
+    if multichannel:
+        slots.update([multichannel_tip_rack_slot, multichannel_source_slot])
+    return slots
 
 
-    # Distribute source wells for each mastermix, standard and sample
-    # from list of wells on tube rack.
-    wells_list_tr = ['A1', 'B1', 'C1', 'D1', 'A2', 'B2', 'C2', 'D2', 'A3', 'B3', 'C3', 'D3', 
-                       'A4', 'B4', 'C4', 'D4', 'A5', 'B5', 'C5', 'D5', 'A6', 'B6', 'C6', 'D6']
-    tube_racks = ['Tube rack 1', 'Tube rack 2', 'Tube rack 3', 'Tube rack 4', 'Tube rack 5', 'Tube rack 6', 'Tube rack 7', 'Tube rack 8']
-    tube_rack_wells = [[tube_rack, well] for tube_rack in tube_racks for well in wells_list_tr]
-
-    mastermix_source = {}
-    i = 0 # Kept outside of loops to keep track which wells have been assigned. 
-    for mm in mastermix_destination.keys():
-        mastermix_source[mm] = tube_rack_wells[i]
-        i = i + 1
-
-    sample_source = {}
-    for sample in sample_destination.keys():
-        sample_source[sample] = tube_rack_wells[i]
-        i = i + 1
-
-    standard_source = {}
-    for standard in standard_destination.keys():
-        standard_source[standard] = tube_rack_wells[i]
-        i = i + 1
-
-
-    return [
-        {
-            'mastermix_destination': mastermix_destination,
-            'sample_destination': sample_destination,
-            'standard_destination': standard_destination,
-            # 'mastermix_source': mastermix_source,
-            # 'sample_source': sample_source,
-            # 'standard_source': standard_source
-        },
-        {
-            'mastermix_source': mastermix_source,
-            'sample_source': sample_source,
-            'standard_source': standard_source
-        }]
-
-
-def replace_values_qpcr(destinations, sources):
+def used_slots(sources):
+    """
+    Finds the deck slots of the tube racks that hold at least one source.
+
+        Parameters:
+            sources (dict):             Dictionary containing sources for mastermixes, samples and standards
+
+        Returns:
+            A set of slot numbers.
+    """
+    return {qpcr_planner.tube_rack_slots[source[0]] for group in sources.values() for source in group.values()}
+
+
+def mastermix_aspirations(destinations, mastermix_mode='single', mastermix_pipette='p10_single', conditioning_vol=1, disposal_vol=1, mastermix_vol=6):
+    """
+    Calculates how many wells each aspiration of mastermix fills and how many aspirations
+    are needed for the whole plate. Uses the same calculation as the qPCR blueprint.
+
+        Parameters:
+            destinations (dict):        Dictionary containing destinations for mastermixes, samples and standards
+            mastermix_mode (str):       'single' for one well per aspiration or 'distribute'
+            mastermix_pipette (str):    The pipette used for the mastermixes in distribute mode
+            conditioning_vol (float):   Volume dispensed back to the source before the first well, in distribute mode
+            disposal_vol (float):       Volume left in the tip after the last well, in distribute mode
+            mastermix_vol (float):      Volume of mastermix in each well
+
+        Returns:
+            The number of wells filled per aspiration and the total number of aspirations.
+    """
+    if mastermix_mode == 'distribute':
+        capacity = mastermix_pipettes[mastermix_pipette][2]
+        wells_per_aspiration = max(1, int((capacity - conditioning_vol - disposal_vol) // mastermix_vol))
+    else:
+        wells_per_aspiration = 1
+
+    aspirations = 0
+    for wells in destinations['mastermix_destination'].values():
+        aspirations = aspirations + math.ceil(len(wells) / wells_per_aspiration)
+    return wells_per_aspiration, aspirations
+
+
+def distribute_pipettes(conditioning_vol=1, disposal_vol=1):
+    """
+    Finds the pipettes that fill at least two wells per aspiration in distribute mode. With one well per aspiration,
+    distribute mode only adds a conditioning dispense and a blow out to every well, e.g. with the P10 and 6 ul mastermix.
+
+        Parameters:
+            conditioning_vol (float):   Volume dispensed back to the source before the first well
+            disposal_vol (float):       Volume left in the tip after the last well
+
+        Returns:
+            A list with the names of the pipettes, see mastermix_pipettes.
+    """
+    return [pipette for pipette in mastermix_pipettes
+            if mastermix_aspirations({'mastermix_destination': {}}, 'distribute', pipette, conditioning_vol, disposal_vol)[0] > 1]
+
+
+def wells_per_aspiration(mastermix_mode='single', mastermix_pipette='p10_single', sample_tip_policy='well', standard_tip_policy='well',
+                         conditioning_vol=1, disposal_vol=1):
+    """
+    Finds how many wells are filled from each aspiration for mastermixes, samples and standards.
+    Samples and standards are only dispensed to several wells per aspiration when the tip policy reuses the tip.
+    A tip policy of 'source' is counted as filling as many wells as fit in the tip.
+
+        Parameters:
+            mastermix_mode (str):       'single' or 'distribute'
+            mastermix_pipette (str):    The pipette used for the mastermixes in distribute mode
+            sample_tip_policy:          Tip policy for samples, 'well', 'source' or a number of wells per tip
+            standard_tip_policy:        Tip policy for standards, 'well', 'source' or a number of wells per tip
+            conditioning_vol (float):   Volume dispensed back to the source before the first well, in distribute mode
+            disposal_vol (float):       Volume left in the tip after the last well
+
+        Returns:
+            A dictionary with the number of wells per aspiration for each destination group.
+    """
+    [mastermix_wells, _] = mastermix_aspirations({'mastermix_destination': {}}, mastermix_mode, mastermix_pipette, conditioning_vol, disposal_vol)
+    sizes = {'mastermix_destination': mastermix_wells}
+
+    fit = max(1, int((mastermix_pipettes['p10_single'][2] - disposal_vol) // 4))
+    for group, tip_policy in [['sample_destination', sample_tip_policy], ['standard_destination', standard_tip_policy]]:
+        tip_policy = parse_tip_policy(tip_policy)
+        if tip_policy == 'well':
+            sizes[group] = 1
+        elif tip_policy == 'source':
+            sizes[group] = fit
+        else:
+            sizes[group] = min(fit, tip_policy)
+    return sizes
+
+
+def parse_tip_policy(tip_policy):
+    """
+    Checks a tip policy for samples or standards and converts a number given as text to an int.
+
+        Parameters:
+            tip_policy (str/int):       'well' for a new tip for every well, 'source' for one tip per source
+                                        or a number N for a new tip after every N wells.
+
+        Returns:
+            The tip policy, 'well', 'source' or an int.
+    """
+    if tip_policy in ['well', 'source']:
+        return tip_policy
+    try:
+        wells_per_tip = int(tip_policy)
+    except (TypeError, ValueError):
+        raise ValueError(f"Unknown tip policy '{tip_policy}', use 'well', 'source' or a number of wells per tip")
+    if wells_per_tip < 1:
+        raise ValueError('The number of wells per tip must be at least 1')
+    return wells_per_tip
+
+
+def tip_usage(destinations, mastermix_pipette='p10_single', sample_tip_policy='well', standard_tip_policy='well', multichannel_destination=None):
+    """
+    Counts the tips a qPCR protocol uses. Uses the same tip policies as the qPCR blueprint,
+    one tip per mastermix and for samples and standards a new tip after the number of wells given by the policy.
+    The 8-channel pipette uses the same policies but counts plate columns instead of wells, and one tip column
+    is counted as one tip.
+
+        Parameters:
+            destinations (dict):        Dictionary containing destinations for mastermixes, samples and standards
+            mastermix_pipette (str):    The pipette used for the mastermixes
+            sample_tip_policy:          Tip policy for samples, 'well', 'source' or a number of wells per tip
+            standard_tip_policy:        Tip policy for standards, 'well', 'source' or a number of wells per tip
+            multichannel_destination:   The plate columns filled by the 8-channel pipette, if it is used
+
+        Returns:
+            A dictionary with the number of tips used by each pipette.
+    """
+    tips = {'p10_single': 0}
+    tips[mastermix_pipette] = len(destinations['mastermix_destination'])
+    pipettes = [['p10_single', destinations]]
+    if multichannel_destination and any(multichannel_destination.values()):
+        tips['p10_multi'] = len(multichannel_destination['mastermix_destination'])
+        pipettes.append(['p10_multi', multichannel_destination])
+
+    for pipette, pipette_destinations in pipettes:
+        for group, tip_policy in [['sample_destination', sample_tip_policy], ['standard_destination', standard_tip_policy]]:
+            tip_policy = parse_tip_policy(tip_policy)
+            for wells in pipette_destinations[group].values():
+                if tip_policy == 'well':
+                    wells_per_tip = 1
+                elif tip_policy == 'source':
+                    wells_per_tip = max(1, len(wells))
+                else:
+                    wells_per_tip = tip_policy
+                tips[pipette] = tips[pipette] + math.ceil(len(wells) / wells_per_tip)
+    return tips
+
+
+def replace_values_qpcr(destinations, sources, mastermix_mode='single', mastermix_pipette='p10_single', conditioning_vol=1, disposal_vol=1,
+                        sample_tip_policy='well', standard_tip_policy='well', multichannel_destination=None, multichannel_source=None):
     """
     Creates a copy of the qPCR protocol blueprint and appends source and destination wells for each
-    mastermix, standard and sample to the new protocol.
+    mastermix, standard and sample to the new protocol, see replace_values.write_protocol().
 
     Parameters:
         destinations (str):         Dictionary containing destinations for mastermixes, samples and standards
         sources (str):              Dictionary containing sources for mastermixes, sampls and standards
+        mastermix_mode (str):       'single' for one well per aspiration or 'distribute' to fill the pipette
+                                    once and dispense to as many wells as fit
+        mastermix_pipette (str):    The pipette used for the mastermixes in distribute mode, see mastermix_pipettes
+        conditioning_vol (float):   Volume dispensed back to the source before the first well, in distribute mode
+        disposal_vol (float):       Volume left in the tip after the last well, in distribute mode
+                                    or when a tip policy fills a tip for several wells
+        sample_tip_policy:          How often to change tips for samples, 'well', 'source' or a number of wells per tip
+        standard_tip_policy:        How often to change tips for standards, 'well', 'source' or a number of wells per tip
+        multichannel_destination:   Plate columns filled by the 8-channel pipette, see qpcr_planner.split_multichannel().
+                                    The wells in these columns should not be in destinations.
+        multichannel_source:        Column on the PCR strip block used as source for each group member with full columns
 
     Returns:
-        Nothing.
+        A dictionary with the number of tips used by each pipette and a list with the folder and the filename of the protocol.
     """
-    local_user = getlogin() # Used when specifiying filepaths
-    all_wells = {**destinations, **sources} # Merge into 1 dicitonary for easy looping
-    # Create a copy
-    file_in = f'qPCR\\qpcr_blueprint.py'
-    file_out = f'qPCR\\qpcr_output.py'
-    copyfile(file_in, file_out)
+    if mastermix_mode not in ['single', 'distribute']:
+        raise ValueError(f"Unknown mastermix mode '{mastermix_mode}'")
+    if mastermix_pipette not in mastermix_pipettes:
+        raise ValueError(f"Unknown mastermix pipette '{mastermix_pipette}'")
+    if mastermix_mode == 'single':
+        mastermix_pipette = 'p10_single'
+    [mount, tip_rack, capacity] = mastermix_pipettes[mastermix_pipette]
+    if mastermix_mode == 'distribute':
+        if conditioning_vol < 0 or disposal_vol < 0 or conditioning_vol + disposal_vol + 6 > capacity:
+            raise ValueError(f'Conditioning and disposal volumes do not leave room for one well in the {capacity} ul tip')
+        if mastermix_pipette not in distribute_pipettes(conditioning_vol, disposal_vol):
+            raise ValueError(f'Only one well fits in the {capacity} ul tip of the {mastermix_pipette} per aspiration, which makes distribute mode '
+                             f'slower than single mode. Use {" or ".join(distribute_pipettes(conditioning_vol, disposal_vol))} on the right mount')
+        if mount == 'right' and mastermix_tip_rack_slot in used_slots(sources):
+            raise ValueError(f'The {mastermix_pipette} tip rack needs slot {mastermix_tip_rack_slot}, which is used by a tube rack')
+    sample_tip_policy = parse_tip_policy(sample_tip_policy)
+    standard_tip_policy = parse_tip_policy(standard_tip_policy)
 
-    # Appends well information in the format of 
+    if multichannel_destination is None or not any(multichannel_destination.values()):
+        multichannel_destination = {group: {} for group in destinations}
+        multichannel_source = {group: {} for group in sources}
+    else:
+        if mount == 'right':
+            raise ValueError(f'The 8-channel pipette and the {mastermix_pipette} both need the right mount')
+        if {multichannel_source_slot, multichannel_tip_rack_slot} & used_slots(sources):
+            raise ValueError(f'The 8-channel pipette needs slots {multichannel_source_slot} and {multichannel_tip_rack_slot}, which are used by tube racks')
+
+    # The P10 has two tip racks, the pipette on the right mount one.
+    # The 8-channel pipette has one rack with 12 tip columns.
+    tips = tip_usage(destinations, mastermix_pipette, sample_tip_policy, standard_tip_policy, multichannel_destination)
+    for pipette, no_tips in tips.items():
+        tips_available = 192 if pipette == 'p10_single' else 12 if pipette == 'p10_multi' else 96
+        if no_tips > tips_available:
+            raise ValueError(f'The protocol needs {no_tips} tips for the {pipette} but only {tips_available} are loaded')
+
+    parameters = {
+        'mastermix_mode': mastermix_mode,
+        'mastermix_pipette': mastermix_pipette,
+        'mastermix_tip_rack': tip_rack,
+        'mastermix_tip_rack_slot': mastermix_tip_rack_slot,
+        'conditioning_volume': conditioning_vol,
+        'disposal_volume': disposal_vol,
+        'sample_tip_policy': sample_tip_policy,
+        'standard_tip_policy': standard_tip_policy,
+        'multichannel_destination': multichannel_destination,
+        'multichannel_source': multichannel_source,
+        'multichannel_tip_rack_slot': multichannel_tip_rack_slot,
+        'multichannel_source_slot': multichannel_source_slot}
+    # Well information in the format of
     # <Group> = <Dictionary of wells for all group members>
-    # to the end of the file.
-    # A group is e.g. mastermix destination wells or 
+    # A group is e.g. mastermix destination wells or
     # mastermix source wells and a group memeber a specific mastermix.
-    with open(file_out, 'a') as file:
-        for well_group in all_wells:
-            wells_str = str(all_wells[well_group])
-            file.write(f'\n{well_group} = {wells_str}')
+    parameters.update(destinations)
+    parameters.update(sources)
+    protocol_file = write_protocol('qPCR\\', 'qpcr_blueprint.py', 'qpcr', parameters)
+
+    return tips, protocol_file
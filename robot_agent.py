@@ -0,0 +1,486 @@
+####################################
+#   Execution agent that runs on the OT-2 and keeps opentrons imported and the hardware controller connected between
+#   runs, so that a protocol starts within a few seconds instead of starting opentrons_execute from the beginning.
+#   Uploaded to /data/user_storage/ and controlled over ssh by main.py:
+#       python3 robot_agent.py start                    Starts the agent in the background if it isn't running
+#       python3 robot_agent.py prepare [<labware file>...]  Homes the robot if needed and checks the labware definitions
+#       python3 robot_agent.py submit <protocol file>   Runs a protocol and prints its output, like opentrons_execute
+#       python3 robot_agent.py cancel                   Cancels the run in progress, also done if submit is stopped
+#       python3 robot_agent.py stop                     Stops the agent, after cancelling the run in progress
+#   Written for the Python version on the robot (3.7), and only uses the standard library and opentrons.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Agent listening on a unix socket, with start, submit and stop commands.
+#           v1.1 2026-10-18: prepare command, so that homing can be done while the protocol is uploaded.
+#           v1.2 2026-10-18: Runs are not homed again if the robot was homed by the agent and has not moved since.
+#           v1.3 2026-10-18: Requests are answered during a run, so that it can be cancelled, and a run is cancelled
+#                            if its client disconnects.
+#           v1.4 2026-10-18: prepare does not home a robot that has not moved since it was homed.
+#           v1.5 2026-10-18: The next run or prepare is accepted as soon as the previous one has been answered.
+#
+####################################
+
+import os
+import sys
+import json
+import time
+import fcntl
+import socket
+import threading
+import traceback
+import subprocess
+import contextlib
+
+socket_path = '/tmp/ot2_agent.sock'
+log_filepath = '/tmp/ot2_agent.log'
+lock_filepath = '/tmp/ot2_agent.lock' # Locked by the running agent, so that only one agent is started
+api_level = '2.10'
+start_timeout = 120 # Seconds to wait for the agent to start, which includes homing the robot
+done_marker = '__agent_done__' # Starts the last line of the answer to a request, followed by the result as JSON
+request_timeout = 5 # Seconds to wait for the request after a client has connected
+
+
+class Run_cancelled(Exception):
+    """
+    Raised in a run before the next command when the run has been cancelled, see runlog_printer().
+    """
+
+
+def runlog_printer(cancelled=None):
+    """
+    Creates a function that prints the commands of a run with the same indentation as opentrons_execute,
+    so that the output looks the same as before. It is called before each command, so it also stops the run
+    by raising Run_cancelled if the run has been cancelled.
+
+        Parameters:
+            cancelled:                  threading.Event that is set when the run is cancelled, or None
+
+        Returns:
+            The function, to be used as emit_runlog of opentrons.execute.execute().
+    """
+    state = {'level': 0, 'last': None}
+
+    def print_runlog(command):
+        if cancelled is not None and cancelled.is_set() and command['$'] == 'before':
+            raise Run_cancelled('The run was cancelled')
+        if state['last'] == command['$']:
+            state['level'] = state['level'] + (1 if command['$'] == 'before' else -1)
+        state['last'] = command['$']
+        if command['$'] == 'before':
+            print('\t' * state['level'] + command['payload'].get('text', ''), flush=True)
+    return print_runlog
+
+
+def run_protocol(filepath, home, cancelled=None):
+    """
+    Runs a protocol in the same way as opentrons.execute.execute(), with a new protocol context on the hardware that
+    the agent keeps connected, but only homes the robot first if home is True. With a version of opentrons that does
+    not have the functions used, opentrons.execute.execute() is used instead, which always homes the robot.
+
+        Parameters:
+            filepath (str):             The protocol
+            home (bool):                If the robot should be homed before the protocol starts
+            cancelled:                  threading.Event that stops the run before the next command when it is set
+
+        Returns:
+            Nothing.
+    """
+    import opentrons.execute
+    try:
+        from opentrons import commands
+        from opentrons.protocols.parse import parse
+        from opentrons.protocols.execution import execute as execute_apiv2
+    except ImportError:
+        with open(filepath) as protocol_file:
+            opentrons.execute.execute(protocol_file, os.path.basename(filepath), emit_runlog=runlog_printer(cancelled))
+        return
+    with open(filepath) as protocol_file:
+        protocol = parse(protocol_file.read(), os.path.basename(filepath))
+    # Each run has its own context, so that nothing is left on the deck from the run before.
+    context = opentrons.execute.get_protocol_api(protocol.api_level)
+    context.broker.subscribe(commands.command_types.COMMAND, runlog_printer(cancelled))
+    if home:
+        context.home()
+    try:
+        execute_apiv2.run_protocol(protocol, context=context)
+    finally:
+        context.cleanup()
+
+
+def home_robot():
+    """
+    Homes the robot with the hardware that the agent keeps connected.
+
+        Returns:
+            Nothing.
+    """
+    import opentrons.execute
+    opentrons.execute.get_protocol_api(api_level).home()
+
+
+class Agent():
+    """
+    Answers the requests sent to the agent. 'run' and 'prepare' move the robot and are answered in their own thread,
+    one at a time, so that 'ping', 'cancel' and 'stop' are answered while they are in progress.
+
+        Attributes:
+            run:                    Function that runs a protocol, see run_protocol()
+            home:                   Function that homes the robot, see home_robot()
+            homed (bool):           True if the robot has not moved since it was homed by the agent
+            task:                   The thread of the last 'run' or 'prepare', or None
+            task_done:              threading.Event of the last 'run' or 'prepare', set just before it is answered
+            cancelled:              threading.Event of the run in progress, set to cancel it
+
+        Methods:
+            handle():
+                Answers a request.
+            cancel():
+                Cancels the run in progress.
+            wait():
+                Waits until the 'run' or 'prepare' in progress is done.
+    """
+    def __init__(self, run=run_protocol, home=home_robot):
+        """
+        Constructs the attributes of the Agent() object.
+
+            Parameters:
+                run:                    Function that runs a protocol, see run_protocol()
+                home:                   Function that homes the robot, see home_robot()
+
+            Returns:
+                Nothing.
+        """
+        self.run = run
+        self.home = home
+        self.homed = False
+        self.task = None
+        self.task_done = threading.Event()
+        self.cancelled = threading.Event()
+
+    def busy(self):
+        # Not the thread itself, which is still closing the connection when the client has the answer
+        # and may send the next request.
+        return self.task is not None and not self.task_done.is_set()
+
+    def handle(self, connection):
+        """
+        Reads a request and answers it. A request has to arrive within request_timeout after the client connected.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                connection:             The socket connected to the client, closed when the answer has been sent
+
+            Returns:
+                False if the agent should stop, otherwise True.
+        """
+        connection.settimeout(request_timeout)
+        reader = connection.makefile('r')
+        request = json.loads(reader.readline())
+        connection.settimeout(None)
+        writer = connection.makefile('w', buffering=1)
+        if request['command'] in ['run', 'prepare']:
+            if self.busy():
+                self.answer(connection, reader, writer, {'ok': False}, 'A run is already in progress')
+                return True
+            target = self.run_request if request['command'] == 'run' else self.prepare_request
+            self.cancelled = threading.Event()
+            self.task_done = threading.Event()
+            self.task = threading.Thread(target=target, args=(connection, reader, writer, request, self.cancelled), daemon=True)
+            self.task.start()
+            return True
+        if request['command'] == 'cancel':
+            self.answer(connection, reader, writer, {'ok': True, 'cancelled': self.cancel()})
+            return True
+        if request['command'] == 'stop':
+            self.cancel()
+            self.wait()
+            self.answer(connection, reader, writer, {'ok': True})
+            return False
+        self.answer(connection, reader, writer, {'ok': True, 'busy': self.busy()})
+        return True
+
+    def cancel(self):
+        """
+        Cancels the run in progress. The command that is running is finished first, e.g. a whole delay,
+        and the run stops before the next command.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                True if a run was in progress.
+        """
+        self.cancelled.set()
+        return self.busy()
+
+    def wait(self):
+        """
+        Waits until the 'run' or 'prepare' in progress is done.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        if self.task is not None:
+            self.task.join()
+
+    def answer(self, connection, reader, writer, result, text=None):
+        """
+        Sends the last lines of an answer and closes the connection.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                connection:             The socket connected to the client
+                reader:                 File object that reads from the socket
+                writer:                 File object that writes to the socket
+                result (dict):          The result, sent after done_marker
+                text (str):             Line sent before the result, or None
+
+            Returns:
+                Nothing.
+        """
+        try:
+            if text is not None:
+                writer.write(f'{text}\n')
+            writer.write(f'{done_marker} {json.dumps(result)}\n')
+        except OSError:
+            pass # The client has disconnected.
+        finally:
+            with contextlib.suppress(OSError):
+                writer.flush()
+                # Also ends the read of watch_connection().
+                connection.shutdown(socket.SHUT_RDWR)
+            for file in [writer, reader]:
+                with contextlib.suppress(OSError, ValueError):
+                    file.close()
+            connection.close()
+
+    def watch_connection(self, reader, cancelled):
+        """
+        Cancels the run if the client disconnects, e.g. when the ssh connection of 'submit' is closed.
+        Run in its own thread while the run is in progress.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                reader:                 File object that reads from the socket
+                cancelled:              threading.Event of the run
+
+            Returns:
+                Nothing.
+        """
+        with contextlib.suppress(OSError, ValueError):
+            reader.read() # The client sends nothing more, so this returns when the connection is closed.
+        cancelled.set()
+
+    def prepare_request(self, connection, reader, writer, request, cancelled):
+        """
+        Homes the robot, unless it has not moved since it was homed, and reads each labware definition of a 'prepare'
+        request. The next run starts without homing.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                connection:             The socket connected to the client
+                reader:                 File object that reads from the socket
+                writer:                 File object that writes to the socket
+                request (dict):         The request
+                cancelled:              threading.Event, not used
+
+            Returns:
+                Nothing.
+        """
+        result = {'ok': True}
+        start_time = time.time()
+        try:
+            if self.homed:
+                writer.write('Robot already homed\n')
+            else:
+                self.home()
+                self.homed = True
+                writer.write(f'Robot homed in {time.time() - start_time:.1f} s\n')
+            # Reads each labware definition, so that a missing or broken file is found before the run starts
+            # and the file is cached by the operating system when the protocol opens it.
+            for filepath in request.get('labware', []):
+                try:
+                    with open(filepath) as labware_file:
+                        definition = json.load(labware_file)
+                    writer.write(f"Labware {definition['parameters']['loadName']} ready\n")
+                except (OSError, ValueError, KeyError) as error:
+                    writer.write(f'Labware {filepath} could not be read: {error}\n')
+                    result = {'ok': False}
+        except Exception:
+            result = {'ok': False}
+            with contextlib.suppress(OSError):
+                traceback.print_exc(file=writer)
+        result['seconds'] = time.time() - start_time
+        self.task_done.set()
+        self.answer(connection, reader, writer, result)
+
+    def run_request(self, connection, reader, writer, request, cancelled):
+        """
+        Runs the protocol of a 'run' request. The output of the run, including what the protocol prints,
+        is sent to the client while it runs.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                connection:             The socket connected to the client
+                reader:                 File object that reads from the socket
+                writer:                 File object that writes to the socket
+                request (dict):         The request
+                cancelled:              threading.Event that is set to cancel the run
+
+            Returns:
+                Nothing.
+        """
+        threading.Thread(target=self.watch_connection, args=(reader, cancelled), daemon=True).start()
+        result = {'ok': True}
+        start_time = time.time()
+        home_first = not self.homed
+        self.homed = False # The robot moves as soon as the run starts.
+        with contextlib.redirect_stdout(writer):
+            try:
+                print('Homing the robot' if home_first else 'Robot already homed by the agent, starting without homing', flush=True)
+                self.run(request['protocol'], home_first, cancelled)
+            except Exception:
+                result = {'ok': False, 'cancelled': cancelled.is_set()}
+                with contextlib.suppress(OSError):
+                    traceback.print_exc(file=writer)
+        result['seconds'] = time.time() - start_time
+        self.task_done.set()
+        self.answer(connection, reader, writer, result)
+
+
+def serve(agent=None):
+    """
+    Runs the agent: imports opentrons, connects to the hardware and homes the robot once, and then answers the requests
+    sent to the unix socket, see Agent. A run is only homed first if the robot has moved since it was homed by the
+    agent, i.e. if a protocol has run since the agent started or since the last 'prepare'.
+
+        Parameters:
+            agent:                      The Agent that answers the requests, Agent() if None
+
+        Returns:
+            Nothing.
+    """
+    lock = open(lock_filepath, 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print('Another agent is already running', flush=True)
+        return
+    agent = Agent() if agent is None else agent
+
+    # The first protocol context connects to the hardware, which opentrons.execute keeps for every later run.
+    agent.home()
+    agent.homed = True
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(5)
+    print(f'Agent ready on {socket_path}', flush=True)
+
+    running = True
+    while running:
+        connection, _ = server.accept()
+        try:
+            running = agent.handle(connection)
+        except (OSError, ValueError, KeyError) as error:
+            # The client disconnected or sent something that isn't a request, the agent keeps running.
+            # Printed to the log, since sys.stdout is sent to the client of the run in progress.
+            print(f'Request failed: {error}', file=sys.__stdout__, flush=True)
+            connection.close()
+    server.close()
+    os.remove(socket_path)
+    lock.close()
+
+
+def send(request, echo=True):
+    """
+    Sends a request to the agent and prints the answer while it arrives.
+
+        Parameters:
+            request (dict):             The request, e.g. {'command': 'run', 'protocol': '/data/user_storage/x.py'}
+            echo (bool):                If the answer should be printed
+
+        Returns:
+            The result as a dictionary, or None if the agent isn't running.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        return None
+    with client, client.makefile('r') as reader:
+        client.sendall((json.dumps(request) + '\n').encode())
+        for line in reader:
+            if line.startswith(done_marker):
+                return json.loads(line[len(done_marker):])
+            if echo:
+                print(line, end='', flush=True)
+    return None
+
+
+def start():
+    """
+    Starts the agent in the background if it isn't already running, and waits until it is ready.
+
+        Returns:
+            True if the agent is running.
+    """
+    if send({'command': 'ping'}, echo=False) is not None:
+        print('Agent already running')
+        return True
+    with open(lock_filepath, 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            starting = False
+        except OSError:
+            starting = True # Started by someone else, and still homing
+    if not starting:
+        print('Starting agent')
+        with open(log_filepath, 'a') as log:
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve'], stdout=log, stderr=log,
+                             stdin=subprocess.DEVNULL, start_new_session=True)
+    start_time = time.time()
+    while time.time() - start_time < start_timeout:
+        if send({'command': 'ping'}, echo=False) is not None:
+            print(f'Agent ready after {time.time() - start_time:.0f} s')
+            return True
+        time.sleep(0.5)
+    print(f'The agent did not start, see {log_filepath}')
+    return False
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 2 and sys.argv[1] == 'serve':
+        serve()
+    elif len(sys.argv) == 2 and sys.argv[1] == 'start':
+        sys.exit(0 if start() else 1)
+    elif len(sys.argv) == 2 and sys.argv[1] == 'cancel':
+        result = send({'command': 'cancel'}, echo=False)
+        print('Run cancelled' if result and result['cancelled'] else 'No run in progress')
+    elif len(sys.argv) == 2 and sys.argv[1] == 'stop':
+        send({'command': 'stop'}, echo=False)
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'prepare':
+        result = start() and send({'command': 'prepare', 'labware': [os.path.abspath(filepath) for filepath in sys.argv[2:]]})
+        sys.exit(0 if result and result['ok'] else 1)
+    elif len(sys.argv) == 3 and sys.argv[1] == 'submit':
+        result = send({'command': 'run', 'protocol': os.path.abspath(sys.argv[2])})
+        if result is None:
+            print('The agent is not running')
+        sys.exit(0 if result is not None and result['ok'] else 1)
+    else:
+        print('Usage: python3 robot_agent.py start | stop | cancel | prepare [<labware file>...] | submit <protocol file>')
+        sys.exit(1)
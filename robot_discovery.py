@@ -0,0 +1,173 @@
+####################################
+#   Discovery of the OT-2 on the network, by trying to connect to port 22 (ssh) of several addresses at the same time.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Concurrent probing of known, recently seen and link-local addresses.
+#           v1.1 2026-10-18: A fixed number of workers probe the addresses, instead of one task per address.
+#
+####################################
+
+import os
+import json
+import asyncio
+import ipaddress
+
+
+recent_filepath = 'robot_addresses.json'
+no_recent = 5 # Number of recently seen addresses that are saved
+cached_robot = None # Address of the robot found during this session
+
+
+async def probe(ip, port=22, timeout=0.5):
+    """
+    Tries to connect to a port of an address.
+
+        Parameters:
+            ip (str):                   The address
+            port (int):                 The port
+            timeout (float):            Seconds to wait for the connection
+
+        Returns:
+            The address if the connection was established, otherwise None.
+    """
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    writer.close()
+    return ip
+
+
+async def first_responsive(addresses, port=22, timeout=0.5, concurrency=256):
+    """
+    Probes the addresses with a fixed number of workers that each take the next address from the same iterator,
+    so that sweeping a large subnet never creates more than concurrency tasks at the same time.
+    Gives the first address that answers. The other workers are then cancelled.
+
+        Parameters:
+            addresses (iterable):       The addresses to probe, in the order they should be tried
+            port (int):                 The port
+            timeout (float):            Seconds to wait for each connection
+            concurrency (int):          Number of workers, i.e. connections that are attempted at the same time
+
+        Returns:
+            The first address that answered, or None if none of them did.
+    """
+    addresses = iter(addresses)
+
+    async def worker():
+        for ip in addresses:
+            if await probe(ip, port, timeout) is not None:
+                return ip
+        return None
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        for task in asyncio.as_completed(workers):
+            ip = await task
+            if ip is not None:
+                return ip
+        return None
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def recent_addresses(filepath=recent_filepath):
+    """
+    Reads the addresses where the robot has been found before, the most recent first.
+
+        Parameters:
+            filepath (str):             Filepath to the saved addresses
+
+        Returns:
+            A list with the addresses.
+    """
+    if not os.path.exists(filepath):
+        return []
+    try:
+        with open(filepath) as file:
+            return [str(ip) for ip in json.load(file)]
+    except (OSError, ValueError):
+        return []
+
+
+def remember(ip, filepath=recent_filepath):
+    """
+    Caches the address of the robot for the rest of the session and saves it as the most recently seen address.
+
+        Parameters:
+            ip (str):                   The address of the robot
+            filepath (str):             Filepath to the saved addresses
+
+        Returns:
+            Nothing.
+    """
+    global cached_robot
+    cached_robot = ip
+    addresses = [ip] + [address for address in recent_addresses(filepath) if address != ip]
+    try:
+        with open(filepath, 'w') as file:
+            json.dump(addresses[:no_recent], file)
+    except OSError as error:
+        print(f'Could not save the robot address: {error}')
+
+
+def forget():
+    """
+    Removes the cached address, e.g. when the robot could no longer be reached there.
+
+        Returns:
+            Nothing.
+    """
+    global cached_robot
+    cached_robot = None
+
+
+def candidate_addresses(known, subnet=None):
+    """
+    Lists the addresses to probe, without duplicates: the cached address, the known addresses and the recently seen
+    addresses first, followed by every address of the subnet.
+
+        Parameters:
+            known (list):               Addresses the robot usually has
+            subnet (str):               Subnet to sweep, e.g. '169.254.0.0/16', or None
+
+        Returns:
+            A list with the addresses.
+    """
+    addresses = [cached_robot] if cached_robot else []
+    addresses = addresses + list(known) + recent_addresses()
+    if subnet is not None:
+        addresses = addresses + [str(ip) for ip in ipaddress.ip_network(subnet, strict=False).hosts()]
+    return list(dict.fromkeys(addresses))
+
+
+def discover(known, subnet=None, port=22, timeout=0.5, sweep_timeout=0.3):
+    """
+    Finds the robot by probing its port for ssh. The cached, known and recently seen addresses are probed at the same
+    time first. If none of them answers and a subnet is given, every address of the subnet is probed.
+
+        Parameters:
+            known (list):               Addresses the robot usually has
+            subnet (str):               Subnet to sweep if the robot is not found on the other addresses, or None
+            port (int):                 The port
+            timeout (float):            Seconds to wait for each of the cached, known and recently seen addresses
+            sweep_timeout (float):      Seconds to wait for each address of the subnet
+
+        Returns:
+            The address of the robot, or None if it was not found.
+    """
+    ip = asyncio.run(first_responsive(candidate_addresses(known), port, timeout))
+    if ip is None and subnet is not None:
+        ip = asyncio.run(first_responsive(candidate_addresses(known, subnet), port, sweep_timeout))
+    return ip
@@ -0,0 +1,305 @@
+####################################
+#   Runs protocols through the HTTP API of the robot server (port 31950), the same way as the Opentrons app.
+#   opentrons-robot-server keeps running, so it does not have to be stopped before and started again after a run.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Upload, start and follow runs with the /protocols and /runs endpoints.
+#           v1.1 2026-10-18: Http_execution_worker always ends with a 'done' line, also after unexpected errors.
+#           v1.2 2026-10-18: A run that is stopped during the upload is never started.
+#           v1.3 2026-10-18: Every page of new commands is read before a finished run ends the log.
+#
+####################################
+
+import os
+import json
+import time
+import uuid
+import threading
+import urllib.request
+
+
+# Errors that can be raised when the robot can not be reached or answers with an error or something unexpected.
+# urllib.error.URLError and HTTPError are subclasses of OSError.
+http_errors = (OSError, ValueError, KeyError)
+
+# Statuses of a run that do not change any more.
+finished_statuses = ['succeeded', 'stopped', 'failed']
+
+
+class Robot_http_api():
+    """
+    Client for the HTTP API of the robot server.
+
+        Attributes:
+            url (str):              Address of the API, e.g. 'http://169.254.29.201:31950'
+            timeout (float):        Seconds to wait for each request
+            api_version (str):      Version of the API, sent in the Opentrons-Version header of every request
+
+        Methods:
+            request():
+                Sends a request and gives the answer.
+            upload_protocol():
+                Uploads a protocol and the custom labware it uses.
+            create_run():
+                Creates a run of a protocol.
+            action():
+                Starts, pauses or stops a run.
+            run_status():
+                Gets the status of a run.
+            commands():
+                Gets the commands of a run.
+    """
+    def __init__(self, ip, port=31950, timeout=10, api_version='2'):
+        """
+        Constructs the attributes of the Robot_http_api() object.
+
+            Parameters:
+                ip (str):               The ip address of the robot, or e.g. '127.0.0.1' for a mock server
+                port (int):             The port of the API
+                timeout (float):        Seconds to wait for each request
+                api_version (str):      Version of the API
+
+            Returns:
+                Nothing.
+        """
+        self.url = f'http://{ip}:{port}'
+        self.timeout = timeout
+        self.api_version = api_version
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        """
+        Sends a request to the API.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                method (str):           'GET' or 'POST'
+                path (str):             Path of the endpoint, e.g. '/runs'
+                body:                   Dictionary sent as JSON, bytes sent as they are, or None
+                content_type (str):     Content type of a body that is bytes
+
+            Returns:
+                The answer decoded from JSON.
+        """
+        headers = {'Opentrons-Version': self.api_version}
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+        if body is not None:
+            headers['Content-Type'] = content_type
+        request = urllib.request.Request(f'{self.url}{path}', data=body, headers=headers, method=method)
+        with urllib.request.urlopen(request, timeout=self.timeout) as answer:
+            return json.loads(answer.read().decode())
+
+    def upload_protocol(self, filepaths):
+        """
+        Uploads a protocol. Files with custom labware definitions can be uploaded with it, and are then only available
+        to the protocol through protocol.load_labware(), not as files on the robot.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                filepaths (list):       Filepath of the protocol, followed by the filepaths of the labware definitions
+
+            Returns:
+                The id of the protocol on the robot.
+        """
+        boundary = uuid.uuid4().hex
+        parts = []
+        for filepath in filepaths:
+            with open(filepath, 'rb') as file:
+                content = file.read()
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{os.path.basename(filepath)}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+        body = b''.join(parts) + f'--{boundary}--\r\n'.encode()
+        answer = self.request('POST', '/protocols', body, f'multipart/form-data; boundary={boundary}')
+        return answer['data']['id']
+
+    def create_run(self, protocol_id):
+        """
+        Creates a run of an uploaded protocol. The run is not started until action() is called with 'play'.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                protocol_id (str):      The id of the protocol, see upload_protocol()
+
+            Returns:
+                The id of the run.
+        """
+        answer = self.request('POST', '/runs', {'data': {'protocolId': protocol_id}})
+        return answer['data']['id']
+
+    def action(self, run_id, action_type):
+        """
+        Starts, pauses or stops a run.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                run_id (str):           The id of the run
+                action_type (str):      'play', 'pause' or 'stop'
+
+            Returns:
+                Nothing.
+        """
+        self.request('POST', f'/runs/{run_id}/actions', {'data': {'actionType': action_type}})
+
+    def run_status(self, run_id):
+        """
+        Gets the status of a run, e.g. 'running', 'paused' or 'succeeded'.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                run_id (str):           The id of the run
+
+            Returns:
+                The status as a string.
+        """
+        return self.request('GET', f'/runs/{run_id}')['data']['status']
+
+    def commands(self, run_id, cursor, page_length=100):
+        """
+        Gets the commands of a run, from the command with index cursor.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                run_id (str):           The id of the run
+                cursor (int):           Index of the first command to get
+                page_length (int):      Maximum number of commands to get
+
+            Returns:
+                A list with the commands as dictionaries.
+        """
+        return self.request('GET', f'/runs/{run_id}/commands?cursor={cursor}&pageLength={page_length}')['data']
+
+
+def describe_command(command):
+    """
+    Describes a command of a run on one line, e.g. 'aspirate: 5.0 ul, well A1'.
+
+        Parameters:
+            command (dict):             The command, see Robot_http_api.commands()
+
+        Returns:
+            The description as a string.
+    """
+    params = command.get('params') or {}
+    details = []
+    if 'volume' in params:
+        details.append(f"{params['volume']} ul")
+    if 'wellName' in params:
+        details.append(f"well {params['wellName']}")
+    if 'message' in params: # Comments and pauses
+        details.append(params['message'])
+    if 'seconds' in params:
+        details.append(f"{params['seconds']} s")
+    text = command.get('commandType', 'command')
+    if details:
+        text = f"{text}: {', '.join(str(detail) for detail in details)}"
+    if command.get('error'):
+        text = f"{text} FAILED: {command['error'].get('detail', command['error'])}"
+    return text
+
+
+class Http_execution_worker(threading.Thread):
+    """
+    Subclass of threading.Thread that uploads and runs a protocol through the HTTP API and follows the run by polling
+    it. Each command and each change of status is put in a queue as a line of text, in the same way as
+    robot_session.Execution_worker, so both can be shown in the same log.
+
+        Attributes:
+            api:                    The Robot_http_api to use
+            filepaths (list):       Filepath of the protocol, followed by the filepaths of the labware definitions
+            lines:                  Queue where each line is put as ['line', text]. When the run is finished
+                                    ['done', completed, error] is put, where completed is True if the run succeeded
+                                    and error is None or a description of the error.
+            poll_interval (float):  Seconds between the checks of the run
+
+        Methods:
+            run:                    Uploads, starts and follows the run.
+            stop:                   Stops the run.
+    """
+    def __init__(self, api, filepaths, lines, poll_interval=1, page_length=100):
+        """
+        Inherits the __init__() from threading.Thread.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                api:                    The Robot_http_api to use
+                filepaths (list):       Filepath of the protocol, followed by the filepaths of the labware definitions
+                lines (Queue):          The queue.Queue where the output is put
+                poll_interval (float):  Seconds between the checks of the run
+                page_length (int):      Number of commands asked for in each request
+
+            Returns:
+                Nothing.
+        """
+        # Daemon thread so that it doesn't keep the program open.
+        super().__init__(daemon=True)
+        self.api = api
+        self.filepaths = filepaths
+        self.lines = lines
+        self.poll_interval = poll_interval
+        self.page_length = page_length
+        self.run_id = None
+        self.stopped = False
+
+    def run(self):
+        """
+        Uploads the protocol, starts a run and puts each new command and status in the queue until the run is finished.
+        Automatically called by using the start() function on the object. ['done', ...] is always put last, also after
+        an unexpected error, since the log waits for it to end the run.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        status = None
+        try:
+            protocol_id = self.api.upload_protocol(self.filepaths)
+            self.run_id = self.api.create_run(protocol_id)
+            # Stopped instead of started if stop() was called during the upload.
+            self.api.action(self.run_id, 'stop' if self.stopped else 'play')
+            no_commands = 0
+            while True:
+                new_status = self.api.run_status(self.run_id)
+                # Fetched after the status, so that the last commands of a finished run are included.
+                # More commands than fit on one page can be new, e.g. after a slow check, so pages are read
+                # until one is not full.
+                while True:
+                    page = self.api.commands(self.run_id, no_commands, self.page_length)
+                    for command in page:
+                        self.lines.put(['line', describe_command(command)])
+                        no_commands = no_commands + 1
+                    if len(page) < self.page_length:
+                        break
+                if new_status != status:
+                    status = new_status
+                    self.lines.put(['line', f'Run {status}'])
+                if status in finished_statuses:
+                    break
+                time.sleep(self.poll_interval)
+        except Exception as error: # http_errors, or an answer that is not what was expected
+            self.lines.put(['done', False, f'{type(error).__name__}: {error}'])
+        else:
+            self.lines.put(['done', status == 'succeeded', None])
+
+    def stop(self):
+        """
+        Stops the run, or stops it as soon as it has been created if the protocol is still being uploaded.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        self.stopped = True
+        if self.run_id is not None:
+            self.api.action(self.run_id, 'stop')
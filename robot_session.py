@@ -0,0 +1,460 @@
+####################################
+#   SSH session to the OT-2 that is opened once and reused for every command and file upload.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Persistent session with paramiko, with the ssh and scp commands as fallback.
+#           v1.1 2026-10-18: Worker thread that runs a command and passes its output on through a queue.
+#           v1.2 2026-10-18: Thread safe, so that stages of a run can be prepared at the same time, see launcher.
+#           v1.3 2026-10-18: Files are only uploaded if their hash differs on the robot, with an enforced timeout and progress.
+#           v1.4 2026-10-18: Execution_worker always ends with a 'done' line, also after unexpected errors.
+#           v1.5 2026-10-18: Execution_worker can be stopped, which stops the command on the robot.
+#
+####################################
+
+import os
+import time
+import socket
+import hashlib
+import subprocess
+import threading
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None # The ssh and scp commands are used instead, with one connection per command.
+
+
+class Remote_command_error(Exception):
+    """
+    Raised by Robot_session.run() with check=True when a command on the robot fails.
+    """
+
+
+# Errors that can be raised when the robot can not be reached or a command fails.
+if paramiko is not None:
+    session_errors = (OSError, subprocess.SubprocessError, Remote_command_error, paramiko.SSHException)
+else:
+    session_errors = (OSError, subprocess.SubprocessError, Remote_command_error)
+
+
+def file_hash(filepath):
+    """
+    Calculates the sha256 hash of a file, the same as the sha256sum command on the robot.
+
+        Parameters:
+            filepath (str):     The file
+
+        Returns:
+            The hash as a hexadecimal string.
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(65536), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class Robot_session():
+    """
+    SSH session to the robot. With paramiko installed, one connection is opened the first time it is needed and then
+    reused for every command and upload, so the key exchange is only done once. Each command runs in its own channel
+    of the connection. Without paramiko, every command starts ssh or scp like before.
+    Commands are run with "sh -lic" (login and interactive shell), which is required on the robot to find
+    the labware and calibration data.
+
+        Attributes:
+            ip (str):               The ip address of the robot
+            username (str):         The user to log in as
+            key_filename (str):     Filepath to the ssh key
+            timeout (float):        Seconds to wait for the connection and for uploads
+
+        Methods:
+            open():
+                Opens the connection if it is not already open.
+            run():
+                Runs a command and waits for it to finish.
+            stream():
+                Runs a command and gives its output line by line while it runs.
+            stop_stream():
+                Stops the command started by stream().
+            output():
+                Runs a command and gives its output.
+            remote_hashes():
+                Calculates the hashes of files on the robot.
+            upload():
+                Uploads a file.
+            sync():
+                Uploads the files that are missing or changed on the robot.
+            close():
+                Closes the connection.
+    """
+    def __init__(self, ip, username, key_filename, timeout=5):
+        """
+        Constructs the attributes of the Robot_session() object. The connection is not opened until it is needed.
+
+            Parameters:
+                ip (str):               The ip address of the robot
+                username (str):         The user to log in as
+                key_filename (str):     Filepath to the ssh key
+                timeout (float):        Seconds to wait for the connection and for uploads
+
+            Returns:
+                Nothing.
+        """
+        self.ip = ip
+        self.username = username
+        self.key_filename = key_filename
+        self.timeout = timeout
+        self.client = None
+        self.sftp = None
+        self.streaming = None # Channel or process of the command started by stream()
+        # Commands and uploads can be started from several threads at the same time.
+        self.lock = threading.Lock()
+        self.upload_lock = threading.Lock()
+
+    def open(self):
+        """
+        Opens the connection if it is not already open, or opens it again if it has been lost.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        if paramiko is None:
+            return
+        with self.lock:
+            if self.client is not None and self.client.get_transport() is not None and self.client.get_transport().is_active():
+                return
+            self.close()
+            client = paramiko.SSHClient()
+            # Same as the ssh command accepting the key of the robot the first time it connects.
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(self.ip, username=self.username, key_filename=self.key_filename, timeout=self.timeout,
+                           look_for_keys=False, allow_agent=False)
+            client.get_transport().set_keepalive(30) # Keeps the connection open during long runs.
+            self.client = client
+
+    def ssh_command(self, command):
+        """
+        Creates the ssh command used when paramiko is not installed.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                command (str):  The command to run on the robot
+
+            Returns:
+                The ssh command as a string.
+        """
+        return f'ssh -i {self.key_filename} {self.username}@{self.ip} -t "sh -lic" \'{command}\''
+
+    def run(self, command, check=False):
+        """
+        Runs a command on the robot and waits for it to finish. The output is printed.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                command (str):  The command to run on the robot
+                check (bool):   If Remote_command_error should be raised when the command fails
+
+            Returns:
+                The exit status of the command.
+        """
+        if paramiko is None:
+            exit_status = subprocess.run(self.ssh_command(command)).returncode
+        else:
+            _, stdout, _ = self.channel(command)
+            for line in stdout:
+                print(line.rstrip('\r\n'))
+            exit_status = stdout.channel.recv_exit_status()
+        if check and exit_status != 0:
+            raise Remote_command_error(f"'{command}' failed with exit status {exit_status}")
+        return exit_status
+
+    def channel(self, command):
+        """
+        Starts a command in a new channel of the connection. Only used with paramiko.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                command (str):  The command to run on the robot
+
+            Returns:
+                The stdin, stdout and stderr of the command.
+        """
+        self.open()
+        # get_pty=True is the same as ssh -t, so the command stops if the connection is lost.
+        return self.client.exec_command(f"sh -lic '{command}'", get_pty=True)
+
+    def stream(self, command):
+        """
+        Runs a command on the robot and gives its output line by line while it runs.
+        The exit status is saved in last_exit_status when the command is done.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                command (str):  The command to run on the robot
+
+            Returns:
+                A generator with the lines of the output.
+        """
+        self.last_exit_status = None
+        if paramiko is None:
+            process = subprocess.Popen(self.ssh_command(command), stdout=subprocess.PIPE, text=True)
+            self.streaming = process
+            for line in process.stdout:
+                yield line.rstrip('\r\n')
+            self.last_exit_status = process.wait()
+            self.streaming = None
+            return
+
+        _, stdout, _ = self.channel(command)
+        self.streaming = stdout.channel
+        for line in stdout:
+            yield line.rstrip('\r\n')
+        self.last_exit_status = stdout.channel.recv_exit_status()
+        self.streaming = None
+
+    def stop_stream(self):
+        """
+        Stops the command started by stream() by closing its channel, or stopping ssh without paramiko. The command
+        has a terminal (ssh -t), so it is stopped on the robot when the connection to it is closed.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        streaming = self.streaming
+        if streaming is None:
+            return
+        if paramiko is None:
+            streaming.terminate()
+        else:
+            streaming.close()
+
+    def output(self, command):
+        """
+        Runs a command on the robot and gives its output instead of printing it.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+                command (str):  The command to run on the robot
+
+            Returns:
+                The exit status and the output as a string.
+        """
+        if paramiko is None:
+            # Without -t, so that the output is not mixed with the messages of the terminal.
+            process = subprocess.run(f'ssh -i {self.key_filename} {self.username}@{self.ip} {command}',
+                                     capture_output=True, text=True, timeout=self.timeout)
+            return [process.returncode, process.stdout]
+        self.open()
+        _, stdout, _ = self.client.exec_command(command, timeout=self.timeout)
+        text = stdout.read().decode()
+        return [stdout.channel.recv_exit_status(), text]
+
+    def remote_hashes(self, remote_filepaths):
+        """
+        Calculates the sha256 hashes of files on the robot, with one command for all files.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                remote_filepaths (list): The files on the robot
+
+            Returns:
+                A dictionary with the hash of each file that exists.
+        """
+        # Files that don't exist give an error, which is ignored.
+        [_, text] = self.output(f"sha256sum {' '.join(remote_filepaths)} 2>/dev/null")
+        hashes = {}
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                hashes[parts[1]] = parts[0]
+        return hashes
+
+    def upload(self, local_filepath, remote_filepath, progress=None):
+        """
+        Uploads a file to the robot. Raises subprocess.TimeoutExpired or socket.timeout if the whole upload takes
+        longer than the timeout, and stops the upload.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                local_filepath (str):   The file to upload
+                remote_filepath (str):  Where to place it on the robot
+                progress:               Function called with the bytes sent and the size of the file, or None
+
+            Returns:
+                Nothing.
+        """
+        if paramiko is None:
+            # scp is stopped by subprocess.run() when the timeout is reached.
+            subprocess.run(f'scp -i {self.key_filename} {local_filepath} {self.username}@{self.ip}:{remote_filepath}',
+                           timeout=self.timeout, check=True)
+            if progress is not None:
+                size = os.path.getsize(local_filepath)
+                progress(size, size)
+            return
+        self.open()
+        deadline = time.time() + self.timeout
+
+        def callback(sent, size):
+            # Called by paramiko after each block, raising an error stops the upload.
+            if time.time() > deadline:
+                raise socket.timeout(f'Upload of {local_filepath} took longer than {self.timeout} s')
+            if progress is not None:
+                progress(sent, size)
+
+        with self.upload_lock:
+            if self.sftp is None:
+                self.sftp = self.client.open_sftp()
+                self.sftp.get_channel().settimeout(self.timeout)
+            self.sftp.put(local_filepath, remote_filepath, callback=callback)
+
+    def sync(self, files, progress=None):
+        """
+        Uploads the files that are missing on the robot or have changed, by comparing the sha256 hash of each file
+        with the file on the robot. The hash of each uploaded file is checked on the robot afterwards, and
+        Remote_command_error is raised if it differs.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                files (list):           The files as [local_filepath, remote_filepath]
+                progress:               Function called with the local filepath, the bytes sent and the size of the
+                                        file while a file is uploaded, or None
+
+            Returns:
+                A list with the local filepaths of the files that were uploaded.
+        """
+        local_hashes = {remote_filepath: file_hash(local_filepath) for [local_filepath, remote_filepath] in files}
+        remote_hashes = self.remote_hashes(list(local_hashes))
+        uploaded = []
+        for [local_filepath, remote_filepath] in files:
+            if remote_hashes.get(remote_filepath) == local_hashes[remote_filepath]:
+                continue
+            file_progress = None
+            if progress is not None:
+                file_progress = lambda sent, size, filepath=local_filepath: progress(filepath, sent, size)
+            self.upload(local_filepath, remote_filepath, file_progress)
+            uploaded.append(remote_filepath)
+
+        if uploaded:
+            remote_hashes = self.remote_hashes(uploaded)
+            for remote_filepath in uploaded:
+                if remote_hashes.get(remote_filepath) != local_hashes[remote_filepath]:
+                    raise Remote_command_error(f'{remote_filepath} differs from the uploaded file')
+        return [local_filepath for [local_filepath, remote_filepath] in files if remote_filepath in uploaded]
+
+    def close(self):
+        """
+        Closes the connection.
+
+            Parameters:
+                self:           Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        if self.sftp is not None:
+            self.sftp.close()
+            self.sftp = None
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+class Execution_worker(threading.Thread):
+    """
+    Subclass of threading.Thread that runs a command over a Robot_session in the background and puts each line of the
+    output in a queue while it runs. A function that prepares the run, e.g. uploads the protocol, can be run first. If the queue is full, the worker waits until there is room, so the output is never
+    lost and never kept in memory any longer than needed.
+
+        Attributes:
+            session:                The Robot_session to run the command over
+            command (str):          The command to run on the robot
+            lines:                  Queue where each line is put as ['line', text]. When the command is done
+                                    ['done', completed, error] is put, where completed is True if completion_text was
+                                    found in the output and error is None or a description of the error.
+            completion_text (str):  Text that the output contains when the command completed successfully
+            prepare:                Function run before the command, or None. It is called with a function that puts
+                                    a line in the queue, and can raise an error to stop the run.
+
+        Methods:
+            run:                    Runs the command.
+            stop:                   Stops the command.
+    """
+    def __init__(self, session, command, lines, completion_text, prepare=None):
+        """
+        Inherits the __init__() from threading.Thread.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                session:                The Robot_session to run the command over
+                command (str):          The command to run on the robot
+                lines (Queue):          The queue.Queue where the output is put
+                completion_text (str):  Text that the output contains when the command completed successfully
+                prepare:                Function run before the command, or None
+
+            Returns:
+                Nothing.
+        """
+        # Daemon thread so that it doesn't keep the program open.
+        super().__init__(daemon=True)
+        self.session = session
+        self.command = command
+        self.lines = lines
+        self.completion_text = completion_text
+        self.prepare = prepare
+        self.stopped = False
+
+    def run(self):
+        """
+        Runs the command and puts its output in the queue. Automatically called by using the start() function on the object.
+        ['done', ...] is always put last, also if prepare or the command raises an unexpected error, since the log
+        waits for it to end the run.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        completed = False
+        try:
+            if self.prepare is not None:
+                self.prepare(lambda line: self.lines.put(['line', line]))
+            if not self.stopped:
+                for line in self.session.stream(self.command):
+                    if self.completion_text in line:
+                        completed = True
+                    self.lines.put(['line', line])
+                    if self.stopped: # Stopped before the stream had started
+                        self.session.stop_stream()
+        except Exception as error: # session_errors, or a bug in prepare
+            self.lines.put(['done', completed, f'{type(error).__name__}: {error}'])
+        else:
+            self.lines.put(['done', completed, None])
+
+    def stop(self):
+        """
+        Stops the command. If the run is still being prepared, the command is not started.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                Nothing.
+        """
+        self.stopped = True
+        self.session.stop_stream()
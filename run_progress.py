@@ -0,0 +1,146 @@
+####################################
+#   Progress and remaining time of a run, found by matching the output of opentrons_execute with the simulated steps.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Progress tracker for the log of a run.
+#
+####################################
+
+import time
+import bisect
+import protocol_simulator
+
+
+class Progress_tracker():
+    """
+    Follows a run by matching each line of the output of opentrons_execute with the steps of the simulation of the
+    protocol, see protocol_simulator.simulate(). opentrons_execute prints the same text for each step as the simulation
+    records. Only the position in the steps is saved, so the output itself is not kept.
+    The remaining time is the estimated duration of the steps that are left, and counts down during the current step,
+    so it also counts down during protocol.delay().
+
+        Attributes:
+            steps (list):           The simulated steps as [command, text, duration]
+            window (int):           How many steps ahead a line is searched for, so that a line that is printed by
+                                    several steps matches the next one and not one at the end of the protocol
+            current (int):          Index of the step that is running, -1 before the first step
+
+        Methods:
+            update():
+                Matches a line of the output with the steps.
+            remaining():
+                Estimated seconds left of the run.
+            fraction():
+                How much of the run is done.
+            status_text():
+                Describes the progress.
+    """
+    def __init__(self, steps, window=200):
+        """
+        Constructs the attributes of the Progress_tracker() object.
+
+            Parameters:
+                steps (list):       The simulated steps as [command, text, duration]
+                window (int):       How many steps ahead a line is searched for
+
+            Returns:
+                Nothing.
+        """
+        self.steps = steps
+        self.window = window
+        self.current = -1
+        self.current_start = None
+        # Indices of the steps with each text, in order, to find the next step with a text quickly.
+        self.indices = {}
+        for i, [_, text, _] in enumerate(steps):
+            self.indices.setdefault(text.strip(), []).append(i)
+        # Estimated seconds from the start of the run to the end of each step.
+        self.ends = []
+        total = 0
+        for [_, _, duration] in steps:
+            total = total + duration
+            self.ends.append(total)
+        self.total = total
+
+    def update(self, line, now=None):
+        """
+        Matches a line of the output with the next step that has the same text.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                line (str):         Line of the output of opentrons_execute
+                now (float):        Time when the line was printed, time.time() if None
+
+            Returns:
+                True if the line matched a step.
+        """
+        indices = self.indices.get(line.strip())
+        if indices is None:
+            return False
+        position = bisect.bisect_right(indices, self.current)
+        if position == len(indices) or indices[position] - self.current > self.window:
+            return False
+        self.current = indices[position]
+        self.current_start = time.time() if now is None else now
+        return True
+
+    def remaining(self, now=None):
+        """
+        Estimates how many seconds are left of the run.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                now (float):        The time to estimate for, time.time() if None
+
+            Returns:
+                The remaining seconds.
+        """
+        if self.current < 0:
+            return self.total
+        now = time.time() if now is None else now
+        duration = self.steps[self.current][2]
+        left_of_current = max(0, duration - (now - self.current_start))
+        return self.total - self.ends[self.current] + left_of_current
+
+    def fraction(self, now=None):
+        """
+        Calculates how much of the run is done, by estimated time.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                now (float):        The time to calculate for, time.time() if None
+
+            Returns:
+                The fraction that is done, from 0 to 1.
+        """
+        if self.total == 0:
+            return 0
+        return 1 - self.remaining(now) / self.total
+
+    def status_text(self, now=None):
+        """
+        Describes the progress with the current step, the percent done, the remaining time and when the run is done.
+
+            Parameters:
+                self:               Allows the function to access class attributes and methods
+                now (float):        The time to describe, time.time() if None
+
+            Returns:
+                The description as a string.
+        """
+        now = time.time() if now is None else now
+        remaining = self.remaining(now)
+        if self.current < 0:
+            step = 'Starting'
+        else:
+            step = f'Step {self.current + 1}/{len(self.steps)}: {self.steps[self.current][1].strip()}'
+        finish = time.strftime('%H:%M', time.localtime(now + remaining))
+        return f'{step}\n{100*self.fraction(now):.0f} % done, {protocol_simulator.format_duration(remaining)} left (done at about {finish})'
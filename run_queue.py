@@ -0,0 +1,200 @@
+####################################
+#   Queue of generated protocols that are run one after the other on the robot, over the same connection.
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Run queue with validation of the protocols when they are added and before they are run.
+#
+####################################
+
+import os
+import ast
+
+
+def protocol_type(protocol_file):
+    """
+    Finds the type of a protocol from its filename, see replace_values.write_protocol().
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+
+        Returns:
+            'dna' or 'qpcr', the same as the protocol_type of Checkbox, or None if the type is not known.
+    """
+    if protocol_file[1].startswith('dna_cleaning'):
+        return 'dna'
+    if protocol_file[1].startswith('qpcr'):
+        return 'qpcr'
+    return None
+
+
+def user_values(source):
+    """
+    Reads the user input variables of a protocol, i.e. the values after '#User input variables.',
+    see replace_values.protocol_text(). A value that is set twice has its last value.
+
+        Parameters:
+            source (str):               The text of the protocol
+
+        Returns:
+            A dictionary with the name and value of each variable.
+    """
+    values = {}
+    if '#User input variables.' not in source:
+        return values
+    for statement in ast.parse(source.split('#User input variables.', 1)[1]).body:
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+            try:
+                values[statement.targets[0].id] = ast.literal_eval(statement.value)
+            except ValueError:
+                pass # Not a plain value
+    return values
+
+
+def validate(protocol_file, labware_filepaths=()):
+    """
+    Checks that a protocol can be run: the file exists, is valid Python with a run() function,
+    is of a known type and the custom labware it needs exists.
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+            labware_filepaths:          Filepaths of the custom labware definitions that qPCR protocols need
+
+        Returns:
+            A list with a description of each problem, empty if the protocol can be run.
+    """
+    filepath = f'{protocol_file[0]}{protocol_file[1]}'
+    if not os.path.isfile(filepath):
+        return [f'{filepath} does not exist']
+    problems = []
+    with open(filepath) as file:
+        source = file.read()
+    try:
+        tree = ast.parse(source, filepath)
+    except SyntaxError as error:
+        return [f'{filepath} is not valid Python: {error}']
+    if not any(isinstance(statement, ast.FunctionDef) and statement.name == 'run' for statement in tree.body):
+        problems.append(f'{filepath} has no run() function')
+    if protocol_type(protocol_file) is None:
+        problems.append(f'{protocol_file[1]} is not a DNA cleaning or qPCR protocol')
+    if protocol_type(protocol_file) == 'qpcr':
+        for labware_filepath in labware_filepaths:
+            if not os.path.isfile(labware_filepath):
+                problems.append(f'The custom labware {labware_filepath} does not exist')
+    return problems
+
+
+def describe(protocol_file, no_values=5):
+    """
+    Describes a protocol with its filename and first user input variables, to tell the protocols of a queue apart.
+
+        Parameters:
+            protocol_file (list):       Folder and filename of the protocol
+            no_values (int):            Number of variables to show
+
+        Returns:
+            The description as a string, e.g. 'dna_cleaning_3f2a9c81d0e4.py (no_samples=24, vol_samples=30, ...)'.
+    """
+    try:
+        with open(f'{protocol_file[0]}{protocol_file[1]}') as file:
+            values = user_values(file.read())
+    except (OSError, SyntaxError):
+        values = {}
+    text = ', '.join(f'{name}={value}' for name, value in list(values.items())[:no_values])
+    return f'{protocol_file[1]} ({text})' if text else protocol_file[1]
+
+
+class Run_queue():
+    """
+    Protocols waiting to be run, in order. Each protocol is validated when it is added, and should be validated
+    again with validate() right before it is run, in case the file has changed.
+
+        Attributes:
+            protocols (list):       The protocols as [folder, filename]
+            labware_filepaths:      Filepaths of the custom labware definitions that qPCR protocols need
+
+        Methods:
+            add():
+                Validates a protocol and adds it at the end of the queue.
+            remove():
+                Removes a protocol.
+            peek():
+                Gives the next protocol.
+            pop():
+                Removes and gives the next protocol.
+    """
+    def __init__(self, labware_filepaths=()):
+        """
+        Constructs the attributes of the Run_queue() object.
+
+            Parameters:
+                labware_filepaths:  Filepaths of the custom labware definitions that qPCR protocols need
+
+            Returns:
+                Nothing.
+        """
+        self.protocols = []
+        self.labware_filepaths = labware_filepaths
+
+    def __len__(self):
+        return len(self.protocols)
+
+    def add(self, protocol_file):
+        """
+        Validates a protocol and adds it at the end of the queue if it can be run.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                protocol_file (list):   Folder and filename of the protocol
+
+            Returns:
+                A list with a description of each problem, empty if the protocol was added.
+        """
+        problems = validate(protocol_file, self.labware_filepaths)
+        if not problems:
+            self.protocols.append(protocol_file)
+        return problems
+
+    def remove(self, index):
+        """
+        Removes a protocol from the queue.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+                index (int):            Position of the protocol in the queue
+
+            Returns:
+                Nothing.
+        """
+        del self.protocols[index]
+
+    def peek(self):
+        """
+        Gives the next protocol without removing it.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                The protocol as [folder, filename], or None if the queue is empty.
+        """
+        return self.protocols[0] if self.protocols else None
+
+    def pop(self):
+        """
+        Removes and gives the next protocol.
+
+            Parameters:
+                self:                   Allows the function to access class attributes and methods
+
+            Returns:
+                The protocol as [folder, filename].
+        """
+        return self.protocols.pop(0)
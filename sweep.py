@@ -0,0 +1,144 @@
+####################################
+#   Table of run time, tip usage and reagent consumption for every valid DNA cleaning protocol, used for capacity planning.
+#   Run from the program folder, e.g.: python sweep.py dna_cleaning_sweep.csv --simulate
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Parameter sweep over the values accepted by Bead_protocol_config.
+#           v1.1 2026-10-18: A protocol that fails to simulate is written with its error instead of stopping the sweep.
+#
+####################################
+
+import csv
+import argparse
+import functools
+import multiprocessing
+import replace_values
+import time_model
+import protocol_simulator
+
+
+columns = ['samples', 'sample_volume', 'ratio', 'cleanings', 'eb_volume', 'fast_estimate_s', 'simulated_s',
+           'tips_p300', 'tips_p10', 'beads_ul_per_well', 'eb_ul_per_well', 'etoh_ul_per_well', 'error']
+
+
+def value_range(low, high, step):
+    """
+    Gives the values from low to high, both included, with the given step. The values are rounded to avoid
+    floating point errors such as 0.7000000000000001.
+
+        Parameters:
+            low (float):                The first value
+            high (float):               The last value
+            step (float):               Step between the values
+
+        Returns:
+            A list with the values.
+    """
+    no_values = int(round((high - low) / step)) + 1
+    return [round(low + i*step, 6) for i in range(no_values)]
+
+
+def parameter_grid(volume_step=1, ratio_step=0.1, eb_step=1, sample_step=1):
+    """
+    Gives every combination of the values accepted by Bead_protocol_config.ok_button(): 1-96 samples, 15-40 µl samples,
+    ratios 0.5-1.5, 1-2 washes and 15-25 µl elution buffer.
+
+        Parameters:
+            volume_step (float):        Step between the sample volumes
+            ratio_step (float):         Step between the ratios
+            eb_step (float):            Step between the elution buffer volumes
+            sample_step (int):          Step between the numbers of samples
+
+        Returns:
+            A list with the parameters of each protocol, in the order of replace_values.replace_values().
+    """
+    return [[sample_no, sample_vol, ratio, clean_amt, eb_vol]
+            for sample_no in range(1, 97, sample_step)
+            for sample_vol in value_range(15, 40, volume_step)
+            for ratio in value_range(0.5, 1.5, ratio_step)
+            for clean_amt in [1, 2]
+            for eb_vol in value_range(15, 25, eb_step)]
+
+
+def sweep_row(parameters, simulate=False, coefficients=None):
+    """
+    Calculates the run time, tip usage and reagent consumption of one protocol. The run time is always estimated with
+    time_model, and with simulate=True the protocol is also created with replace_values() and simulated.
+    If the simulation fails, simulated_s is left empty and the error is written in the error column, so that one
+    protocol that can not be run does not stop the sweep.
+
+        Parameters:
+            parameters (list):          Parameters of the protocol, in the order of replace_values.replace_values()
+            simulate (bool):            If the protocol should be simulated
+            coefficients (dict):        Seconds per command for time_model
+
+        Returns:
+            A list with the values of the row, in the order of columns.
+    """
+    counts = time_model.dna_cleaning_counts(*parameters)
+    simulated = ''
+    error = ''
+    if simulate:
+        try:
+            simulated = protocol_simulator.estimate(replace_values.replace_values(*parameters))['total']
+        except Exception as exception: # Any error raised by the protocol or by opentrons
+            error = f'{type(exception).__name__}: {exception}'
+    tips = replace_values.tip_usage(parameters[0])
+    volumes = replace_values.reagent_volumes(*parameters)
+    return parameters + [round(time_model.predict(counts, coefficients), 1), simulated, tips['p300_multi'], tips['p10_multi'],
+                         round(volumes['beads'], 2), volumes['eb'], volumes['etoh'], error]
+
+
+def run_sweep(filepath, grid, simulate=False, processes=None):
+    """
+    Calculates every protocol of the grid with sweep_row() in a pool of processes and writes the table to a csv-file.
+    The rows are written in the order of the grid as they are calculated.
+
+        Parameters:
+            filepath (str):             Filepath of the csv-file
+            grid (list):                Parameters of each protocol, see parameter_grid()
+            simulate (bool):            If each protocol should be simulated
+            processes (int):            Number of processes, the number of cores if None
+
+        Returns:
+            Nothing.
+    """
+    row = functools.partial(sweep_row, simulate=simulate, coefficients=time_model.load_coefficients())
+    # Simulations take much longer than the fast estimate, so they are handed out in smaller chunks.
+    chunksize = 4 if simulate else 2000
+    with open(filepath, 'w', newline='') as file, multiprocessing.Pool(processes) as pool:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        no_errors = 0
+        for i, values in enumerate(pool.imap(row, grid, chunksize), start=1):
+            writer.writerow(values)
+            if values[-1]:
+                no_errors = no_errors + 1
+            if i % 50000 == 0 or i == len(grid):
+                print(f'{i}/{len(grid)} protocols')
+    if no_errors:
+        print(f'{no_errors} protocols could not be simulated, see the error column of {filepath}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run time, tip usage and reagent consumption of DNA cleaning protocols.')
+    parser.add_argument('filepath', help='csv-file to write the table to')
+    parser.add_argument('--simulate', action='store_true', help='also simulate every protocol (slow, use larger steps)')
+    parser.add_argument('--processes', type=int, default=None, help='number of processes, default is the number of cores')
+    parser.add_argument('--volume-step', type=float, default=1, help='step between sample volumes in µl')
+    parser.add_argument('--ratio-step', type=float, default=0.1, help='step between bead ratios')
+    parser.add_argument('--eb-step', type=float, default=1, help='step between elution buffer volumes in µl')
+    parser.add_argument('--sample-step', type=int, default=1, help='step between numbers of samples')
+    args = parser.parse_args()
+
+    grid = parameter_grid(args.volume_step, args.ratio_step, args.eb_step, args.sample_step)
+    print(f'Sweeping {len(grid)} protocols')
+    run_sweep(args.filepath, grid, args.simulate, args.processes)
@@ -0,0 +1,10 @@
+####################################
+#   Makes the modules of the program importable from the tests, which are run from the program folder with:
+#       python -m pytest tests
+#
+####################################
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,137 @@
+####################################
+#   Stand-in for the HTTP API of the robot server, with the /protocols, /runs, /runs/{id}/actions and
+#   /runs/{id}/commands endpoints used by robot_http, for testing without a robot.
+#
+####################################
+
+import json
+import uuid
+import threading
+import email.parser
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def comment_run(files):
+    """
+    Default way to run a protocol: succeeds with one comment for each uploaded file, or fails if the protocol
+    contains the text 'raise'.
+
+        Parameters:
+            files (dict):               The content of each uploaded file, by filename. The protocol is the first file.
+
+        Returns:
+            The status of the finished run and a list with its commands.
+    """
+    commands = [{'commandType': 'comment', 'params': {'message': f'Loaded {filename}'}} for filename in files]
+    protocol = next(iter(files.values()), b'')
+    if b'raise' in protocol:
+        commands.append({'commandType': 'comment', 'params': {'message': 'Protocol failed'}, 'error': {'detail': 'Exception in protocol'}})
+        return ['failed', commands]
+    return ['succeeded', commands]
+
+
+class Mock_robot_server(ThreadingHTTPServer):
+    """
+    HTTP server on a free port of localhost that answers like the robot server. A run is 'idle' when it is created,
+    'running' after 'play' until its status has been read polls_per_run times, and then has the status given by
+    execute. A 'stop' action stops it.
+
+        Attributes:
+            execute:                Function called with the uploaded files that gives the status and the commands
+            polls_per_run (int):    Number of times the status is 'running' before the run is finished
+            protocols (dict):       The uploaded files of each protocol, by id
+            runs (dict):            The protocol id, status, polls and commands of each run, by id
+            requests (list):        Method and path of each request
+    """
+    def __init__(self, execute=comment_run, polls_per_run=2):
+        super().__init__(('127.0.0.1', 0), Mock_request_handler)
+        self.execute = execute
+        self.polls_per_run = polls_per_run
+        self.protocols = {}
+        self.runs = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class Mock_request_handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass # Keeps the output of the tests clean.
+
+    def answer(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        server = self.server
+        path = urllib.parse.urlparse(self.path).path.strip('/').split('/')
+        server.requests.append(['POST', self.path])
+        if self.headers.get('Opentrons-Version') is None:
+            return self.answer(400, {'errors': [{'detail': 'Missing Opentrons-Version header'}]})
+        body = self.read_body()
+        with server.lock:
+            if path == ['protocols']:
+                # The multipart form is parsed as an e-mail message, which has the same format.
+                message = email.parser.BytesParser().parsebytes(f'Content-Type: {self.headers["Content-Type"]}\r\n\r\n'.encode() + body)
+                files = {part.get_filename(): part.get_payload(decode=True) for part in message.get_payload()}
+                protocol_id = uuid.uuid4().hex
+                server.protocols[protocol_id] = files
+                return self.answer(201, {'data': {'id': protocol_id, 'files': [{'name': name} for name in files]}})
+            if path == ['runs']:
+                protocol_id = json.loads(body)['data']['protocolId']
+                if protocol_id not in server.protocols:
+                    return self.answer(404, {'errors': [{'detail': f'Protocol {protocol_id} not found'}]})
+                run_id = uuid.uuid4().hex
+                server.runs[run_id] = {'protocolId': protocol_id, 'status': 'idle', 'polls': 0, 'commands': []}
+                return self.answer(201, {'data': {'id': run_id, 'status': 'idle'}})
+            if len(path) == 3 and path[0] == 'runs' and path[2] == 'actions' and path[1] in server.runs:
+                run = server.runs[path[1]]
+                action_type = json.loads(body)['data']['actionType']
+                if action_type == 'play' and run['status'] == 'idle':
+                    run['status'] = 'running'
+                elif action_type == 'stop' and run['status'] in ['idle', 'running', 'paused']:
+                    run['status'] = 'stopped'
+                elif action_type != 'pause':
+                    return self.answer(409, {'errors': [{'detail': f"Can not {action_type} a run that is {run['status']}"}]})
+                return self.answer(201, {'data': {'actionType': action_type}})
+        self.answer(404, {'errors': [{'detail': f'{self.path} not found'}]})
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlparse(self.path)
+        path = url.path.strip('/').split('/')
+        server.requests.append(['GET', self.path])
+        with server.lock:
+            if len(path) >= 2 and path[0] == 'runs' and path[1] in server.runs:
+                run = server.runs[path[1]]
+                if len(path) == 2:
+                    if run['status'] == 'running':
+                        run['polls'] = run['polls'] + 1
+                        if run['polls'] > server.polls_per_run:
+                            [run['status'], run['commands']] = server.execute(server.protocols[run['protocolId']])
+                    return self.answer(200, {'data': {'id': path[1], 'status': run['status']}})
+                if path[2:] == ['commands']:
+                    query = urllib.parse.parse_qs(url.query)
+                    cursor = int(query.get('cursor', ['0'])[0])
+                    page_length = int(query.get('pageLength', ['20'])[0])
+                    commands = [{'id': str(i), 'status': 'succeeded', **command} for i, command in enumerate(run['commands'])]
+                    return self.answer(200, {'data': commands[cursor:cursor + page_length]})
+        self.answer(404, {'errors': [{'detail': f'{self.path} not found'}]})
@@ -0,0 +1,55 @@
+####################################
+#   Tests of replace_values_qpcr: reading of qPCR .csv files and checks of the mastermix settings.
+#
+####################################
+
+import pytest
+
+import replace_values_qpcr
+
+header = ['Row', 'Column', '*Target Name', '*Sample Name', 'Target', 'Antibody', 'Set', 'Dilution', 'Quantity']
+
+
+def well_row(row, column, content='Unkn-01', mastermix='Target 1'):
+    return [row, str(column), content, '', mastermix, 'Antibody', 'Set 1', '1', '']
+
+
+def test_single_plate():
+    rows = [header, well_row('A', 1), well_row('A', 2)]
+    assert list(replace_values_qpcr.numbered_rows(rows)) == [(1, well_row('A', 1)), (1, well_row('A', 2))]
+
+
+def test_plates_separated_by_title_rows_and_blank_rows():
+    rows = [['Plate 1'], header, well_row('A', 1), well_row('B', 1),
+            [], ['Plate 2'], header, well_row('C', 3, mastermix='Target 2'),
+            ['', '', ''], ['Plate 3', '', ''], header, well_row('D', 4)]
+    numbered = list(replace_values_qpcr.numbered_rows(rows))
+    assert [plate for plate, _ in numbered] == [1, 1, 2, 3]
+    assert replace_values_qpcr.group_destinations(line for plate, line in numbered if plate == 2)['mastermix_destination'] == {'Target 2': ['C3']}
+
+
+def test_plates_starting_at_column_1():
+    # Re-saved files can start at column 0 instead, so the offset is found again for every header.
+    rows = [['', *header], ['', *well_row('A', 1)], [''], ['Plate 2'], header, well_row('B', 2)]
+    assert list(replace_values_qpcr.numbered_rows(rows)) == [(1, well_row('A', 1)), (2, well_row('B', 2))]
+
+
+def test_distribute_refused_with_one_well_per_aspiration():
+    destinations = replace_values_qpcr.group_destinations([well_row('A', 1), well_row('A', 2)])
+    sources = {'mastermix_source': {'Target 1': ['Tube rack 1', 'A1']}, 'sample_source': {'Unkn-01|Antibody|Set 1|1': ['Tube rack 1', 'A2']},
+               'standard_source': {}}
+    assert replace_values_qpcr.distribute_pipettes() == ['p20_single_gen2', 'p50_single']
+    with pytest.raises(ValueError, match='slower than single mode'):
+        replace_values_qpcr.replace_values_qpcr(destinations, sources, mastermix_mode='distribute', mastermix_pipette='p10_single')
+
+
+def test_read_plate_layouts_outside_the_program_folder(tmp_path, monkeypatch):
+    filepath = tmp_path / 'plates.csv'
+    rows = [header, well_row('A', 1), well_row('A', 2), [], ['Plate 2'], header, well_row('B', 1, mastermix='Target 2')]
+    filepath.write_text(''.join(','.join(row) + '\n' for row in rows))
+    monkeypatch.chdir(tmp_path)
+    [[destinations, sources], [destinations_2, _]] = list(replace_values_qpcr.read_plate_layouts(str(filepath)))
+    assert destinations['mastermix_destination'] == {'Target 1': ['A1', 'A2']}
+    assert sources['mastermix_source']['Target 1'][0] == 'Tube rack 1'
+    assert destinations_2['mastermix_destination'] == {'Target 2': ['B1']}
+    assert replace_values_qpcr.csv_till_lista(str(filepath)) == [destinations, sources]
@@ -0,0 +1,157 @@
+####################################
+#   Tests of the requests to robot_agent.py, with functions that stand in for homing the robot and running
+#   a protocol with opentrons.
+#
+####################################
+
+import json
+import time
+import socket
+import threading
+import pytest
+
+import robot_agent
+
+
+class Robot():
+    """
+    Counts the homing of the robot and runs a protocol as a number of commands, which each take step seconds.
+    """
+    def __init__(self, no_commands=3, step=0):
+        self.no_commands = no_commands
+        self.step = step
+        self.no_homings = 0
+        self.started = threading.Event()
+
+    def home(self):
+        self.no_homings = self.no_homings + 1
+
+    def run(self, filepath, home, cancelled=None):
+        if home:
+            self.home()
+        emit_runlog = robot_agent.runlog_printer(cancelled)
+        self.started.set()
+        for i in range(self.no_commands):
+            emit_runlog({'$': 'before', 'payload': {'text': f'Command {i + 1}'}})
+            time.sleep(self.step)
+            emit_runlog({'$': 'after', 'payload': {'text': f'Command {i + 1}'}})
+        if 'fail' in filepath:
+            raise RuntimeError('Protocol failed')
+        print('Protocol Complete')
+
+
+def request(request):
+    """
+    Sends a request to the agent like robot_agent.send(), but gives the lines of the answer instead of printing them,
+    since the agent sends what is printed during a run to the client.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client, client.makefile('r') as reader:
+        client.connect(robot_agent.socket_path)
+        client.sendall((json.dumps(request) + '\n').encode())
+        lines = reader.read().splitlines()
+    return [lines[:-1], json.loads(lines[-1][len(robot_agent.done_marker):])]
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(robot_agent, 'socket_path', str(tmp_path / 'agent.sock'))
+    monkeypatch.setattr(robot_agent, 'lock_filepath', str(tmp_path / 'agent.lock'))
+    robot = Robot()
+    server = threading.Thread(target=robot_agent.serve, args=(robot_agent.Agent(robot.run, robot.home),), daemon=True)
+    server.start()
+    while robot_agent.send({'command': 'ping'}, echo=False) is None:
+        time.sleep(0.01)
+    yield robot
+    robot_agent.send({'command': 'stop'}, echo=False)
+    server.join(5)
+    assert not server.is_alive()
+
+
+def test_runs_are_only_homed_when_the_robot_has_moved(agent):
+    assert agent.no_homings == 1 # When the agent started
+    [lines, result] = request({'command': 'run', 'protocol': 'protocol.py'})
+    assert result['ok']
+    assert agent.no_homings == 1
+    assert lines[0] == 'Robot already homed by the agent, starting without homing'
+
+    [lines, result] = request({'command': 'run', 'protocol': 'protocol.py'})
+    assert result['ok']
+    assert agent.no_homings == 2
+    assert lines == ['Homing the robot', 'Command 1', 'Command 2', 'Command 3', 'Protocol Complete']
+
+    assert request({'command': 'prepare', 'labware': []})[1]['ok']
+    assert agent.no_homings == 3
+    assert request({'command': 'run', 'protocol': 'protocol.py'})[1]['ok']
+    assert agent.no_homings == 3
+
+
+def test_prepare_only_homes_when_the_robot_has_moved(agent):
+    [lines, result] = request({'command': 'prepare', 'labware': []})
+    assert result['ok'] and lines == ['Robot already homed']
+    assert agent.no_homings == 1
+    assert request({'command': 'run', 'protocol': 'protocol.py'})[1]['ok']
+    [lines, result] = request({'command': 'prepare', 'labware': []})
+    assert lines[0].startswith('Robot homed in')
+    assert agent.no_homings == 2
+    [lines, result] = request({'command': 'run', 'protocol': 'protocol.py'})
+    assert lines[0] == 'Robot already homed by the agent, starting without homing'
+    assert agent.no_homings == 2
+
+
+def test_failed_run(agent):
+    [lines, result] = request({'command': 'run', 'protocol': 'fail.py'})
+    assert result['ok'] is False and result['cancelled'] is False
+    assert 'RuntimeError: Protocol failed' in lines
+
+
+def run_in_background(results, protocol='protocol.py'):
+    thread = threading.Thread(target=lambda: results.append(request({'command': 'run', 'protocol': protocol})[1]))
+    thread.start()
+    return thread
+
+
+def test_cancel_during_run(agent):
+    agent.no_commands = 1000
+    agent.step = 0.01
+    results = []
+    thread = run_in_background(results)
+    agent.started.wait(5)
+    assert robot_agent.send({'command': 'ping'}, echo=False)['busy']
+    # A second run is refused while the first is in progress.
+    assert robot_agent.send({'command': 'run', 'protocol': 'protocol.py'}, echo=False)['ok'] is False
+    assert robot_agent.send({'command': 'cancel'}, echo=False)['cancelled']
+    thread.join(5)
+    assert results[0]['ok'] is False and results[0]['cancelled'] is True
+    assert robot_agent.send({'command': 'cancel'}, echo=False)['cancelled'] is False
+
+
+def test_disconnect_cancels_run(agent):
+    agent.no_commands = 1000
+    agent.step = 0.01
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(robot_agent.socket_path)
+    client.sendall(b'{"command": "run", "protocol": "protocol.py"}\n')
+    agent.started.wait(5)
+    client.close()
+    start_time = time.time()
+    while robot_agent.send({'command': 'ping'}, echo=False)['busy']:
+        assert time.time() - start_time < 5
+        time.sleep(0.01)
+
+
+def test_stop_cancels_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(robot_agent, 'socket_path', str(tmp_path / 'agent.sock'))
+    monkeypatch.setattr(robot_agent, 'lock_filepath', str(tmp_path / 'agent.lock'))
+    robot = Robot(no_commands=1000, step=0.01)
+    server = threading.Thread(target=robot_agent.serve, args=(robot_agent.Agent(robot.run, robot.home),), daemon=True)
+    server.start()
+    while robot_agent.send({'command': 'ping'}, echo=False) is None:
+        time.sleep(0.01)
+    results = []
+    thread = run_in_background(results)
+    robot.started.wait(5)
+    assert robot_agent.send({'command': 'stop'}, echo=False)['ok']
+    thread.join(5)
+    server.join(5)
+    assert results[0]['cancelled'] is True
+    assert not server.is_alive()
@@ -0,0 +1,35 @@
+####################################
+#   Tests of the probing of addresses in robot_discovery.
+#
+####################################
+
+import socket
+import asyncio
+
+import robot_discovery
+
+
+def test_first_responsive_finds_a_listening_port():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        port = listener.getsockname()[1]
+        # 127.0.0.2 does not answer on the port, so the address after it is found.
+        assert asyncio.run(robot_discovery.first_responsive(['127.0.0.2', '127.0.0.1'], port, timeout=1)) == '127.0.0.1'
+        assert asyncio.run(robot_discovery.first_responsive(['127.0.0.2'], port, timeout=1)) is None
+
+
+def test_sweep_uses_a_fixed_number_of_tasks(monkeypatch):
+    no_tasks = []
+
+    async def probe(ip, port, timeout):
+        no_tasks.append(len(asyncio.all_tasks()))
+        await asyncio.sleep(0)
+        return ip if ip == '169.254.15.254' else None
+
+    monkeypatch.setattr(robot_discovery, 'probe', probe)
+    addresses = (str(ip) for ip in robot_discovery.ipaddress.ip_network('169.254.0.0/20').hosts())
+    assert asyncio.run(robot_discovery.first_responsive(addresses, concurrency=16)) == '169.254.15.254'
+    assert len(no_tasks) == 4094
+    # The workers and the main task of asyncio.run().
+    assert max(no_tasks) <= 16 + 1
@@ -0,0 +1,145 @@
+####################################
+#   Tests of robot_http.Http_execution_worker against the mock robot server in mock_robot_server.py.
+#
+####################################
+
+import os
+import json
+import queue
+import socket
+import pytest
+
+import robot_http
+import replace_values
+import replace_values_qpcr
+import benchmark
+from mock_robot_server import Mock_robot_server
+
+program_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+labware_filepath = os.path.join(program_folder, 'Custom labware', 'own_24_tuberack_1500ul.json')
+
+
+@pytest.fixture
+def server():
+    server = Mock_robot_server()
+    server.start()
+    yield server
+    server.stop()
+
+
+def run_worker(server, filepaths, stop_after=None):
+    """
+    Runs a protocol on the server with an Http_execution_worker and gives the lines it put in the queue.
+    """
+    lines = queue.Queue()
+    worker = robot_http.Http_execution_worker(robot_http.Robot_http_api('127.0.0.1', server.port, timeout=5), filepaths, lines, poll_interval=0.01)
+    worker.start()
+    messages = []
+    while not messages or messages[-1][0] != 'done':
+        messages.append(lines.get(timeout=10))
+        if stop_after is not None and messages[-1] == ['line', stop_after]:
+            worker.stop()
+    worker.join(5)
+    return messages
+
+
+def test_run_succeeded(server, tmp_path):
+    protocol = tmp_path / 'qpcr_0123456789ab.py'
+    protocol.write_text('print("Protocol Complete")\n')
+    messages = run_worker(server, [str(protocol), labware_filepath])
+
+    assert messages[-1] == ['done', True, None]
+    lines = [text for [kind, text, *_] in messages if kind == 'line']
+    assert lines == ['Run running', 'comment: Loaded qpcr_0123456789ab.py', 'comment: Loaded own_24_tuberack_1500ul.json', 'Run succeeded']
+    # The labware definition is uploaded with the protocol, unchanged.
+    [files] = server.protocols.values()
+    assert json.loads(files['own_24_tuberack_1500ul.json'])['parameters']['loadName'] == 'own_24_tuberack_1500ul'
+
+
+def test_run_failed(server, tmp_path):
+    protocol = tmp_path / 'dna_cleaning_0123456789ab.py'
+    protocol.write_text('raise RuntimeError()\n')
+    messages = run_worker(server, [str(protocol)])
+
+    assert messages[-1] == ['done', False, None]
+    assert ['line', 'comment: Protocol failed FAILED: Exception in protocol'] in messages
+    assert messages[-2] == ['line', 'Run failed']
+
+
+def test_run_stopped(server, tmp_path):
+    server.polls_per_run = 1000
+    protocol = tmp_path / 'dna_cleaning_0123456789ab.py'
+    protocol.write_text('print("Protocol Complete")\n')
+    messages = run_worker(server, [str(protocol)], stop_after='Run running')
+
+    assert messages[-2:] == [['line', 'Run stopped'], ['done', False, None]]
+    assert [method for [method, path] in server.requests if path.endswith('/actions')] == ['POST', 'POST']
+
+
+def test_commands_on_several_pages_are_all_logged(tmp_path):
+    # All commands are new at the first check of the run, which is already finished.
+    server = Mock_robot_server(lambda files: ['succeeded', [{'commandType': 'comment', 'params': {'message': str(i)}} for i in range(250)]], polls_per_run=0)
+    server.start()
+    protocol = tmp_path / 'dna_cleaning_0123456789ab.py'
+    protocol.write_text('print("Protocol Complete")\n')
+    try:
+        messages = run_worker(server, [str(protocol)])
+    finally:
+        server.stop()
+    assert [text for [kind, text, *_] in messages if kind == 'line'] == [f'comment: {i}' for i in range(250)] + ['Run succeeded']
+    assert messages[-1] == ['done', True, None]
+
+
+def test_robot_not_reachable(tmp_path):
+    # A port that nothing listens on.
+    with socket.socket() as unused:
+        unused.bind(('127.0.0.1', 0))
+        port = unused.getsockname()[1]
+    protocol = tmp_path / 'dna_cleaning_0123456789ab.py'
+    protocol.write_text('print("Protocol Complete")\n')
+    lines = queue.Queue()
+    worker = robot_http.Http_execution_worker(robot_http.Robot_http_api('127.0.0.1', port, timeout=5), [str(protocol)], lines)
+    worker.run()
+    [kind, completed, error] = lines.get_nowait()
+    assert [kind, completed] == ['done', False]
+    assert error.startswith('URLError')
+
+
+def test_qpcr_protocol_with_uploaded_labware(tmp_path, monkeypatch):
+    """
+    Runs a qPCR protocol the way the robot server analyses it: simulated, with the tube rack only available
+    because it was uploaded with the protocol, and without the definition in /data/user_storage/.
+    """
+    simulate = pytest.importorskip('opentrons.simulate')
+    if os.path.exists('/data/user_storage/own_24_tuberack_1500ul.json'):
+        pytest.skip('The tube rack definition is in /data/user_storage/')
+
+    def write_protocol(folder, blueprint, name, parameters):
+        text = replace_values.protocol_text(os.path.join(program_folder, 'qPCR', blueprint), parameters)
+        (tmp_path / f'{name}.py').write_text(text)
+        return [f'{tmp_path}{os.sep}', f'{name}.py']
+
+    def simulated_run(files):
+        labware_folder = tmp_path / 'labware'
+        labware_folder.mkdir()
+        for filename, content in list(files.items())[1:]:
+            (labware_folder / filename).write_bytes(content)
+        try:
+            with open(tmp_path / 'qpcr.py') as protocol_file:
+                [runlog, _] = simulate.simulate(protocol_file, 'qpcr.py', custom_labware_paths=[str(labware_folder)])
+        except Exception as error:
+            return ['failed', [{'commandType': 'comment', 'params': {'message': 'Analysis'}, 'error': {'detail': str(error)}}]]
+        return ['succeeded', [{'commandType': 'comment', 'params': {'message': entry['payload']['text']}} for entry in runlog]]
+
+    monkeypatch.setattr(replace_values_qpcr, 'write_protocol', write_protocol)
+    monkeypatch.chdir(tmp_path)
+    destinations = replace_values_qpcr.group_destinations(benchmark.synthetic_layout(96))
+    sources = replace_values_qpcr.assign_sources(destinations, replace_values_qpcr.reserved_slots())
+    [_, [protocol_folder, protocol_filename]] = replace_values_qpcr.replace_values_qpcr(destinations, sources)
+    server = Mock_robot_server(simulated_run, polls_per_run=0)
+    server.start()
+    try:
+        messages = run_worker(server, [f'{protocol_folder}{protocol_filename}', labware_filepath])
+    finally:
+        server.stop()
+    assert messages[-1] == ['done', True, None]
@@ -0,0 +1,223 @@
+####################################
+#   Tests of robot_session.Robot_session against a local ssh server made with paramiko, which runs the commands
+#   on this computer and stores uploaded files in a temporary folder, and of the ssh and scp fallback.
+#
+####################################
+
+import os
+import queue
+import socket
+import subprocess
+import threading
+import pytest
+
+paramiko = pytest.importorskip('paramiko')
+
+import robot_session
+
+
+class Stub_server(paramiko.ServerInterface):
+    """
+    Accepts any key and runs each command of an exec request with the shell of this computer.
+    """
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'publickey'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=run_command, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+def run_command(channel, command):
+    # Without a profile, so that "sh -lic" only prints the output of the command.
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, env={'PATH': os.environ['PATH'], 'HOME': '/nonexistent'})
+    try:
+        for line in process.stdout:
+            channel.sendall(line)
+        channel.send_exit_status(process.wait())
+        channel.close()
+    except OSError:
+        process.kill() # The client closed the channel, like sshd stopping the command with SIGHUP.
+
+
+class Stub_handle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.writefile.fileno()))
+
+
+class Stub_sftp_server(paramiko.SFTPServerInterface):
+    """
+    Writes uploaded files to the path they are uploaded to, which is a temporary folder in the tests.
+    """
+    def open(self, path, flags, attr):
+        handle = Stub_handle(flags)
+        handle.filename = path
+        handle.writefile = open(path, 'wb')
+        return handle
+
+    def stat(self, path):
+        return paramiko.SFTPAttributes.from_stat(os.stat(path))
+
+    lstat = stat
+
+
+@pytest.fixture(scope='module')
+def ssh_server(tmp_path_factory):
+    """
+    Starts the stub server on a free port of localhost and gives [port, key_filename].
+    """
+    host_key = paramiko.RSAKey.generate(2048)
+    key_filename = str(tmp_path_factory.mktemp('key') / 'ot2_ssh_key')
+    paramiko.RSAKey.generate(2048).write_private_key_file(key_filename)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+    transports = []
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return # Closed by the fixture
+            transport = paramiko.Transport(connection)
+            transport.add_server_key(host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, Stub_sftp_server)
+            transport.start_server(server=Stub_server())
+            transports.append(transport)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield [listener.getsockname()[1], key_filename]
+    listener.close()
+    for transport in transports:
+        transport.close()
+
+
+@pytest.fixture
+def session(ssh_server, monkeypatch):
+    [port, key_filename] = ssh_server
+    # Robot_session connects to the standard port, like the ssh command.
+    connect = paramiko.SSHClient.connect
+    monkeypatch.setattr(paramiko.SSHClient, 'connect', lambda client, ip, **kwargs: connect(client, ip, port=port, **kwargs))
+    session = robot_session.Robot_session('127.0.0.1', 'root', key_filename)
+    yield session
+    session.close()
+
+
+def test_run_gives_exit_status(session):
+    assert session.run('exit 0') == 0
+    assert session.run('exit 3') == 3
+    with pytest.raises(robot_session.Remote_command_error):
+        session.run('exit 3', check=True)
+
+
+def test_connection_is_reused(session):
+    session.run('true')
+    client = session.client
+    session.output('true')
+    assert session.client is client
+
+
+def test_output_and_stream(session):
+    assert session.output('echo hello') == [0, 'hello\n']
+    assert list(session.stream('echo one; echo two')) == ['one', 'two']
+    assert session.last_exit_status == 0
+
+
+def test_sync_only_uploads_changed_files(session, tmp_path):
+    local = tmp_path / 'local'
+    remote = tmp_path / 'remote'
+    local.mkdir()
+    remote.mkdir()
+    (local / 'protocol.py').write_text('print("Protocol Complete")\n')
+    (local / 'labware.json').write_text('{}\n')
+    files = [[str(local / 'protocol.py'), str(remote / 'protocol.py')], [str(local / 'labware.json'), str(remote / 'labware.json')]]
+    progress = []
+
+    assert session.sync(files, lambda filepath, sent, size: progress.append(filepath)) == [filepath for [filepath, _] in files]
+    assert (remote / 'protocol.py').read_text() == 'print("Protocol Complete")\n'
+    assert set(progress) == {filepath for [filepath, _] in files}
+    assert session.remote_hashes([str(remote / 'labware.json')]) == {str(remote / 'labware.json'): robot_session.file_hash(local / 'labware.json')}
+
+    assert session.sync(files) == []
+    (local / 'labware.json').write_text('{"changed": true}\n')
+    assert session.sync(files) == [str(local / 'labware.json')]
+    assert (remote / 'labware.json').read_text() == '{"changed": true}\n'
+
+
+def test_sync_raises_if_the_upload_differs(session, tmp_path, monkeypatch):
+    (tmp_path / 'protocol.py').write_text('a\n')
+    monkeypatch.setattr(session, 'upload', lambda local_filepath, remote_filepath, progress=None: None)
+    with pytest.raises(robot_session.Remote_command_error):
+        session.sync([[str(tmp_path / 'protocol.py'), str(tmp_path / 'missing.py')]])
+
+
+def test_fallback_uses_ssh_and_scp(tmp_path, monkeypatch):
+    monkeypatch.setattr(robot_session, 'paramiko', None)
+    (tmp_path / 'protocol.py').write_text('a\n')
+    digest = robot_session.file_hash(tmp_path / 'protocol.py')
+    commands = []
+    uploaded = []
+
+    def run(command, **kwargs):
+        commands.append([command, kwargs])
+        if command.startswith('scp'):
+            uploaded.append(command)
+        # The file is missing on the robot until it has been uploaded.
+        stdout = f'{digest}  /data/user_storage/protocol.py\n' if uploaded else ''
+        return subprocess.CompletedProcess(command, 0, stdout, '')
+
+    monkeypatch.setattr(robot_session.subprocess, 'run', run)
+    session = robot_session.Robot_session('169.254.29.201', 'root', 'ot2_ssh_key', timeout=5)
+    assert session.sync([[str(tmp_path / 'protocol.py'), '/data/user_storage/protocol.py']]) == [str(tmp_path / 'protocol.py')]
+    assert uploaded == [f'scp -i ot2_ssh_key {tmp_path / "protocol.py"} root@169.254.29.201:/data/user_storage/protocol.py']
+    assert all(kwargs['timeout'] == 5 for [_, kwargs] in commands)
+    assert commands[0][0] == 'ssh -i ot2_ssh_key root@169.254.29.201 sha256sum /data/user_storage/protocol.py 2>/dev/null'
+
+    assert session.run('systemctl stop opentrons-robot-server') == 0
+    assert commands[-1][0] == 'ssh -i ot2_ssh_key root@169.254.29.201 -t "sh -lic" \'systemctl stop opentrons-robot-server\''
+
+
+def test_fallback_upload_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(robot_session, 'paramiko', None)
+    (tmp_path / 'protocol.py').write_text('a\n')
+
+    def run(command, **kwargs):
+        raise subprocess.TimeoutExpired(command, kwargs['timeout'])
+
+    monkeypatch.setattr(robot_session.subprocess, 'run', run)
+    session = robot_session.Robot_session('169.254.29.201', 'root', 'ot2_ssh_key')
+    with pytest.raises(robot_session.session_errors):
+        session.upload(str(tmp_path / 'protocol.py'), '/data/user_storage/protocol.py')
+
+
+def test_worker_is_done_after_unexpected_error():
+    def prepare(report):
+        report('Upload protocol')
+        raise RuntimeError('bug in prepare')
+
+    lines = queue.Queue()
+    worker = robot_session.Execution_worker(None, 'opentrons_execute protocol.py', lines, 'Protocol Complete', prepare)
+    worker.start()
+    worker.join(5)
+    assert lines.get_nowait() == ['line', 'Upload protocol']
+    assert lines.get_nowait() == ['done', False, 'RuntimeError: bug in prepare']
+
+
+def test_worker_stop(session):
+    lines = queue.Queue()
+    worker = robot_session.Execution_worker(session, 'echo start; sleep 1; echo end', lines, 'end')
+    worker.start()
+    assert lines.get(timeout=5) == ['line', 'start']
+    worker.stop()
+    assert lines.get(timeout=5) == ['done', False, None]
+    worker.join(5)
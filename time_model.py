@@ -0,0 +1,305 @@
+####################################
+#   Fast estimate of how long a protocol takes, calculated from the number of robot commands instead of a simulation.
+#   Run this file to calibrate the model against the saved simulations and runs: python time_model.py
+#
+#   Authors: Group 5 Design-Build-Test 2021:
+#           Elsa Renström
+#           Agata Jasna
+#           Tiam Fitoon
+#           Mathias Jonsson
+#           Johan Lehto
+#           Johan Lundberg
+#
+#   Version information:
+#           v1.0 2026-10-18: Cost model for the DNA cleaning and qPCR protocols.
+#
+####################################
+
+import os
+import json
+import math
+import replace_values_qpcr
+
+
+# Seconds per command. Moving to the well is part of each command. 'mix' is one repetition of aspirating and
+# dispensing in the same well, 'delay' is one second of protocol.delay() and 'overhead' is paid once per run.
+default_coefficients = {
+    'pick_up_tip': 6.0,
+    'drop_tip': 5.0,
+    'aspirate': 3.0,
+    'dispense': 3.0,
+    'blow_out': 2.0,
+    'mix': 2.5,
+    'magnet': 3.0,
+    'home': 8.0,
+    'delay': 1.0,
+    'overhead': 20.0,
+}
+coefficients_filepath = 'time_model.json'
+observations_filepath = 'time_observations.jsonl'
+
+
+def new_counts():
+    """
+    Creates a dictionary for counting commands, with every command of the model at zero and one overhead.
+
+        Returns:
+            A dictionary with the number of each command.
+    """
+    counts = {command: 0 for command in default_coefficients}
+    counts['overhead'] = 1
+    return counts
+
+
+def add_commands(counts, times=1, **commands):
+    """
+    Adds commands to a count.
+
+        Parameters:
+            counts (dict):              The count to add the commands to
+            times (int):                Number of times the commands are repeated
+            commands:                   Number of each command, e.g. aspirate=2
+
+        Returns:
+            Nothing.
+    """
+    for command, number in commands.items():
+        counts[command] = counts[command] + times*number
+
+
+def dna_cleaning_counts(sample_no, sample_vol, ratio, clean_amt, eb_vol):
+    """
+    Counts the commands of the DNA cleaning protocol, following the steps of the blueprint
+    that replace_values() chooses for the number of samples.
+
+        Parameters:
+            sample_no (int):            Total number of samples
+            sample_vol (float):         Sample volume
+            ratio (float):              Sample/SPRI-bead ratio
+            clean_amt (int):            Number of cleanings with ethanol
+            eb_vol (float):             Volume of elution buffer to be used
+
+        Returns:
+            A dictionary with the number of each command.
+    """
+    counts = new_counts()
+    add_commands(counts, magnet=1) # Disengaged when loaded
+
+    if sample_no <= 8:
+        # dna_cleaning_blueprint_few_samples.py, one column with the tips picked up by Pipette.pick_up().
+        add_commands(counts, pick_up_tip=1, mix=30+15, aspirate=1, dispense=2, blow_out=1, drop_tip=1)
+        add_commands(counts, delay=600, magnet=1)
+        add_commands(counts, pick_up_tip=1, aspirate=6, drop_tip=1)
+        add_commands(counts, pick_up_tip=1, drop_tip=1)
+        add_commands(counts, clean_amt, aspirate=1+4, dispense=10+1, blow_out=1, delay=30)
+        add_commands(counts, delay=300, magnet=1)
+        add_commands(counts, pick_up_tip=1, aspirate=1, dispense=1, blow_out=1, mix=30, drop_tip=1)
+        add_commands(counts, magnet=1, delay=60)
+        add_commands(counts, pick_up_tip=1, aspirate=1, dispense=1, blow_out=1, drop_tip=1)
+        add_commands(counts, home=1, magnet=1)
+        return counts
+
+    # dna_cleaning_blueprint.py, every step is done once per column.
+    columns = math.ceil(sample_no / 8)
+    add_commands(counts, columns, pick_up_tip=1, aspirate=1, dispense=2, blow_out=1, mix=15, drop_tip=1)
+    if columns == 1 or columns == 6:
+        add_commands(counts, columns, mix=30)
+    add_commands(counts, delay=600, magnet=1)
+    add_commands(counts, columns, pick_up_tip=1, aspirate=6, drop_tip=1)
+    # Adding and removing ethanol, the tips are returned to the tip rack between the steps.
+    add_commands(counts, clean_amt*columns, pick_up_tip=2, aspirate=1+4, dispense=10+1, drop_tip=2)
+    if columns < 4:
+        add_commands(counts, clean_amt, delay=30)
+    add_commands(counts, delay=300, magnet=1)
+    add_commands(counts, columns, pick_up_tip=1, aspirate=1, dispense=1, blow_out=1, mix=30, drop_tip=1)
+    add_commands(counts, magnet=1, delay=60)
+    add_commands(counts, columns, pick_up_tip=1, aspirate=1, dispense=1, blow_out=1, drop_tip=1)
+    add_commands(counts, home=1, magnet=1)
+    return counts
+
+
+def replicate_counts(counts, no_wells, wells_per_tip, wells_per_aspiration):
+    """
+    Counts the commands of transfer_replicates() in the qPCR blueprint for one source.
+
+        Parameters:
+            counts (dict):              The count to add the commands to
+            no_wells (int):             Number of wells (or plate columns) filled from the source
+            wells_per_tip (int):        Number of wells filled with each tip
+            wells_per_aspiration (int): Number of wells filled from each aspiration
+
+        Returns:
+            Nothing.
+    """
+    if wells_per_tip == 1:
+        add_commands(counts, no_wells, pick_up_tip=1, aspirate=1, dispense=1, drop_tip=1)
+        return
+    for i in range(0, no_wells, wells_per_tip):
+        wells_with_tip = min(wells_per_tip, no_wells - i)
+        aspirations = math.ceil(wells_with_tip / wells_per_aspiration)
+        add_commands(counts, pick_up_tip=1, aspirate=aspirations, dispense=wells_with_tip, drop_tip=1)
+        # Only aspirations that fill several wells blow out the disposal volume.
+        [full_aspirations, wells_left] = divmod(wells_with_tip, wells_per_aspiration)
+        add_commands(counts, blow_out=(full_aspirations if wells_per_aspiration > 1 else 0) + (1 if wells_left > 1 else 0))
+
+
+def qpcr_counts(destinations, multichannel_destination=None, mastermix_mode='single', mastermix_pipette='p10_single',
+                conditioning_vol=1, disposal_vol=1, sample_tip_policy='well', standard_tip_policy='well'):
+    """
+    Counts the commands of the qPCR protocol, following the steps of the blueprint.
+
+        Parameters:
+            destinations (dict):        Destinations for the single-channel pipette
+            multichannel_destination:   Plate columns filled by the 8-channel pipette, if it is used
+            mastermix_mode (str):       'single' or 'distribute'
+            mastermix_pipette (str):    The pipette used for the mastermixes in distribute mode
+            conditioning_vol (float):   Volume dispensed back to the source before the first well, in distribute mode
+            disposal_vol (float):       Volume left in the tip after the last well
+            sample_tip_policy:          Tip policy for samples, 'well', 'source' or a number of wells per tip
+            standard_tip_policy:        Tip policy for standards, 'well', 'source' or a number of wells per tip
+
+        Returns:
+            A dictionary with the number of each command.
+    """
+    counts = new_counts()
+    sizes = replace_values_qpcr.wells_per_aspiration(mastermix_mode, mastermix_pipette, sample_tip_policy, standard_tip_policy,
+                                                     conditioning_vol, disposal_vol)
+    tip_policies = {
+        'sample_destination': replace_values_qpcr.parse_tip_policy(sample_tip_policy),
+        'standard_destination': replace_values_qpcr.parse_tip_policy(standard_tip_policy)}
+
+    # 8-channel pipette, one mastermix tip per strip column and 6 ul in the 10 ul tip, i.e. one column per aspiration.
+    multichannel_destination = multichannel_destination or {}
+    for wells in multichannel_destination.get('mastermix_destination', {}).values():
+        replicate_counts(counts, len(wells), max(1, len(wells)), 1)
+
+    for wells in destinations['mastermix_destination'].values():
+        aspirations = math.ceil(len(wells) / sizes['mastermix_destination'])
+        add_commands(counts, pick_up_tip=1, aspirate=aspirations, dispense=len(wells), drop_tip=1)
+        if mastermix_mode == 'distribute':
+            add_commands(counts, aspirations, dispense=1 if conditioning_vol > 0 else 0, blow_out=1)
+
+    for group, tip_policy in tip_policies.items():
+        for group_destinations in [multichannel_destination.get(group, {}), destinations[group]]:
+            for wells in group_destinations.values():
+                if tip_policy == 'well':
+                    wells_per_tip = 1
+                elif tip_policy == 'source':
+                    wells_per_tip = max(1, len(wells))
+                else:
+                    wells_per_tip = tip_policy
+                replicate_counts(counts, len(wells), wells_per_tip, min(sizes[group], wells_per_tip))
+    return counts
+
+
+def load_coefficients(filepath=coefficients_filepath):
+    """
+    Reads the calibrated coefficients, or the default coefficients if the model has not been calibrated.
+
+        Parameters:
+            filepath (str):             Filepath to the calibrated coefficients
+
+        Returns:
+            A dictionary with the seconds per command.
+    """
+    coefficients = dict(default_coefficients)
+    if os.path.exists(filepath):
+        with open(filepath) as file:
+            coefficients.update(json.load(file))
+    return coefficients
+
+
+def predict(counts, coefficients=None):
+    """
+    Calculates how long a protocol takes from its number of commands.
+
+        Parameters:
+            counts (dict):              Number of each command
+            coefficients (dict):        Seconds per command, see load_coefficients()
+
+        Returns:
+            The duration in seconds.
+    """
+    if coefficients is None:
+        coefficients = load_coefficients()
+    return sum(coefficients[command] * number for command, number in counts.items())
+
+
+def record_observation(counts, seconds, source, filepath=observations_filepath):
+    """
+    Saves how long a protocol took, from a simulation or a run on the robot, to calibrate the model with later.
+
+        Parameters:
+            counts (dict):              Number of each command of the protocol
+            seconds (float):            The duration in seconds
+            source (str):               'simulation' or 'run'
+            filepath (str):             Filepath to the saved observations
+
+        Returns:
+            Nothing.
+    """
+    with open(filepath, 'a') as file:
+        file.write(json.dumps({'counts': counts, 'seconds': seconds, 'source': source}) + '\n')
+
+
+def calibrate(observations, regularization=1.0):
+    """
+    Fits the seconds per command to observed durations with least squares. The fit is pulled towards the default
+    coefficients (ridge regression), so that commands that are seldom used or always used together keep sensible values.
+    A delay always takes its own length and is not fitted.
+
+        Parameters:
+            observations (list):        Observations as dictionaries with 'counts' and 'seconds', see record_observation()
+            regularization (float):     How hard the fit is pulled towards the default coefficients
+
+        Returns:
+            A dictionary with the seconds per command.
+    """
+    commands = [command for command in default_coefficients if command != 'delay']
+    size = len(commands)
+    # Normal equations (X^T X + r I) c = X^T y + r c0, solved with Gaussian elimination.
+    matrix = [[regularization if i == j else 0.0 for j in range(size)] + [regularization * default_coefficients[commands[i]]]
+              for i in range(size)]
+    for observation in observations:
+        row = [observation['counts'].get(command, 0) for command in commands]
+        seconds = observation['seconds'] - observation['counts'].get('delay', 0)
+        for i in range(size):
+            for j in range(size):
+                matrix[i][j] = matrix[i][j] + row[i]*row[j]
+            matrix[i][size] = matrix[i][size] + row[i]*seconds
+
+    for i in range(size):
+        pivot = max(range(i, size), key=lambda k: abs(matrix[k][i]))
+        matrix[i], matrix[pivot] = matrix[pivot], matrix[i]
+        for k in range(size):
+            if k != i:
+                factor = matrix[k][i] / matrix[i][i]
+                matrix[k] = [a - factor*b for a, b in zip(matrix[k], matrix[i])]
+
+    coefficients = {command: max(0.0, matrix[i][size] / matrix[i][i]) for i, command in enumerate(commands)}
+    coefficients['delay'] = 1.0
+    return coefficients
+
+
+def calibrate_from_file(filepath=observations_filepath, output_filepath=coefficients_filepath):
+    """
+    Calibrates the model with the saved observations and saves the coefficients.
+
+        Parameters:
+            filepath (str):             Filepath to the saved observations
+            output_filepath (str):      Filepath to save the coefficients to
+
+        Returns:
+            A dictionary with the seconds per command.
+    """
+    with open(filepath) as file:
+        observations = [json.loads(line) for line in file if line.strip()]
+    coefficients = calibrate(observations)
+    with open(output_filepath, 'w') as file:
+        json.dump(coefficients, file, indent=4)
+    return coefficients
+
+
+if __name__ == '__main__':
+    for command, seconds in calibrate_from_file().items():
+        print(f'{command}: {seconds:.2f} s')